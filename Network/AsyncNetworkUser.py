@@ -0,0 +1,271 @@
+import asyncio
+import threading
+
+from NetworkUser import MainUser, HOSTNAME
+from NetworkProtocol import RequestConnectionProtocol, InputShareProtocol, NetworkProtocol, FrameBuffer, RECV_SIZE
+from field_operations import Field
+import Shamirss
+
+CONNECT_RETRIES = 50
+CONNECT_DELAY = 0.1
+"""
+Intentos y espera (en segundos) entre intentos al abrir una conexión de salida.
+"""
+
+_event_loop: asyncio.AbstractEventLoop | None = None
+_event_loop_lock = threading.Lock()
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Retorna el ciclo de eventos compartido, que corre en un hilo aparte.
+    Todos los AsyncMainUser creados sin especificar un ciclo lo comparten,
+    así un solo proceso puede alojar cientos de usuarios con un único hilo de red.
+    """
+    global _event_loop
+    with _event_loop_lock:
+        if _event_loop is None:
+            _event_loop = asyncio.new_event_loop()
+            threading.Thread(target=_event_loop.run_forever, daemon=True).start()
+    return _event_loop
+
+def in_loop(loop: asyncio.AbstractEventLoop) -> bool:
+    """
+    Indica si el código se está ejecutando dentro del ciclo de eventos indicado.
+    """
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+class PeerWriter:
+    """
+    Cola de salida hacia un usuario de la red.
+
+    Reemplaza al socket en NetworkUser.host: los protocolos llaman a send igual que con un socket,
+    pero los datos se encolan y una tarea del ciclo de eventos los escribe en la conexión.
+    send se puede llamar desde cualquier hilo y nunca bloquea.
+    Los mensajes que se acumulan mientras se escribe se envían juntos en una sola escritura.
+
+    Si no se puede abrir la conexión o falla una escritura, se guarda el error en error y los mensajes pendientes
+    se descartan (se marcan como terminados en la cola), así drain no espera para siempre: lanza el error.
+    Desde entonces send también lanza el error.
+    """
+    def __init__(self, user: "AsyncMainUser", ip: str, port: int):
+        self.user = user
+        self.loop = user.loop
+        self.ip = ip
+        self.port = port
+        self.queue: asyncio.Queue[bytes | None] = asyncio.Queue()
+        self.task: asyncio.Future | None = None
+        self.error: Exception | None = None
+        self.finished = False
+
+    def getpeername(self) -> tuple[str, int]:
+        return self.ip, self.port
+
+    def start(self):
+        """
+        Inicia la tarea que abre la conexión y vacía la cola.
+        """
+        self.task = self.user.spawn(self.run())
+
+    def send(self, data: bytes | None) -> int:
+        """
+        Encola los datos para enviarlos. None cierra la conexión después de enviar lo pendiente.
+        """
+        if self.error is not None:
+            raise OSError(f"No se puede enviar a {self.ip}:{self.port}: {self.error}")
+        if in_loop(self.loop):
+            self.enqueue(data)
+        else:
+            self.loop.call_soon_threadsafe(self.enqueue, data)
+        return len(data) if data else 0
+
+    def enqueue(self, data: bytes | None):
+        """
+        Pone los datos en la cola, en el ciclo de eventos. Si la tarea ya terminó, se descartan,
+        porque nadie los sacaría de la cola.
+        """
+        if not self.finished:
+            self.queue.put_nowait(data)
+
+    def close(self):
+        self.send(None)
+
+    async def drain(self):
+        """
+        Espera a que todos los mensajes encolados se hayan escrito en la conexión.
+        Lanza el error de la conexión si no se pudieron escribir.
+        """
+        await self.queue.join()
+        if self.error is not None:
+            raise OSError(f"No se pudo enviar a {self.ip}:{self.port}: {self.error}")
+
+    def discard_pending(self):
+        """
+        Marca como terminados los mensajes que quedan en la cola, sin enviarlos.
+        """
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+
+    async def run(self):
+        """
+        Abre la conexión segura (con reintentos) y escribe los mensajes de la cola a medida que llegan.
+        """
+        error: Exception | None = None
+        for attempt in range(CONNECT_RETRIES):
+            try:
+                _, writer = await asyncio.open_connection(self.ip, self.port, ssl=self.user.client_context, server_hostname=HOSTNAME)
+                break
+            except OSError as e:
+                error = e
+                await asyncio.sleep(CONNECT_DELAY)
+        else:
+            self.user.log(f"No se pudo conectar a {self.ip}:{self.port}")
+            self.error = error
+            self.finished = True
+            self.discard_pending()
+            return
+
+        try:
+            while True:
+                chunks = [await self.queue.get()]
+                while not self.queue.empty():
+                    chunks.append(self.queue.get_nowait())
+                try:
+                    writer.write(b"".join(chunk for chunk in chunks if chunk is not None))
+                    await writer.drain()
+                finally:
+                    for _ in chunks:
+                        self.queue.task_done()
+                if None in chunks:
+                    break
+        except Exception as e:
+            self.error = e
+            self.user.log(f"Error al enviar a {self.ip}:{self.port}: {e}")
+        finally:
+            self.finished = True
+            self.discard_pending()
+            writer.close()
+
+class AsyncMainUser(MainUser):
+    """
+    Versión de MainUser basada en asyncio.
+
+    El servidor se crea con asyncio.start_server sobre el mismo ssl.SSLContext de MainUser,
+    y cada conexión entrante es una corrutina en lugar de un hilo.
+    Cada usuario de la red tiene una cola de salida (PeerWriter) que reemplaza al socket,
+    así los protocolos de NetworkProtocol funcionan sin cambios y ningún envío bloquea al que lo llama.
+
+    Todos los manejadores de mensajes se ejecutan en el hilo del ciclo de eventos,
+    por lo que no compiten entre ellos por el estado del usuario.
+    Por defecto todos los usuarios comparten el ciclo de get_event_loop.
+    """
+    def __init__(self, ip: str, port: int, uuid: str | None = None, binary: bool = True, recv_size: int = RECV_SIZE, loop: asyncio.AbstractEventLoop | None = None, share_store: str | None = None):
+        self.loop = loop if loop is not None else get_event_loop()
+        self._tasks: set[asyncio.Future] = set()
+        super().__init__(ip, port, uuid, binary, recv_size, share_store)
+
+    def spawn(self, coroutine) -> asyncio.Future:
+        """
+        Programa una corrutina en el ciclo de eventos desde cualquier hilo.
+        Se guarda una referencia a la tarea para que no sea recolectada antes de terminar.
+        """
+        if in_loop(self.loop):
+            task = self.loop.create_task(coroutine)
+        else:
+            task = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def start_server(self):
+        """
+        Inicia el servidor en el ciclo de eventos.
+        El hilo que lo llama solo espera a que el servidor esté escuchando y termina.
+        """
+        asyncio.run_coroutine_threadsafe(self.start_server_async(), self.loop).result()
+
+    async def start_server_async(self):
+        self.server = await asyncio.start_server(self.handle_client_async, self.ip, self.port, ssl=self.server_context)
+        self.server_ready.set()
+        self.log(f"Servidor iniciado en {self.ip}:{self.port}")
+
+    async def handle_client_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Maneja una conexión entrante.
+        Los datos leídos se copian al FrameBuffer, que separa los mensajes y los envía a receive o receiveFrame.
+        Los manejadores son los mismos de MainUser y no necesitan ser corrutinas: no bloquean el ciclo,
+        porque los envíos solo encolan en los PeerWriter y runLater programa la ronda siguiente en el ciclo.
+        """
+        buffer = FrameBuffer(self.recv_size)
+        try:
+            while True:
+                data = await reader.read(self.recv_size)
+                if not data:
+                    break
+                with buffer.writable() as target:
+                    target[:len(data)] = data
+                buffer.commit(len(data))
+                buffer.process(self.receive, self.receiveFrame)
+        except Exception as e:
+            self.log(f"Error en una conexión entrante: {e}")
+        finally:
+            writer.close()
+
+    def openConnection(self, ip: str, port: int) -> PeerWriter:
+        """
+        Crea la cola de salida hacia un usuario. La conexión se abre en el ciclo de eventos,
+        y los mensajes que se envíen mientras tanto quedan en la cola.
+        """
+        writer = PeerWriter(self, ip, port)
+        writer.start()
+        return writer
+
+    def connect(self, ip: str, port: int, retries: int = 3, delay: int = 5) -> PeerWriter:
+        """
+        Envia una solicitud de conexión a un usuario en la red.
+        Se usa una cola de salida temporal que se cierra después de enviar la solicitud.
+        Los reintentos los hace la cola al abrir la conexión.
+        """
+        writer = self.openConnection(ip, port)
+        RequestConnectionProtocol(self).send_message(writer)
+        writer.close()
+        self.log(f"Enviando solicitud de conexión a {ip}:{port}")
+        return writer
+
+    def runLater(self, delay: float, function, *args):
+        """
+        Programa function(*args) en el ciclo de eventos después de delay segundos, sin bloquear.
+        """
+        if delay > 0:
+            self.loop.call_soon_threadsafe(self.loop.call_later, delay, function, *args)
+        else:
+            self.loop.call_soon_threadsafe(function, *args)
+
+    async def send_number_async(self, numero: int, protocol: type[NetworkProtocol] = InputShareProtocol, *args, session: int = 0) -> list[Field]:
+        """
+        Versión corrutina de send_number.
+        Envía las partes a todos los usuarios y espera a que se hayan escrito en cada conexión.
+        """
+        shamirss = Shamirss.ShamirSecretSharing(Field(numero, self.mod), len(self.party))
+        shares = shamirss.generate_shares(self.t)
+        await asyncio.gather(*(protocol(self, session).send_message_async(user.host, share, *args) for user, share in zip(list(self.party.values()), shares)))
+        return shares
+
+    async def close_async(self):
+        """
+        Cierra el servidor y las colas de salida. Igual que en MainUser, el usuario cerrado ya no muestra mensajes.
+        """
+        self.closed = True
+        self.server.close()
+        for user in self.party.values():
+            user.host.close()
+        await self.server.wait_closed()
+
+    def close(self):
+        """
+        Cierra el usuario desde cualquier hilo.
+        """
+        asyncio.run_coroutine_threadsafe(self.close_async(), self.loop).result()
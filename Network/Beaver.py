@@ -0,0 +1,183 @@
+import json
+import os
+import time
+
+import NetworkUser
+from field_operations import Field
+
+class BeaverTriple:
+    """
+    Partes de una tripleta de Beaver (a, b, c), donde a y b son aleatorios y c = a · b.
+    Nadie conoce a, b ni c; cada usuario solo tiene su parte de cada uno.
+    """
+    __slots__ = ("a", "b", "c")
+
+    def __init__(self, a: Field, b: Field, c: Field):
+        self.a = a
+        self.b = b
+        self.c = c
+
+class TriplePool:
+    """
+    Reserva de tripletas de Beaver para separar la multiplicación en una fase previa (offline) y una fase en línea.
+
+    Fase previa (generate): cada usuario reparte valores aleatorios con MainUser.shareBatch, lo que da partes
+    de a y b aleatorios, y luego se calcula c = a · b con MainUser.multiplyBatch. Son dos rondas sin importar
+    cuántas tripletas se generen, y no dependen de las entradas, así que se pueden hacer antes del cálculo.
+
+    Fase en línea (multiply): para x · y se abren d = x - a y e = y - b, que no revelan nada porque a y b son aleatorios,
+    y cada usuario calcula localmente z = c + d · b + e · a + d · e. Todas las multiplicaciones de una capa
+    se abren juntas con MainUser.openBatch, en una sola ronda y sin generar polinomios.
+
+    Todos los usuarios deben generar y consumir las tripletas en el mismo orden.
+    La reserva se puede guardar en disco (save / load) y lleva la cuenta de cuántas tripletas se generan y consumen.
+    Si la reserva tiene un archivo (path), take lo reescribe antes de retornar, así que una tripleta
+    sale del disco antes de que se abra cualquier valor enmascarado con ella.
+    Los lotes se envían en la sesión indicada (ver Session).
+    """
+    def __init__(self, user: "NetworkUser.MainUser", session: int = 0):
+        self.user = user
+        self.session = session
+        self.triples: list[BeaverTriple] = []
+        self.generated = 0
+        self.consumed = 0
+        self.generation_time = 0.0
+        self.path: str | None = None
+        self.available_since = time.perf_counter()
+        self.last_consumed: float | None = None
+
+    def __len__(self) -> int:
+        return len(self.triples)
+
+    def generate(self, count: int, timeout: float | None = None) -> int:
+        """
+        Genera count tripletas nuevas y las añade a la reserva.
+        Se retorna la cantidad de tripletas disponibles.
+        """
+        if count <= 0:
+            return len(self.triples)
+        start = time.perf_counter()
+        field = self.user.mod
+
+        random_values = [Field.random(field).value for _ in range(2 * count)]
+        shared = self.user.waitForBatch(self.user.shareBatch(random_values, session=self.session), timeout, self.session)
+        if shared is None:
+            raise Exception("No se completó la generación de valores aleatorios")
+        a, b = shared[:count], shared[count:]
+
+        c = self.user.waitForBatch(self.user.multiplyBatch(a, b, session=self.session), timeout, self.session)
+        if c is None:
+            raise Exception("No se completó la multiplicación de las tripletas")
+
+        self.triples.extend(BeaverTriple(*triple) for triple in zip(a, b, c))
+        self.generated += count
+        self.generation_time += time.perf_counter() - start
+        self.available_since = time.perf_counter()
+        return len(self.triples)
+
+    def take(self, count: int) -> list[BeaverTriple]:
+        """
+        Toma las siguientes count tripletas de la reserva. Cada tripleta se usa una sola vez.
+        Si la reserva tiene un archivo, se guardan las restantes antes de retornar, para que una caída
+        durante la apertura no deje en el disco tripletas que ya se usaron.
+        """
+        if count > len(self.triples):
+            raise Exception(f"No hay suficientes tripletas: se necesitan {count} y hay {len(self.triples)}")
+        taken, self.triples = self.triples[:count], self.triples[count:]
+        if self.path is not None:
+            self.save(self.path)
+
+        self.last_consumed = time.perf_counter()
+        self.consumed += count
+        return taken
+
+    def multiply(self, left: list[Field], right: list[Field], timeout: float | None = None) -> list[Field]:
+        """
+        Multiplica left[j] · right[j] para cada j usando una tripleta por producto.
+        Se abren todos los valores enmascarados en una sola ronda y se retornan las partes de los productos.
+        """
+        if len(left) != len(right):
+            raise Exception("Los vectores deben tener la misma longitud")
+        triples = self.take(len(left))
+
+        masked = [x - triple.a for x, triple in zip(left, triples)] + [y - triple.b for y, triple in zip(right, triples)]
+        opened = self.user.waitForBatch(self.user.openBatch(masked, session=self.session), timeout, self.session)
+        if opened is None:
+            raise Exception("No se pudieron abrir los valores enmascarados")
+        d, e = opened[:len(triples)], opened[len(triples):]
+
+        return [triple.c + d_j * triple.b + e_j * triple.a + d_j * e_j for triple, d_j, e_j in zip(triples, d, e)]
+
+    def stats(self) -> dict[str, float | None]:
+        """
+        Retorna las estadísticas de la reserva: tripletas generadas, consumidas y disponibles,
+        tiempo de generación, tripletas generadas por segundo y tripletas consumidas por segundo
+        (desde que la reserva estuvo lista hasta el último consumo; None si no se consumió ninguna).
+        """
+        consuming_time = self.last_consumed - self.available_since if self.last_consumed is not None else 0.0
+        return {
+            "generadas": self.generated,
+            "consumidas": self.consumed,
+            "disponibles": len(self.triples),
+            "tiempo_generacion": self.generation_time,
+            "generacion_por_segundo": self.generated / self.generation_time if self.generation_time > 0 else 0.0,
+            "consumo_por_segundo": self.consumed / consuming_time if consuming_time > 0 else None,
+        }
+
+    def report(self):
+        """
+        Imprime en la consola las estadísticas de la reserva.
+        """
+        print("Tripletas de Beaver:")
+        for name, value in self.stats().items():
+            print(f"  - {name:<24} {value:,.2f}" if isinstance(value, float) else f"  - {name:<24} {value}")
+
+    def save(self, path: str):
+        """
+        Guarda las tripletas disponibles en un archivo JSON.
+        Cada usuario guarda sus propias partes, así que el archivo es distinto para cada uno.
+        Se escribe en un archivo temporal que luego reemplaza al original, para no dejarlo a medias.
+        Desde ese momento take mantiene el archivo al día.
+        """
+        data = {
+            "uuid": self.user.uuid,
+            "mod": self.user.mod,
+            "triples": [[triple.a.value, triple.b.value, triple.c.value] for triple in self.triples],
+        }
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(temporary, path)
+        self.path = path
+
+    def load(self, path: str) -> int:
+        """
+        Carga las tripletas de un archivo JSON guardado con save y las añade a la reserva.
+        Se verifica que el archivo sea de este usuario y del mismo módulo.
+        Se retorna la cantidad de tripletas disponibles.
+        """
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        if data.get("uuid") != self.user.uuid:
+            raise Exception(f"El archivo de tripletas es del usuario {data.get('uuid')}")
+        if data.get("mod") != self.user.mod:
+            raise Exception(f"El archivo de tripletas es del módulo {data.get('mod')}")
+        mod = self.user.mod
+        self.triples.extend(BeaverTriple(Field(a, mod), Field(b, mod), Field(c, mod)) for a, b, c in data.get("triples", []))
+        self.path = path
+        self.available_since = time.perf_counter()
+        return len(self.triples)
+
+    def prepare(self, path: str, count: int, timeout: float | None = None) -> int:
+        """
+        Carga las tripletas del archivo si existe, y si no alcanzan para count, genera las que faltan y guarda la reserva.
+        Todos los usuarios deben tener la misma cantidad de tripletas en sus archivos.
+        Desde aquí la reserva queda asociada al archivo y cada take lo actualiza.
+        """
+        if os.path.exists(path):
+            self.load(path)
+        missing = count - len(self.triples)
+        if missing > 0:
+            self.generate(missing, timeout)
+        self.save(path)
+        return len(self.triples)
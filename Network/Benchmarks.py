@@ -0,0 +1,554 @@
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+
+from field_operations import Field, PrimeField, FIELD_BACKENDS, is_mersenne
+import NetworkUser
+from NetworkProtocol import FrameBuffer, DELIMITADOR, RECV_SIZE, SEPARADOR_IDENTIFICADOR, InputShareProtocol, ProductVectorProtocol
+import Lagrange
+from ShareStore import ShareStore
+import Protocol
+import Shamirss
+
+MOD = 43112609
+NUM_ELEMENTS = 10_000
+REPEAT = 5
+MESSAGE_COUNTS = [1_000, 10_000, 100_000]
+BACKEND_MODS = [MOD, 2**31 - 1, 2**61 - 1]
+PACKED_PARTIES = 32
+PACKED_THRESHOLD = 4
+PACKED_SIZES = [1, 4, 8, 16]
+PARTY_COUNTS = [3, 5, 10, 25, 50, 100, 200]
+CODEC_MESSAGES = 10_000
+VECTOR_SIZE = 1_000
+E2E_PARTIES = [3, 5, 9, 17]
+E2E_BASE_PORT = 6200
+SUITES = ["field", "backends", "packed", "memory", "receive", "sharing", "codec", "e2e"]
+"""
+Parámetros por defecto de las mediciones.
+Se usa el mismo módulo que MainUser.
+"""
+
+class LegacyField:
+    """
+    Copia de la clase Field antes de usar __slots__: cada instancia tiene su propio __dict__,
+    cada operación verifica el tipo y el módulo, y siempre se crea una instancia nueva.
+    Solo se usa como referencia para medir la mejora.
+    """
+    def __init__(self, value: int, mod: int):
+        self.value = value % mod
+        self.mod = mod
+
+    def __add__(self, other):
+        if isinstance(other, LegacyField):
+            if self.mod != other.mod:
+                raise ValueError("No se puede operar dos campos con módulos diferentes")
+            return LegacyField(self.value + other.value, self.mod)
+        raise TypeError("No se puede sumar un campo con algo que no sea un campo")
+
+    def __mul__(self, other):
+        if isinstance(other, LegacyField):
+            if self.mod != other.mod:
+                raise ValueError("No se puede operar dos campos con módulos diferentes")
+            return LegacyField(self.value * other.value, self.mod)
+        raise TypeError("No se puede multiplicar un campo con algo que no sea un campo")
+
+def measure(function, repeat: int = REPEAT) -> float:
+    """
+    Ejecuta la función varias veces y retorna el mejor tiempo en segundos.
+    Se toma el mínimo porque es el que menos ruido tiene del sistema operativo.
+    """
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+def bench_field_ops(n: int = NUM_ELEMENTS, mod: int = MOD, repeat: int = REPEAT) -> dict[str, float]:
+    """
+    Mide un ciclo de multiplicación y acumulación (acc = acc + a_i * b_i),
+    que es el patrón de Polynomio.eval y de la interpolación de Lagrange.
+
+    Se comparan:
+    - legacy: la clase Field anterior (con __dict__).
+    - slots: la clase Field actual, creando un objeto por operación.
+    - in_place: la clase Field actual, acumulando con +=.
+    - prime_field: PrimeField operando sobre enteros.
+    - raw_ints: enteros con una reducción por término, como referencia del mínimo posible.
+
+    :return: Diccionario con el tiempo (en segundos) de cada variante.
+    """
+    a = [random.randrange(mod) for _ in range(n)]
+    b = [random.randrange(mod) for _ in range(n)]
+    legacy_a, legacy_b = [LegacyField(x, mod) for x in a], [LegacyField(x, mod) for x in b]
+    field_a, field_b = [Field(x, mod) for x in a], [Field(x, mod) for x in b]
+    F = PrimeField(mod)
+
+    def legacy():
+        acc = LegacyField(0, mod)
+        for x, y in zip(legacy_a, legacy_b):
+            acc = acc + x * y
+        return acc
+
+    def slots():
+        acc = Field(0, mod)
+        for x, y in zip(field_a, field_b):
+            acc = acc + x * y
+        return acc
+
+    def in_place():
+        acc = Field(0, mod)
+        for x, y in zip(field_a, field_b):
+            acc += x * y
+        return acc
+
+    def prime_field():
+        acc = 0
+        for x, y in zip(a, b):
+            acc = F.add(acc, F.mul(x, y))
+        return acc
+
+    def raw_ints():
+        acc = 0
+        for x, y in zip(a, b):
+            acc = (acc + x * y) % mod
+        return acc
+
+    results = {}
+    for function in (legacy, slots, in_place, prime_field, raw_ints):
+        results[function.__name__] = measure(function, repeat)
+    assert legacy().value == slots().value == in_place().value == prime_field() == raw_ints()
+    return results
+
+def bench_backends(n: int = NUM_ELEMENTS, mods: list[int] = BACKEND_MODS, repeat: int = REPEAT) -> dict[int, dict[str, dict[str, float]]]:
+    """
+    Mide los dos ciclos críticos con cada contexto de campo (FIELD_BACKENDS):
+    - eval: la regla de Horner de Polynomio.eval, acc = acc · x + c_i, para un polinomio de n coeficientes.
+    - lagrange: la combinación lineal de la interpolación de Lagrange, acc = acc + λ_i · y_i, con n partes.
+
+    Cada ciclo se escribe con las operaciones del contexto (add y mul), con las entradas ya codificadas (encode).
+    Como referencia se incluye "inline", el mismo ciclo con % escrito directamente, sin llamar a métodos.
+    El contexto de Mersenne solo se mide con módulos de la forma 2^k - 1.
+
+    :return: Por módulo y por ciclo, el tiempo (en segundos) de cada contexto.
+    """
+    results = {}
+    for mod in mods:
+        coefs = [random.randrange(mod) for _ in range(n)]
+        point = random.randrange(mod)
+        lambdas = [random.randrange(mod) for _ in range(n)]
+        ys = [random.randrange(mod) for _ in range(n)]
+        expected_eval = 0
+        for c in coefs:
+            expected_eval = (expected_eval * point + c) % mod
+        expected_lagrange = sum(l * y for l, y in zip(lambdas, ys)) % mod
+
+        def inline_eval():
+            acc = 0
+            for c in coefs:
+                acc = (acc * point + c) % mod
+            return acc
+
+        def inline_lagrange():
+            acc = 0
+            for l, y in zip(lambdas, ys):
+                acc = (acc + l * y) % mod
+            return acc
+
+        eval_times = {"inline": measure(inline_eval, repeat)}
+        lagrange_times = {"inline": measure(inline_lagrange, repeat)}
+        for name, backend in FIELD_BACKENDS.items():
+            if name == "mersenne" and not is_mersenne(mod):
+                continue
+            F = backend(mod)
+            encoded_coefs, encoded_point = [F.encode(c) for c in coefs], F.encode(point)
+            encoded_lambdas, encoded_ys = [F.encode(l) for l in lambdas], [F.encode(y) for y in ys]
+            add, mul = F.add, F.mul
+
+            def horner():
+                acc = 0
+                for c in encoded_coefs:
+                    acc = add(mul(acc, encoded_point), c)
+                return acc
+
+            def lagrange():
+                acc = 0
+                for l, y in zip(encoded_lambdas, encoded_ys):
+                    acc = add(acc, mul(l, y))
+                return acc
+
+            assert F.decode(horner()) == expected_eval and F.decode(lagrange()) == expected_lagrange, name
+            eval_times[name] = measure(horner, repeat)
+            lagrange_times[name] = measure(lagrange, repeat)
+        results[mod] = {"eval": eval_times, "lagrange": lagrange_times}
+    return results
+
+def bench_packed(n: int = NUM_ELEMENTS, parties: int = PACKED_PARTIES, t: int = PACKED_THRESHOLD,
+                 sizes: list[int] = PACKED_SIZES, mod: int = MOD, repeat: int = REPEAT) -> dict[str, dict[str, float]]:
+    """
+    Compara el reparto de n secretos entre varias partes con un polinomio por secreto (generate_batch_shares)
+    y con reparto empaquetado de k secretos por polinomio (generate_packed_shares), para cada k de sizes.
+    Todas las variantes resisten t partes coludidas; el empaquetado necesita k + t partes para reconstruir.
+
+    :return: Por variante, el tiempo de reparto y de reconstrucción (en segundos), los elementos del campo
+             que se envían por parte y cuántas partes se necesitan para reconstruir.
+    """
+    secrets = [random.randrange(mod) for _ in range(n)]
+    results = {}
+
+    shares = Shamirss.ShamirSecretSharing.generate_batch_shares(secrets, parties, t, mod)
+    rows = [[int(value) for value in row] for row in shares]
+    assert [value.value for value in Shamirss.ShamirSecretSharing.recuperar_secretos(rows, mod)] == secrets
+    results["shamir"] = {
+        "reparto": measure(lambda: Shamirss.ShamirSecretSharing.generate_batch_shares(secrets, parties, t, mod), repeat),
+        "reconstruccion": measure(lambda: Shamirss.ShamirSecretSharing.recuperar_secretos(rows, mod), repeat),
+        "elementos_por_parte": len(rows[0]),
+        "umbral": t + 1,
+    }
+
+    for k in sizes:
+        if k + t > parties:
+            continue
+        rows = Shamirss.ShamirSecretSharing.generate_packed_shares(secrets, parties, t, k, mod)
+        assert [value.value for value in Shamirss.ShamirSecretSharing.recuperar_secretos_empaquetados(rows, mod, k, n)] == secrets
+        results[f"packed_k{k}"] = {
+            "reparto": measure(lambda: Shamirss.ShamirSecretSharing.generate_packed_shares(secrets, parties, t, k, mod), repeat),
+            "reconstruccion": measure(lambda: Shamirss.ShamirSecretSharing.recuperar_secretos_empaquetados(rows, mod, k, n), repeat),
+            "elementos_por_parte": len(rows[0]),
+            "umbral": k + t,
+        }
+    return results
+
+def field_memory(mod: int = MOD) -> dict[str, int]:
+    """
+    Retorna el tamaño en bytes de una instancia de cada clase (incluyendo su __dict__ si lo tiene).
+    """
+    legacy = LegacyField(1, mod)
+    return {
+        "legacy": sys.getsizeof(legacy) + sys.getsizeof(legacy.__dict__),
+        "slots": sys.getsizeof(Field(1, mod)),
+    }
+
+def share_memory(n: int = NUM_ELEMENTS, mod: int = MOD) -> dict[str, float]:
+    """
+    Mide la memoria (en bytes por parte) de guardar n partes de entrada:
+    - legacy: diccionario de SharedVariable indexado por UUID, como antes de ShareStore.
+    - share_store: ShareStore, con un array de 8 bytes por parte.
+    """
+    def traced(function) -> float:
+        tracemalloc.start()
+        kept = function()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del kept
+        return size / n
+
+    def legacy():
+        shares = {}
+        for i in range(n):
+            share = Protocol.SharedVariable(Field(i, mod), "usuario")
+            shares[share.uuid] = share
+        return shares
+
+    def share_store():
+        store = ShareStore(mod)
+        for i in range(n):
+            store.add("usuario", i)
+        return store
+
+    return {"legacy": traced(legacy), "share_store": traced(share_store)}
+
+def bench_receive(counts: list[int] = MESSAGE_COUNTS, repeat: int = REPEAT) -> dict[int, dict[str, float]]:
+    """
+    Mide cuánto cuesta separar una ráfaga de k mensajes INPUT_SHARE que llegan de una sola vez,
+    leyendo de a RECV_SIZE bytes como lo hace handle_client.
+
+    Se comparan:
+    - legacy: el buffer anterior (str que crece con += y se parte con split en cada lectura).
+    - frame_buffer: FrameBuffer, que extrae los mensajes en el lugar.
+
+    :return: Diccionario con el tiempo (en segundos) de cada variante, por cantidad de mensajes.
+    """
+    message = ("INPUT_SHARE=" + ";".join(["a" * 36, "12345678", str(MOD), "b" * 36]) + DELIMITADOR).encode("utf-8")
+    results = {}
+    for count in counts:
+        stream = message * count
+        chunks = [stream[i:i + RECV_SIZE] for i in range(0, len(stream), RECV_SIZE)]
+
+        def legacy():
+            received = 0
+            buffer = ""
+            for chunk in chunks:
+                buffer += chunk.decode("utf-8")
+                while DELIMITADOR in buffer:
+                    _, buffer = buffer.split(DELIMITADOR, 1)
+                    received += 1
+            return received
+
+        def frame_buffer():
+            received = [0]
+            def on_text(_):
+                received[0] += 1
+            buffer = FrameBuffer(RECV_SIZE)
+            for chunk in chunks:
+                with buffer.writable() as target:
+                    target[:len(chunk)] = chunk
+                buffer.commit(len(chunk))
+                buffer.process(on_text, None)
+            return received[0]
+
+        assert legacy() == frame_buffer() == count
+        results[count] = {function.__name__: measure(function, repeat) for function in (legacy, frame_buffer)}
+    return results
+
+def bench_sharing(party_counts: list[int] = PARTY_COUNTS, mod: int = MOD, repeat: int = REPEAT) -> dict[int, dict[str, float]]:
+    """
+    Mide, para cada cantidad de partes n, el reparto de un secreto (generate_shares con t = (n - 1) // 2, como MainUser.t)
+    y su reconstrucción con lagrange_interpolation a partir de las n partes.
+    - coeficientes: calcular los coeficientes de Lagrange sin la caché, como la primera reconstrucción con n partes.
+    - interpolacion: la reconstrucción con los coeficientes en la caché, como las siguientes.
+
+    :return: Diccionario con el tiempo (en segundos) de cada etapa, por cantidad de partes.
+    """
+    results = {}
+    for n in party_counts:
+        t = (n - 1) // 2
+        secret = random.randrange(mod)
+        sharer = Shamirss.ShamirSecretSharing(Field(secret, mod), n)
+        shares = [Protocol.SharedVariable(share, "usuario") for share in sharer.generate_shares(t)]
+        assert Lagrange.lagrange_interpolation(shares).value == secret
+        xs = tuple(range(1, n + 1))
+        results[n] = {
+            "reparto": measure(lambda: sharer.generate_shares(t), repeat),
+            "coeficientes": measure(lambda: Lagrange.lagrange_coefficients.__wrapped__(mod, xs, 0), repeat),
+            "interpolacion": measure(lambda: Lagrange.lagrange_interpolation(shares), repeat),
+        }
+    return results
+
+def bench_codec(count: int = CODEC_MESSAGES, vector_size: int = VECTOR_SIZE, repeat: int = REPEAT) -> dict[str, dict[str, float]]:
+    """
+    Mide cuánto cuesta codificar y decodificar count mensajes de partes, en texto y en formato binario:
+    - input_share: una parte de entrada (InputShareProtocol).
+    - product_vector: un vector de vector_size partes de un lote (ProductVectorProtocol).
+    Codificar es formar los bytes del mensaje (format_message o format_frame). Decodificar es separar los mensajes
+    de una ráfaga con FrameBuffer, leyendo de a RECV_SIZE bytes, y obtener sus campos (parse_message o parse_frame).
+
+    :return: Por mensaje y formato, el tiempo (en segundos) de codificar y de decodificar los count mensajes
+             y el tamaño de cada mensaje en bytes.
+    """
+    input_share = InputShareProtocol(None) # type: ignore
+    product_vector = ProductVectorProtocol(None) # type: ignore
+    values = [random.randrange(MOD) for _ in range(vector_size)]
+    uuid = "a" * 36
+    encoders = {
+        "input_share_text": lambda i: input_share.format_message(uuid, 0, i, MOD, "b" * 36),
+        "input_share_binary": lambda i: input_share.format_frame(1, 0, i, i),
+        "product_vector_text": lambda i: product_vector.format_message(uuid, 0, MOD, i, ",".join(map(str, values))),
+        "product_vector_binary": lambda i: product_vector.format_frame(1, i, values),
+    }
+    # Al decodificar texto también se convierten los valores a enteros, como en receive_message
+    parsers = {
+        "input_share": (lambda message: int(input_share.parse_message(message)[2]), input_share.parse_frame),
+        "product_vector": (lambda message: [int(value) for value in product_vector.parse_message(message)[4].split(",")], product_vector.parse_frame),
+    }
+    results = {}
+    for name, encode in encoders.items():
+        messages = count if name.startswith("input_share") else max(1, count // 100)
+        encoded = [encode(i) for i in range(messages)]
+        stream = b"".join(encoded)
+        chunks = [stream[i:i + RECV_SIZE] for i in range(0, len(stream), RECV_SIZE)]
+        parse_text, parse_frame = parsers[name.rsplit("_", 1)[0]]
+
+        def decode():
+            decoded = []
+            def on_text(message: str):
+                decoded.append(parse_text(message.split(SEPARADOR_IDENTIFICADOR, 1)[1]))
+            def on_frame(opcode: int, payload: memoryview):
+                decoded.append(parse_frame(payload))
+            buffer = FrameBuffer(RECV_SIZE)
+            for chunk in chunks:
+                with buffer.writable() as target:
+                    target[:len(chunk)] = chunk
+                buffer.commit(len(chunk))
+                buffer.process(on_text, on_frame)
+            return decoded
+
+        assert len(decode()) == messages
+        results[name] = {
+            "mensajes": messages,
+            "bytes_por_mensaje": len(encoded[0]),
+            "codificar": measure(lambda: [encode(i) for i in range(messages)], repeat),
+            "decodificar": measure(decode, repeat),
+        }
+    return results
+
+def bench_end_to_end(party_counts: list[int] = E2E_PARTIES, repeat: int = REPEAT, base_port: int = E2E_BASE_PORT,
+                     timeout: float = 60.0) -> dict[int, dict[str, float]]:
+    """
+    Mide la latencia del producto seguro de n números (uno por usuario) con n usuarios en localhost,
+    cada uno con su servidor, como en TestNetwork. Cada repetición usa una sesión nueva sobre las mismas conexiones.
+    - conexion: conectar a todos los usuarios entre sí (una vez).
+    - reparto: desde que se envían los números hasta que todos tienen todas las partes de entrada.
+    - producto: desde la primera operación hasta que todos tienen todas las partes finales (en cadena, n - 1 rondas).
+    - arbol: lo mismo multiplicando en forma de árbol (ceil(log2 n) rondas).
+    - total: reparto y producto en cadena, más la reconstrucción.
+    Se toma el mejor tiempo de las repeticiones. Los mensajes de los usuarios no se muestran,
+    y los usuarios se cierran (MainUser.close) al terminar cada cantidad, antes de volver a mostrar la salida.
+
+    :return: Diccionario con el tiempo (en segundos) de cada etapa, por cantidad de usuarios.
+    """
+    import TestNetwork
+
+    def timed(start, wait) -> float:
+        begin = time.perf_counter()
+        start()
+        assert all(wait(user) for user in users), "Se agotó el tiempo de espera"
+        return time.perf_counter() - begin
+
+    results = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for n in party_counts:
+            users = TestNetwork.create_users(n, MOD, base_port)
+            base_port += n
+            begin = time.perf_counter()
+            TestNetwork.connect_users(users)
+            connection = time.perf_counter() - begin
+            stages: dict[str, list[float]] = {"reparto": [], "producto": [], "arbol": [], "total": []}
+            for _ in range(repeat):
+                for tree in (False, True):
+                    session = users[0].openSession()
+                    for user in users[1:]:
+                        user.openSession(session)
+                    numbers = [random.randrange(1, MOD) for _ in users]
+                    begin_total = time.perf_counter()
+                    share = timed(lambda: [user.send_number(number, session=session) for user, number in zip(users, numbers)],
+                                  lambda user: user.waitForInputs(n, timeout, session))
+                    if tree:
+                        product = timed(lambda: [user.sendTreeOperation(session=session) for user in users],
+                                        lambda user: user.waitForFinalShares(timeout, session))
+                    else:
+                        product = timed(lambda: [user.sendOperation(session=session) for user in users],
+                                        lambda user: user.waitForFinalShares(timeout, session))
+                    expected = Field(1, MOD)
+                    for number in numbers:
+                        expected *= Field(number, MOD)
+                    assert users[0].reconstruct_secret(0, session) == expected
+                    if tree:
+                        stages["arbol"].append(product)
+                    else:
+                        stages["reparto"].append(share)
+                        stages["producto"].append(product)
+                        stages["total"].append(time.perf_counter() - begin_total)
+                    for user in users:
+                        user.closeSession(session)
+            for user in users:
+                user.close()
+            results[n] = {"conexion": connection, **{name: min(times) for name, times in stages.items()}}
+    return results
+
+def print_results(title: str, results: dict[str, float], n: int, baseline: str):
+    """
+    Imprime una tabla con el tiempo, las operaciones por segundo y la mejora respecto a baseline.
+    """
+    print(title)
+    for name, seconds in results.items():
+        print(f"  - {name:<12} {seconds * 1000:9.2f} ms  {n / seconds:14,.0f} ops/s  x{results[baseline] / seconds:.2f}")
+
+def run_suites(suites: list[str], args) -> dict:
+    """
+    Ejecuta las mediciones indicadas y retorna sus resultados, por nombre de la medición.
+    """
+    benchmarks = {
+        "field": lambda: bench_field_ops(args.n, args.mod, args.repeat),
+        "backends": lambda: bench_backends(args.n, repeat=args.repeat),
+        "packed": lambda: bench_packed(args.n, mod=args.mod, repeat=args.repeat),
+        "memory": lambda: {"por_instancia": field_memory(args.mod), "por_parte_de_entrada": share_memory(args.n, args.mod)},
+        "receive": lambda: bench_receive(repeat=args.repeat),
+        "sharing": lambda: bench_sharing(args.parties, args.mod, args.repeat),
+        "codec": lambda: bench_codec(repeat=args.repeat),
+        "e2e": lambda: bench_end_to_end(args.e2e_parties, args.repeat, args.port),
+    }
+    return {suite: benchmarks[suite]() for suite in suites}
+
+def print_suites(results: dict, args):
+    """
+    Muestra los resultados de run_suites por consola.
+    """
+    if "field" in results:
+        print_results(f"Multiplicación y acumulación (n={args.n}, p={args.mod})", results["field"], args.n, "legacy")
+    for mod, loops in results.get("backends", {}).items():
+        for loop, result in loops.items():
+            print_results(f"Contextos de campo, ciclo {loop} (n={args.n}, p={mod})", result, args.n, "generic")
+    if "packed" in results:
+        print(f"Reparto empaquetado (n={args.n} secretos, {PACKED_PARTIES} partes, t={PACKED_THRESHOLD})")
+        for name, result in results["packed"].items():
+            print(f"  - {name:<12} reparto {result['reparto'] * 1000:9.2f} ms  reconstrucción {result['reconstruccion'] * 1000:9.2f} ms"
+                  f"  {result['elementos_por_parte']:6} elementos por parte  umbral {result['umbral']}")
+    if "memory" in results:
+        print("Memoria por instancia: ", *(f"{name}={size} bytes" for name, size in results["memory"]["por_instancia"].items()))
+        print("Memoria por parte de entrada: ", *(f"{name}={size:.1f} bytes" for name, size in results["memory"]["por_parte_de_entrada"].items()))
+    for count, result in results.get("receive", {}).items():
+        print_results(f"Recepción de una ráfaga de mensajes (k={count})", result, count, "legacy")
+    if "sharing" in results:
+        print(f"Reparto e interpolación de un secreto (p={args.mod})")
+        for n, result in results["sharing"].items():
+            print(f"  - n={n:<4} reparto {result['reparto'] * 1e6:9.1f} µs  coeficientes {result['coeficientes'] * 1e6:9.1f} µs"
+                  f"  interpolación {result['interpolacion'] * 1e6:9.1f} µs")
+    if "codec" in results:
+        print("Codificación de mensajes")
+        for name, result in results["codec"].items():
+            count = result["mensajes"]
+            print(f"  - {name:<22} {result['bytes_por_mensaje']:6} bytes  codificar {count / result['codificar']:12,.0f} msg/s"
+                  f"  decodificar {count / result['decodificar']:12,.0f} msg/s")
+    if "e2e" in results:
+        print("Producto seguro en localhost")
+        for n, result in results["e2e"].items():
+            print(f"  - n={n:<4}", *(f"{name} {seconds * 1000:8.1f} ms" for name, seconds in result.items()))
+
+def main():
+    """
+    Ejecuta las mediciones y muestra los resultados por consola.
+    Con --json también se guardan en un archivo JSON (o se escriben en la salida estándar con "-"),
+    junto con los parámetros y la versión de Python, para comparar ejecuciones y detectar regresiones.
+    """
+    parser = argparse.ArgumentParser(description="Mediciones de rendimiento de las operaciones del campo, el reparto y la red.")
+    parser.add_argument("-n", help="Número de elementos por medición.", type=int, default=NUM_ELEMENTS)
+    parser.add_argument("--repeat", help="Número de repeticiones por medición.", type=int, default=REPEAT)
+    parser.add_argument("--mod", help="Módulo del campo.", type=int, default=MOD)
+    parser.add_argument("--suite", help="Mediciones que se ejecutan (por defecto todas).", nargs="+", choices=SUITES, default=SUITES)
+    parser.add_argument("--parties", help="Cantidades de partes del reparto y la interpolación.", type=int, nargs="+", default=PARTY_COUNTS)
+    parser.add_argument("--e2e-parties", help="Cantidades de usuarios del producto en localhost.", type=int, nargs="+", default=E2E_PARTIES)
+    parser.add_argument("--port", help="Primer puerto de los usuarios del producto en localhost.", type=int, default=E2E_BASE_PORT)
+    parser.add_argument("--json", help="Archivo donde se guardan los resultados en JSON, o - para la salida estándar.", type=str, required=False)
+    args = parser.parse_args()
+
+    suites = [suite for suite in SUITES if suite in args.suite]
+    if args.json == "-":
+        with contextlib.redirect_stdout(sys.stderr):
+            results = run_suites(suites, args)
+    else:
+        results = run_suites(suites, args)
+        print_suites(results, args)
+
+    if args.json is not None:
+        report = {
+            "fecha": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "parametros": {"n": args.n, "repeat": args.repeat, "mod": args.mod, "parties": args.parties, "e2e_parties": args.e2e_parties},
+            "unidad": "segundos, salvo memory (bytes) y los campos mensajes, bytes_por_mensaje, elementos_por_parte y umbral",
+            "resultados": results,
+        }
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as file:
+                json.dump(report, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import json
+import time
+
+import NetworkUser
+import Beaver
+from field_operations import Field
+
+LINEAR_OPERATIONS = ("add", "cmul", "cadd")
+MULTIPLICATION = "mul"
+OPERATIONS = LINEAR_OPERATIONS + (MULTIPLICATION,)
+"""
+Operaciones que puede tener una compuerta del circuito.
+
+add: Suma de todas sus entradas.
+cmul: Multiplica su entrada por una constante pública.
+cadd: Suma una constante pública a su entrada.
+mul: Multiplica sus dos entradas. Es la única que necesita comunicación.
+"""
+
+class CircuitInput:
+    """
+    Entrada con nombre del circuito.
+    owner es el usuario que comparte el valor: su UUID o su dirección "ip:puerto".
+    Si un usuario tiene varias entradas, se asignan en el orden en que envía sus números.
+    """
+    def __init__(self, name: str, owner: str):
+        self.name = name
+        self.owner = str(owner)
+
+class Gate:
+    """
+    Compuerta del circuito. Su salida es un nuevo valor con el nombre de la compuerta.
+    constant solo se usa en las operaciones cmul y cadd.
+    """
+    def __init__(self, name: str, operation: str, inputs: list[str], constant: int = 0):
+        self.name = name
+        self.operation = operation
+        self.inputs = inputs
+        self.constant = constant
+
+    @property
+    def linear(self) -> bool:
+        """
+        Las compuertas lineales se evalúan localmente sobre las partes, sin comunicación.
+        """
+        return self.operation in LINEAR_OPERATIONS
+
+    def evaluate(self, values: list[Field]) -> Field:
+        """
+        Evalúa una compuerta lineal sobre las partes (o los valores) de sus entradas.
+        Sumar la misma constante a todas las partes da partes de la suma, porque los coeficientes de Lagrange suman 1.
+        """
+        if self.operation == "add":
+            return sum(values) # type: ignore
+        if self.operation == "cmul":
+            return values[0] * Field(self.constant, values[0].mod)
+        if self.operation == "cadd":
+            return values[0] + Field(self.constant, values[0].mod)
+        raise Exception(f"La compuerta {self.name} no es lineal")
+
+class Circuit:
+    """
+    Circuito aritmético descrito como un grafo dirigido acíclico de compuertas sobre entradas con nombre.
+
+    Se carga desde un archivo JSON con la siguiente estructura:
+    {
+        "inputs": [ { "name": "a", "owner": "uuid o ip:puerto" }, ... ],
+        "gates": [
+            { "name": "ab", "op": "mul", "inputs": ["a", "b"] },
+            { "name": "s", "op": "add", "inputs": ["ab", "c"] },
+            { "name": "w", "op": "cmul", "inputs": ["s"], "constant": 3 },
+            { "name": "p", "op": "cadd", "inputs": ["w"], "constant": 7 }
+        ],
+        "outputs": ["p"]
+    }
+
+    Al crearse, se ordenan las compuertas topológicamente y se calcula la profundidad multiplicativa de cada valor.
+    Las multiplicaciones con la misma profundidad no dependen entre sí, así que se agrupan en una misma ronda.
+    """
+    def __init__(self, inputs: list[CircuitInput], gates: list[Gate], outputs: list[str]):
+        self.inputs = inputs
+        self.outputs = outputs
+        self.gates = self.sort_gates(inputs, gates)
+        self.depth = self.compute_depth()
+
+        for output in outputs:
+            if output not in self.depth:
+                raise Exception(f"Salida no definida: {output}")
+
+    @staticmethod
+    def load(path: str) -> "Circuit":
+        """
+        Lee un circuito desde un archivo JSON.
+        """
+        with open(path, 'r', encoding='utf-8') as file:
+            return Circuit.from_dict(json.load(file))
+
+    @staticmethod
+    def from_dict(data: dict) -> "Circuit":
+        """
+        Crea un circuito a partir del diccionario leído del archivo JSON.
+        """
+        inputs = [CircuitInput(item["name"], item["owner"]) for item in data.get("inputs", [])]
+        gates = []
+        for item in data.get("gates", []):
+            operation = item.get("op")
+            if operation not in OPERATIONS:
+                raise Exception(f"Operación no reconocida en la compuerta {item.get('name')}: {operation}")
+            gates.append(Gate(item["name"], operation, list(item.get("inputs", [])), int(item.get("constant", 0))))
+        return Circuit(inputs, gates, list(data.get("outputs", [])))
+
+    @staticmethod
+    def sort_gates(inputs: list[CircuitInput], gates: list[Gate]) -> list[Gate]:
+        """
+        Ordena las compuertas de forma que cada una aparezca después de las que calculan sus entradas.
+        Se verifica que los nombres sean únicos, que las entradas existan, el número de entradas de cada operación
+        y que no haya ciclos.
+        """
+        names = [item.name for item in inputs] + [gate.name for gate in gates]
+        if len(names) != len(set(names)):
+            raise Exception("Los nombres de las entradas y compuertas deben ser únicos")
+
+        for gate in gates:
+            if gate.operation == MULTIPLICATION and len(gate.inputs) != 2:
+                raise Exception(f"La compuerta {gate.name} debe tener dos entradas")
+            if gate.operation in ("cmul", "cadd") and len(gate.inputs) != 1:
+                raise Exception(f"La compuerta {gate.name} debe tener una entrada")
+            if not gate.inputs:
+                raise Exception(f"La compuerta {gate.name} no tiene entradas")
+            for name in gate.inputs:
+                if name not in names:
+                    raise Exception(f"Entrada no definida en la compuerta {gate.name}: {name}")
+
+        known = {item.name for item in inputs}
+        pending = list(gates)
+        ordered = []
+        while pending:
+            ready = [gate for gate in pending if all(name in known for name in gate.inputs)]
+            if not ready:
+                raise Exception("El circuito tiene ciclos: " + ", ".join(gate.name for gate in pending))
+            for gate in ready:
+                known.add(gate.name)
+                ordered.append(gate)
+            pending = [gate for gate in pending if gate.name not in known]
+        return ordered
+
+    def compute_depth(self) -> dict[str, int]:
+        """
+        Calcula la profundidad multiplicativa de cada valor: 0 para las entradas,
+        la máxima de sus entradas para las compuertas lineales y una más para las multiplicaciones.
+        """
+        depth = {item.name: 0 for item in self.inputs}
+        for gate in self.gates:
+            base = max(depth[name] for name in gate.inputs)
+            depth[gate.name] = base + 1 if gate.operation == MULTIPLICATION else base
+        return depth
+
+    @property
+    def multiplications(self) -> int:
+        """
+        Cantidad de compuertas de multiplicación del circuito (una tripleta de Beaver por cada una).
+        """
+        return sum(1 for gate in self.gates if gate.operation == MULTIPLICATION)
+
+    @property
+    def multiplicative_depth(self) -> int:
+        """
+        Cantidad de rondas de multiplicación que necesita el circuito.
+        """
+        return max(self.depth.values(), default=0)
+
+    def schedule(self) -> list[list[Gate]]:
+        """
+        Agrupa las compuertas en etapas. La etapa d contiene las multiplicaciones de profundidad d,
+        seguidas de las compuertas lineales de profundidad d que se pueden evaluar después de ellas.
+        La etapa 0 solo tiene compuertas lineales sobre las entradas.
+        """
+        stages: list[list[Gate]] = [[] for _ in range(self.multiplicative_depth + 1)]
+        for gate in self.gates:
+            if gate.operation == MULTIPLICATION:
+                stages[self.depth[gate.name]].append(gate)
+        for gate in self.gates:
+            if gate.linear:
+                stages[self.depth[gate.name]].append(gate)
+        return stages
+
+    def evaluate_plain(self, values: dict[str, int], mod: int) -> dict[str, Field]:
+        """
+        Evalúa el circuito con los valores reales de las entradas, sin compartirlos.
+        Se usa para verificar el resultado del protocolo.
+        """
+        wires = {name: Field(value, mod) for name, value in values.items()}
+        for gate in self.gates:
+            inputs = [wires[name] for name in gate.inputs]
+            wires[gate.name] = inputs[0] * inputs[1] if gate.operation == MULTIPLICATION else gate.evaluate(inputs)
+        return {name: wires[name] for name in self.outputs}
+
+    def assign_inputs(self, numbers: dict[str, list[int]]) -> dict[str, int]:
+        """
+        Asigna los números de cada usuario a las entradas del circuito, en el orden en que aparecen.
+        numbers se indexa por el mismo identificador que se usa en owner.
+        """
+        positions: dict[str, int] = {}
+        values = {}
+        for item in self.inputs:
+            position = positions.get(item.owner, 0)
+            owned = numbers.get(item.owner, [])
+            if position >= len(owned):
+                raise Exception(f"El usuario {item.owner} no tiene un número para la entrada {item.name}")
+            values[item.name] = owned[position]
+            positions[item.owner] = position + 1
+        return values
+
+    def __str__(self):
+        return f"Circuit(inputs={len(self.inputs)}, gates={len(self.gates)}, outputs={self.outputs}, depth={self.multiplicative_depth})"
+
+class CircuitEvaluator:
+    """
+    Evalúa un circuito sobre la red con un MainUser.
+
+    Las compuertas lineales se evalúan localmente sobre las partes. Todas las multiplicaciones de una etapa
+    se envían juntas con MainUser.multiplyBatch, así que el circuito toma tantas rondas como su profundidad multiplicativa,
+    sin importar cuántas multiplicaciones tenga. Al final, las salidas se abren juntas con MainUser.openBatch.
+
+    Si se indica una reserva de tripletas de Beaver, las multiplicaciones de cada etapa se hacen con ellas:
+    solo se abren los valores enmascarados, sin repartir polinomios durante el cálculo.
+
+    Todos los usuarios deben evaluar el mismo circuito, en el mismo orden respecto a otros lotes.
+    Las entradas y los lotes son los de la sesión indicada (ver Session), así se pueden evaluar varios circuitos a la vez.
+    Se guarda el tiempo de cada etapa en timings.
+    """
+    def __init__(self, user: "NetworkUser.MainUser", circuit: Circuit, triples: "Beaver.TriplePool | None" = None, session: int = 0):
+        self.user = user
+        self.circuit = circuit
+        self.triples = triples
+        self.session = session
+        self.wires: dict[str, Field] = {}
+        self.timings: dict[str, float] = {}
+
+    def resolve_owner(self, owner: str) -> str | None:
+        """
+        Retorna el UUID del usuario indicado por su UUID o por su dirección "ip:puerto".
+        """
+        if owner in self.user.party:
+            return owner
+        for user in self.user.party.values():
+            if f"{user.ip}:{user.port}" == owner:
+                return user.uuid
+        return None
+
+    def load_inputs(self):
+        """
+        Asigna las partes recibidas a las entradas del circuito.
+        Las partes de cada usuario se toman en el orden en que llegaron, que es el orden en que las envió.
+        """
+        positions: dict[str, int] = {}
+        for item in self.circuit.inputs:
+            uuid = self.resolve_owner(item.owner)
+            if uuid is None:
+                raise Exception(f"Usuario desconocido para la entrada {item.name}: {item.owner}")
+            position = positions.get(uuid, 0)
+            owned = self.user.getInputShares(uuid, self.session)
+            if position >= len(owned):
+                raise Exception(f"No se ha recibido la parte de la entrada {item.name}")
+            self.wires[item.name] = owned[position]
+            positions[uuid] = position + 1
+
+    def run(self, timeout: float | None = None) -> dict[str, Field]:
+        """
+        Evalúa el circuito y retorna el valor abierto de cada salida.
+        timeout es el tiempo máximo que se espera a las entradas y a cada ronda.
+        """
+        start = time.perf_counter()
+        if not self.user.waitForInputs(len(self.circuit.inputs), timeout, self.session):
+            raise Exception("No se recibieron todas las entradas del circuito")
+        self.load_inputs()
+        self.timings["entradas"] = time.perf_counter() - start
+
+        for depth, stage in enumerate(self.circuit.schedule()):
+            stage_start = time.perf_counter()
+            multiplications = [gate for gate in stage if gate.operation == MULTIPLICATION]
+            if multiplications:
+                left = [self.wires[gate.inputs[0]] for gate in multiplications]
+                right = [self.wires[gate.inputs[1]] for gate in multiplications]
+                if self.triples is not None:
+                    results = self.triples.multiply(left, right, timeout)
+                else:
+                    results = self.user.waitForBatch(self.user.multiplyBatch(left, right, session=self.session), timeout, self.session)
+                if results is None:
+                    raise Exception(f"No se completó la ronda de multiplicación {depth}")
+                for gate, result in zip(multiplications, results):
+                    self.wires[gate.name] = result
+            for gate in stage:
+                if gate.linear:
+                    self.wires[gate.name] = gate.evaluate([self.wires[name] for name in gate.inputs])
+            self.timings[f"etapa {depth} ({len(multiplications)} mult.)"] = time.perf_counter() - stage_start
+
+        open_start = time.perf_counter()
+        opened = self.user.waitForBatch(self.user.openBatch([self.wires[name] for name in self.circuit.outputs], session=self.session), timeout, self.session)
+        if opened is None:
+            raise Exception("No se pudieron abrir las salidas del circuito")
+        self.timings["apertura"] = time.perf_counter() - open_start
+        self.timings["total"] = time.perf_counter() - start
+        return dict(zip(self.circuit.outputs, opened))
+
+    def report(self):
+        """
+        Imprime en la consola el tiempo de cada etapa.
+        """
+        print(f"Tiempos de {self.circuit}:")
+        for name, seconds in self.timings.items():
+            print(f"  - {name:<24} {seconds * 1000:9.2f} ms")
@@ -0,0 +1,350 @@
+import ssl
+import socket
+import threading
+import time
+from collections import deque
+from socket import socket as Socket, AF_INET, SOCK_STREAM
+
+KEEPALIVE_INTERVAL = 15.0
+"""
+Cada cuántos segundos se revisan las conexiones del pool (ConnectionPool.check).
+"""
+
+SEND_QUEUE_BYTES = 4 * 2**20
+"""
+Cantidad máxima de bytes pendientes de envío hacia un usuario. Si se alcanza, send espera a que el hilo escritor
+libere espacio (contrapresión), así un usuario lento no hace crecer la memoria sin límite.
+"""
+
+COALESCE_BYTES = 256 * 2**10
+"""
+Cantidad máxima de bytes de mensajes encolados que el hilo escritor junta en una sola escritura.
+"""
+
+class PooledConnection:
+    """
+    Conexión segura de salida hacia un usuario, que se puede usar desde varios hilos.
+
+    Como las rondas avanzan en cuanto llegan las partes, el hilo que recibe mensajes
+    puede enviar la siguiente ronda al mismo tiempo que el hilo principal envía a la misma conexión.
+    Un ssl.SSLSocket no admite escrituras simultáneas, así que cada envío se hace con un candado.
+
+    Si un envío falla porque la conexión se cerró, se vuelve a abrir (reanudando la sesión TLS si se puede)
+    y se reenvía el mensaje completo. El objeto no cambia, así que quien lo tenga guardado
+    (NetworkUser.host, los conjuntos de MainUser) sigue usando la conexión nueva.
+    El resto de los métodos se delegan al socket.
+
+    Cuando la conexión se añade al pool (ConnectionPool.adopt) se inicia un hilo escritor: desde entonces send solo encola
+    el mensaje y retorna, y el hilo escribe los mensajes pendientes juntos (hasta COALESCE_BYTES) en un solo sendall.
+    Así, repartir a todos los usuarios tarda lo que el más lento y no la suma de todos, y el orden de los mensajes
+    hacia cada usuario se conserva. Si hay más de SEND_QUEUE_BYTES pendientes, send espera. Los errores del hilo
+    escritor se informan al pool (ConnectionPool.report_error), porque quien llamó a send ya retornó.
+    """
+    def __init__(self, pool: "ConnectionPool", ip: str, port: int, connection: ssl.SSLSocket):
+        self.pool = pool
+        self.ip = ip
+        self.port = port
+        self.connection = connection
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.pending: deque[bytes] = deque()
+        self.pending_bytes = 0
+        self.queue_changed = threading.Condition()
+        self.writer: threading.Thread | None = None
+        self.closed = False
+
+    def send(self, data: bytes) -> int:
+        """
+        Envía los datos. Si el hilo escritor está activo, se encolan y se retorna sin esperar a que se escriban,
+        salvo que haya demasiados bytes pendientes.
+        """
+        if self.writer is None:
+            self.write(data)
+            return len(data)
+        with self.queue_changed:
+            self.queue_changed.wait_for(lambda: self.pending_bytes < SEND_QUEUE_BYTES or self.closed)
+            if self.closed:
+                raise OSError(f"La conexión con {self.ip}:{self.port} está cerrada")
+            self.pending.append(data)
+            self.pending_bytes += len(data)
+            self.queue_changed.notify_all()
+        return len(data)
+
+    def write(self, data: bytes):
+        """
+        Escribe los datos en el socket, reabriendo la conexión una vez si se cerró.
+        """
+        with self.lock:
+            try:
+                self.connection.sendall(data)
+            except OSError:
+                self.reopen()
+                self.connection.sendall(data)
+            self.last_used = time.monotonic()
+
+    def start_writer(self):
+        """
+        Inicia el hilo escritor, si no está iniciado.
+        """
+        with self.queue_changed:
+            if self.writer is None and not self.closed:
+                self.writer = threading.Thread(target=self.write_pending, daemon=True)
+                self.writer.start()
+
+    def write_pending(self):
+        """
+        Ciclo del hilo escritor: toma los mensajes pendientes (hasta COALESCE_BYTES) y los escribe juntos.
+        Termina cuando la conexión se cierra y ya no hay mensajes pendientes.
+        Los bytes que se están escribiendo siguen contando como pendientes, así la contrapresión incluye la escritura en curso.
+        """
+        while True:
+            with self.queue_changed:
+                self.queue_changed.wait_for(lambda: self.pending or self.closed)
+                if not self.pending:
+                    return
+                batch = [self.pending.popleft()]
+                size = len(batch[0])
+                while self.pending and size + len(self.pending[0]) <= COALESCE_BYTES:
+                    size += len(self.pending[0])
+                    batch.append(self.pending.popleft())
+            try:
+                self.write(b"".join(batch))
+                self.pool.count_write(len(batch))
+            except Exception as e:
+                self.pool.report_error(self, e, len(batch))
+            with self.queue_changed:
+                self.pending_bytes -= size
+                self.queue_changed.notify_all()
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """
+        Espera a que se escriban todos los mensajes pendientes. Retorna False si se agota el tiempo de espera.
+        """
+        with self.queue_changed:
+            return self.queue_changed.wait_for(lambda: self.pending_bytes == 0, timeout)
+
+    def sendall(self, data: bytes):
+        self.send(data)
+
+    def check(self) -> bool:
+        """
+        Revisa si la conexión sigue abierta, sin bloquear.
+        Las conexiones de salida solo se escriben, así que una lectura sin bloqueo solo puede
+        encontrar el cierre de la conexión o los tickets de sesión que envía el servidor con TLS 1.3.
+        Si se cerró, se vuelve a abrir. Se retorna False si se tuvo que reabrir.
+        """
+        with self.lock:
+            alive = True
+            try:
+                self.connection.setblocking(False)
+                alive = self.connection.recv(1) != b""
+            except (ssl.SSLWantReadError, BlockingIOError):
+                pass
+            except OSError:
+                alive = False
+            finally:
+                try:
+                    self.connection.setblocking(True)
+                except OSError:
+                    alive = False
+            self.pool.save_session(self.ip, self.port, self.connection)
+            if not alive:
+                self.reopen()
+            return alive
+
+    def reopen(self):
+        """
+        Cierra el socket actual y abre uno nuevo con el mismo usuario. Se debe llamar con el candado tomado.
+        """
+        try:
+            self.connection.close()
+        except OSError:
+            pass
+        self.connection = self.pool.wrap(self.ip, self.port)
+        self.pool.reopened += 1
+
+    def close(self):
+        """
+        Cierra la conexión después de escribir los mensajes pendientes.
+        """
+        with self.queue_changed:
+            self.closed = True
+            self.queue_changed.notify_all()
+        if self.writer is not None and self.writer is not threading.current_thread():
+            self.writer.join()
+        with self.lock:
+            self.pool.save_session(self.ip, self.port, self.connection)
+            self.connection.close()
+
+    def __getattr__(self, name: str):
+        return getattr(self.connection, name)
+
+class ConnectionPool:
+    """
+    Conexiones de salida de un MainUser, indexadas por el UUID de cada usuario.
+
+    Las conexiones se mantienen abiertas entre cálculos (ver MainUser.resetComputation), así que
+    un cálculo nuevo con los mismos usuarios no vuelve a abrir conexiones ni a hacer el handshake TLS.
+    Cada socket tiene SO_KEEPALIVE, y un hilo revisa las conexiones cada KEEPALIVE_INTERVAL segundos
+    y vuelve a abrir las que se cerraron. close detiene ese hilo.
+
+    Las sesiones TLS se guardan en memoria por dirección, y al abrir otra conexión con la misma dirección se reanuda
+    la sesión, lo que evita el intercambio de claves y la verificación del certificado.
+    Solo se reanudan dentro del mismo proceso: no se guardan en disco, así que un usuario que se reinicia
+    vuelve a hacer el handshake completo con cada usuario.
+    Con TLS 1.3 el ticket de sesión llega después del handshake, así que se recoge al revisar la conexión (check).
+    """
+    def __init__(self, context: ssl.SSLContext, hostname: str):
+        self.context = context
+        self.hostname = hostname
+        self.connections: dict[str, PooledConnection] = {}
+        self.sessions: dict[tuple[str, int], ssl.SSLSession] = {}
+        self.lock = threading.Lock()
+        self.handshakes = 0
+        self.resumed = 0
+        self.reopened = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.send_errors = 0
+        self.on_error = None
+        self.keepalive_thread: threading.Thread | None = None
+        self.stop_keepalive = threading.Event()
+
+    def wrap(self, ip: str, port: int) -> ssl.SSLSocket:
+        """
+        Abre un socket seguro con la dirección indicada, reanudando la sesión TLS guardada si la hay.
+        """
+        connection = Socket(AF_INET, SOCK_STREAM)
+        connection.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        secure_connection = self.context.wrap_socket(connection, server_hostname=self.hostname, session=self.sessions.get((ip, port)))
+        try:
+            secure_connection.connect((ip, port))
+        except Exception:
+            secure_connection.close()
+            raise
+        with self.lock:
+            self.handshakes += 1
+            if secure_connection.session_reused:
+                self.resumed += 1
+        self.save_session(ip, port, secure_connection)
+        return secure_connection
+
+    def save_session(self, ip: str, port: int, connection: ssl.SSLSocket):
+        """
+        Guarda la sesión TLS de la conexión, si se puede reanudar.
+        """
+        session = connection.session
+        if session is not None and session.has_ticket:
+            self.sessions[(ip, port)] = session
+
+    def open(self, ip: str, port: int) -> PooledConnection:
+        """
+        Abre una conexión nueva con la dirección indicada. Se añade al pool con adopt, cuando se conoce el UUID del usuario.
+        """
+        return PooledConnection(self, ip, port, self.wrap(ip, port))
+
+    def adopt(self, uuid: str, connection):
+        """
+        Añade al pool la conexión con el usuario uuid e inicia su hilo escritor.
+        """
+        with self.lock:
+            self.connections[uuid] = connection
+        if isinstance(connection, PooledConnection):
+            connection.start_writer()
+
+    def count_write(self, messages: int):
+        """
+        Registra una escritura del hilo escritor con la cantidad de mensajes que juntó.
+        """
+        with self.lock:
+            self.writes += 1
+            self.coalesced += messages - 1
+
+    def report_error(self, connection: PooledConnection, error: Exception, messages: int):
+        """
+        Registra que no se pudieron escribir messages mensajes hacia una conexión, y llama a on_error si está definido.
+        Lo usan el hilo escritor de cada conexión y los protocolos que siguen enviando a los demás usuarios cuando falla uno.
+        """
+        with self.lock:
+            self.send_errors += messages
+        if self.on_error is not None:
+            self.on_error(connection, error, messages)
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """
+        Espera a que se escriban los mensajes pendientes de todas las conexiones.
+        Retorna False si se agota el tiempo de espera con alguna.
+        """
+        with self.lock:
+            connections = list(self.connections.values())
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for connection in connections:
+            if isinstance(connection, PooledConnection):
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not connection.drain(remaining):
+                    return False
+        return True
+
+    def get(self, uuid: str):
+        return self.connections.get(uuid)
+
+    def check(self) -> int:
+        """
+        Revisa todas las conexiones del pool y vuelve a abrir las que se cerraron.
+        Se retorna la cantidad de conexiones que se reabrieron.
+        """
+        with self.lock:
+            connections = list(self.connections.values())
+        reopened = 0
+        for connection in connections:
+            if not isinstance(connection, PooledConnection):
+                continue
+            try:
+                if not connection.check():
+                    reopened += 1
+            except OSError:
+                pass
+        return reopened
+
+    def start_keepalive(self, interval: float = KEEPALIVE_INTERVAL):
+        """
+        Inicia el hilo que revisa las conexiones cada interval segundos, hasta que se cierre el pool.
+        """
+        if self.keepalive_thread is not None:
+            return
+        def run():
+            while not self.stop_keepalive.wait(interval):
+                self.check()
+        self.keepalive_thread = threading.Thread(target=run, daemon=True)
+        self.keepalive_thread.start()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Retorna la cantidad de conexiones, handshakes, sesiones reanudadas, conexiones reabiertas,
+        escrituras de los hilos escritores, mensajes que se juntaron con otro en una escritura y mensajes que no se pudieron enviar.
+        """
+        return {
+            "conexiones": len(self.connections),
+            "handshakes": self.handshakes,
+            "sesiones_reanudadas": self.resumed,
+            "reconexiones": self.reopened,
+            "escrituras": self.writes,
+            "mensajes_agrupados": self.coalesced,
+            "errores_envio": self.send_errors,
+        }
+
+    def close(self):
+        """
+        Detiene el hilo que revisa las conexiones y cierra todas las conexiones del pool.
+        Las sesiones TLS se conservan mientras exista el pool.
+        """
+        self.stop_keepalive.set()
+        if self.keepalive_thread is not None and self.keepalive_thread is not threading.current_thread():
+            self.keepalive_thread.join()
+        with self.lock:
+            connections, self.connections = list(self.connections.values()), {}
+        for connection in connections:
+            try:
+                connection.close()
+            except OSError:
+                pass
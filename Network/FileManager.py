@@ -1,9 +1,15 @@
 import json
 import NetworkUser
-import time
+import Circuit
+import Beaver
 from field_operations import Field
 
-WAIT_TIME = 3.5
+WAIT_TIME: float | None = None
+"""
+Tiempo máximo (en segundos) que se espera a cada etapa del protocolo.
+Las etapas avanzan en cuanto llegan los mensajes. Con None se espera indefinidamente,
+por ejemplo a los usuarios que están usando la consola.
+"""
 
 class ConnectionsFile:
     """
@@ -53,9 +59,11 @@ class ConnectionsFile:
             print(f"Error al leer el archivo JSON: {e}")
             return None
         
-    def create_host(self, ip: str | None, port: int | None, uuid: str | None) -> NetworkUser.MainUser:
+    def create_host(self, ip: str | None, port: int | None, uuid: str | None, binary: bool = True, user_class: type[NetworkUser.MainUser] = NetworkUser.MainUser, share_store: str | None = None) -> NetworkUser.MainUser:
         """
         Crea el objeto del host con la información del archivo de conexiones.
+        user_class permite elegir el motor de red (MainUser o AsyncNetworkUser.AsyncMainUser).
+        share_store es el archivo donde se guardan las partes de entrada (ver ShareStore).
         """
         if ip is None :
             ip = self.host.get("ip")
@@ -67,7 +75,7 @@ class ConnectionsFile:
         if ip is None or port is None:
             raise Exception("Faltan datos para crear el host.")
 
-        host = NetworkUser.MainUser(ip, port, uuid)
+        host = user_class(ip, port, uuid, binary, share_store=share_store)
         return host
     
     def connect_with_users(self, host: NetworkUser.MainUser):
@@ -91,7 +99,23 @@ class ConnectionsFile:
             connection = host.connect(user_ip, user_port)
             if connection is None:
                 raise Exception(f"No se pudo conectar con {user_ip}:{user_port}")
-            time.sleep(3)
+        host.waitForParty(len(self.users), WAIT_TIME)
+
+    def bootstrap(self, host: NetworkUser.MainUser):
+        """
+        Conecta al host con todos los usuarios del archivo a la vez (MainUser.bootstrap),
+        en lugar de uno por uno como connect_with_users.
+        Todos los usuarios deben usar este modo y el mismo archivo.
+        """
+        roster = [(user.get("ip"), int(user.get("port"))) for user in self.users if user.get("ip") is not None and user.get("port") is not None]
+        if not host.bootstrap(roster, WAIT_TIME):
+            raise Exception("No se pudo completar la red con todos los usuarios del archivo.")
+
+    def expected_inputs(self) -> int:
+        """
+        Retorna la cantidad total de números que se comparten entre todos los usuarios del archivo.
+        """
+        return sum(len(user.get("numbers", [])) for user in self.users)
 
     def send_shares(self, host: NetworkUser.MainUser):
         """
@@ -105,25 +129,81 @@ class ConnectionsFile:
                 continue
             numbers = user_data.get("numbers", [])
             for num in numbers:
+                if int(num) >= host.mod:
+                    print(f"Advertencia: {num} es mayor que el módulo {host.mod} y se reduce a {int(num) % host.mod}. "
+                          "Para compartirlo completo se puede dividir con Streaming.encode_integer.")
                 # Envía cada número a todas las partes conectadas
                 host.send_number(num)
-                time.sleep(WAIT_TIME)
+        host.waitForInputs(max(self.expected_inputs(), len(host.party)), WAIT_TIME)
 
-    def send_operations(self, host: NetworkUser.MainUser):
+    def share_stream(self, host: NetworkUser.MainUser, path: str, stream_id: int = 0) -> dict:
         """
-        Envía la operación de multiplicación a todas las partes conectadas.
+        Reparte el archivo indicado como un flujo (MainUser.shareFile) y espera a recibir los flujos de todos los usuarios.
+        Se retornan las estadísticas del envío.
         """
-        host.sendOperation()
-        time.sleep(WAIT_TIME * 3)
+        stats = host.shareFile(path, stream_id)
+        if host.waitForStream(stream_id, WAIT_TIME) is None:
+            print("No se recibieron los flujos de todos los usuarios.")
+        return stats
+
+    def send_operations(self, host: NetworkUser.MainUser, tree: bool = False):
+        """
+        Envía la operación de multiplicación a todas las partes conectadas.
+        Las operaciones siguientes se envían solas en cuanto se completa cada ronda,
+        así que solo se espera a que lleguen las partes finales.
+        Con tree se usa el árbol de productos (MainUser.sendTreeOperation).
+        """
+        if tree:
+            host.sendTreeOperation()
+        else:
+            host.sendOperation()
+        host.waitForFinalShares(WAIT_TIME)
 
     def reconstruct(self, host: NetworkUser.MainUser):
         """
         Reconstruye el secreto a partir de las partes recibidas.
         """
-        reconstructed_secret = host.reconstruct_secret()
+        reconstructed_secret = host.reconstruct_secret(WAIT_TIME)
         print("Reconstrucción del secreto exitosa.")
         return reconstructed_secret
     
+    def numbers_by_owner(self) -> dict[str, list[int]]:
+        """
+        Retorna los números de cada usuario del archivo, indexados por su UUID (si lo tiene) y por su dirección "ip:puerto".
+        Se usa para asignar los números a las entradas de un circuito.
+        """
+        numbers = {}
+        for user in self.users:
+            owned = [int(num) for num in user.get("numbers", [])]
+            numbers[f"{user.get('ip')}:{user.get('port')}"] = owned
+            if user.get("uuid") is not None:
+                numbers[str(user.get("uuid"))] = owned
+        return numbers
+
+    def evaluate_circuit(self, host: NetworkUser.MainUser, circuit: "Circuit.Circuit", triples_path: str | None = None) -> dict[str, Field]:
+        """
+        Evalúa un circuito con las partes recibidas y muestra el tiempo de cada etapa.
+        Se retorna el valor de cada salida.
+
+        Si se indica triples_path, las multiplicaciones usan tripletas de Beaver. Se cargan del archivo
+        (con {uuid} reemplazado por el UUID del host) y se generan las que falten. La reserva reescribe
+        el archivo cada vez que toma tripletas, antes de abrir los valores enmascarados, para que ninguna
+        tripleta se use dos veces aunque la evaluación se interrumpa.
+        """
+        pool = None
+        if triples_path is not None:
+            triples_path = triples_path.format(uuid=host.uuid)
+            pool = Beaver.TriplePool(host)
+            pool.prepare(triples_path, circuit.multiplications, WAIT_TIME)
+
+        evaluator = Circuit.CircuitEvaluator(host, circuit, pool)
+        outputs = evaluator.run(WAIT_TIME)
+        evaluator.report()
+
+        if pool is not None:
+            pool.report()
+        return outputs
+
     def real_secret(self):
         """
         Obtiene el secreto real a partir de los números de los usuarios en el archivo.
@@ -1,6 +1,44 @@
-from field_operations import Field
+from functools import lru_cache
+from field_operations import Field, PrimeField
 import Protocol
 
+LAGRANGE_CACHE_SIZE = 256
+"""
+Número máximo de conjuntos de coeficientes que se guardan en la caché.
+Cada entrada corresponde a un conjunto de partes (módulo, coordenadas x y punto requerido).
+"""
+
+@lru_cache(maxsize=LAGRANGE_CACHE_SIZE)
+def lagrange_coefficients(mod: int, xs: tuple[int, ...], required_x: int = 0) -> tuple[int, ...]:
+        """
+        Calcula los coeficientes de Lagrange para un conjunto de coordenadas x.
+
+        Los coeficientes λ_i cumplen f(required_x) = Σ λ_i · f(x_i) para todo polinomio f de grado menor que len(xs).
+        Como solo dependen del módulo, las coordenadas y el punto requerido (y no de los shares),
+        se guardan en una caché LRU, de forma que cada ronda de multiplicación y la reconstrucción
+        final reutilizan los mismos coeficientes.
+
+        :param mod: Módulo del campo.
+        :param xs: Coordenadas x ordenadas de los shares.
+        :param required_x: Valor de x que se quiere recuperar.
+        :return: Tupla con los coeficientes, en el mismo orden que xs.
+        """
+        numeradores, denominadores = [], []
+        for i, xi in enumerate(xs):
+            numerador, denominador = 1, 1
+            for j, xj in enumerate(xs):
+                if i == j:
+                    continue
+                numerador = numerador * (required_x - xj) % mod  # (x - xj)
+                denominador = denominador * (xi - xj) % mod  # (xi - xj)
+            numeradores.append(numerador)
+            denominadores.append(denominador)
+
+        # Todos los denominadores se invierten con una sola exponenciación
+        inversos = PrimeField(mod).batch_inverse(denominadores)
+        coefficients = [numerador * inverso % mod for numerador, inverso in zip(numeradores, inversos)]
+        return tuple(coefficients)
+
 def lagrange_interpolation(shares: list["Protocol.SharedVariable"], required_x = 0) -> Field:
         """
         Interpolación de Lagrange para recuperar el secreto a partir de los shares.
@@ -8,24 +46,87 @@ def lagrange_interpolation(shares: list["Protocol.SharedVariable"], required_x =
         Obtiene el x-ésimo valor de la interpolación de Lagrange a partir de los shares.
         Supone que los shares está ordenados de 1 a n.
 
+        Los coeficientes se obtienen de la caché de lagrange_coefficients,
+        así que la interpolación es un producto punto entre los shares y los coeficientes.
+
         :param shares: Lista de shares.
         :param required_x: Valor de x para el que se quiere recuperar el secreto.
         :return: El secreto recuperado.
         """
         primo = shares[0].value.mod
-        secret = Field(0, primo)
+        coefficients = lagrange_coefficients(primo, tuple(range(1, len(shares) + 1)), required_x)
+        return Field(sum(c * share.value.value for c, share in zip(coefficients, shares)), primo)
 
-        for i in range(len(shares)):
-            xi, yi = i + 1, shares[i].value
-            li = Field(1, primo)
+def lagrange_interpolation_batch(rows: list[list[int]], mod: int, required_x = 0) -> list[int]:
+        """
+        Interpolación de Lagrange de varios secretos a la vez.
 
-            for j in range(len(shares)):
-                if i == j:
-                    continue
-                xj = j + 1
-                numerador = Field(required_x - xj, primo)  # (x - xj)
-                denominador = Field(xi - xj, primo)  # (xi - xj)
-                li = li * numerador * denominador.inverse()
+        rows[i] contiene los shares que envió la parte i + 1, uno por secreto.
+        Los coeficientes se calculan una sola vez (de la caché) para todos los secretos,
+        y cada secreto es la combinación lineal de una columna de rows.
 
-            secret = secret + yi * li  # Acumulación en módulo primo
-        return secret
\ No newline at end of file
+        :param rows: Matriz de shares, una fila por parte y una columna por secreto, ordenada de 1 a n.
+        :param mod: Módulo del campo.
+        :param required_x: Valor de x para el que se quieren recuperar los secretos.
+        :return: Los secretos recuperados, en el mismo orden que las columnas.
+        """
+        coefficients = lagrange_coefficients(mod, tuple(range(1, len(rows) + 1)), required_x)
+        return [sum(c * value for c, value in zip(coefficients, column)) % mod for column in zip(*rows)]
+
+
+def packed_secret_points(mod: int, k: int) -> tuple[int, ...]:
+        """
+        Coordenadas donde se guardan los k secretos de un reparto empaquetado: 0, -1, ..., -(k - 1) (mod p).
+        Son distintas de las coordenadas de las partes (1..n) mientras n + k <= p.
+        Con k = 1 solo queda x = 0, como en el esquema de Shamir normal.
+        """
+        return tuple((-j) % mod for j in range(k))
+
+def packed_random_points(mod: int, k: int, t: int) -> tuple[int, ...]:
+        """
+        Coordenadas de los t valores aleatorios de un reparto empaquetado: -k, ..., -(k + t - 1) (mod p).
+        """
+        return tuple((-j) % mod for j in range(k, k + t))
+
+@lru_cache(maxsize=LAGRANGE_CACHE_SIZE)
+def packed_sharing_matrix(mod: int, k: int, t: int, n: int) -> tuple[tuple[int, ...], ...]:
+        """
+        Matriz n x (k + t) que evalúa en x = 1..n el polinomio de grado k + t - 1 que pasa por los k secretos
+        y los t valores aleatorios (en packed_secret_points y packed_random_points).
+        La fila i contiene los coeficientes de Lagrange de esos k + t puntos evaluados en x = i + 1.
+
+        Se calcula sin pasar por la caché de lagrange_coefficients, para no desplazar de ella
+        los coeficientes de las rondas con n entradas nuevas.
+        """
+        points = packed_secret_points(mod, k) + packed_random_points(mod, k, t)
+        return tuple(lagrange_coefficients.__wrapped__(mod, points, x) for x in range(1, n + 1))
+
+@lru_cache(maxsize=LAGRANGE_CACHE_SIZE)
+def packed_reconstruction_matrix(mod: int, k: int, xs: tuple[int, ...]) -> tuple[tuple[int, ...], ...]:
+        """
+        Matriz k x len(xs): la fila j contiene los coeficientes de Lagrange de las coordenadas xs evaluados en la
+        coordenada del secreto j (packed_secret_points), así que el secreto j es la fila j por el vector de partes.
+        """
+        return tuple(lagrange_coefficients.__wrapped__(mod, xs, point) for point in packed_secret_points(mod, k))
+
+def lagrange_interpolation_packed(rows: list[list[int]], mod: int, k: int, xs: tuple[int, ...] | None = None) -> list[int]:
+        """
+        Reconstrucción de secretos repartidos en forma empaquetada (ver ShamirSecretSharing.generate_packed_shares).
+
+        rows[i] contiene las partes de la parte con coordenada xs[i] (por defecto i + 1), una por bloque de k secretos.
+        Se necesitan al menos k + t filas, el grado del polinomio más uno; con menos el resultado no tiene relación con los secretos.
+        Los coeficientes solo dependen de las coordenadas y se guardan en caché, así que cada bloque cuesta k productos punto.
+
+        :param rows: Matriz de partes, una fila por parte y una columna por bloque.
+        :param mod: Módulo del campo.
+        :param k: Cantidad de secretos por bloque.
+        :param xs: Coordenadas de las filas, si no son 1..len(rows).
+        :return: Los secretos de todos los bloques, en orden (k por bloque).
+        """
+        if xs is None:
+            xs = tuple(range(1, len(rows) + 1))
+        matrix = packed_reconstruction_matrix(mod, k, tuple(xs))
+        secrets = []
+        for column in zip(*rows):
+            secrets.extend(sum(c * value for c, value in zip(coefficients, column)) % mod for coefficients in matrix)
+        return secrets
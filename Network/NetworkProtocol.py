@@ -6,11 +6,110 @@ import NetworkUser
 import Protocol
 
 import uuid as UUID
+import struct
+from typing import Callable
 
 DELIMITADOR = "||"
 SEPARADOR_IDENTIFICADOR = "="
 SEPARADOR_ARGUMENTOS = ";"
 
+BINARY_MAGIC = 0xB5
+BINARY_CAPABILITY = "BIN1"
+FRAME_HEADER = struct.Struct("!BIB")
+"""
+Formato binario de los mensajes.
+
+Cada trama empieza con BINARY_MAGIC, seguido de la longitud del contenido (4 bytes) y el código del protocolo (1 byte):
+    MAGIC | LONGITUD | OPCODE | CONTENIDO
+
+Los mensajes de texto siempre empiezan con una letra del identificador, así que el receptor
+distingue ambos formatos por el primer byte de cada mensaje.
+
+El formato binario se negocia al conectarse: los usuarios que lo soportan añaden BINARY_CAPABILITY
+a los mensajes REQUEST_CONNECTION y ACCEPT_CONNECTION, y solo se envían tramas binarias a quienes lo anunciaron.
+"""
+
+DELIMITADOR_BYTES = DELIMITADOR.encode("utf-8")
+RECV_SIZE = 64 * 1024
+"""
+Cantidad de bytes que se leen por defecto en cada llamada a recv_into.
+"""
+
+class FrameBuffer:
+    """
+    Buffer de recepción preasignado para separar los mensajes que llegan por una conexión.
+
+    Los datos se escriben directamente en el bytearray (con recv_into) y los mensajes se extraen
+    en el lugar, avanzando el índice start, sin copiar ni volver a recorrer lo ya procesado.
+    Solo cuando no queda espacio al final se mueve el mensaje incompleto al inicio,
+    y si un mensaje no cabe, el buffer crece. Así, procesar k mensajes cuesta O(k).
+
+    Si el mensaje empieza con BINARY_MAGIC, es una trama binaria con su longitud en la cabecera.
+    En caso contrario, es un mensaje de texto que termina con el delimitador.
+    Las tramas binarias se entregan como memoryview del buffer, y los mensajes de texto
+    solo se decodifican cuando están completos, así no se cortan caracteres de varios bytes.
+    Si un mensaje de texto está incompleto, se recuerda hasta dónde se buscó el delimitador (scan)
+    y la siguiente búsqueda sigue desde ahí, así cada byte se revisa una sola vez aunque llegue en muchas partes.
+    """
+    def __init__(self, read_size: int = RECV_SIZE):
+        self.read_size = read_size
+        self.data = bytearray(2 * read_size)
+        self.start = 0
+        self.end = 0
+        self.scan = 0
+
+    def writable(self) -> memoryview:
+        """
+        Retorna la zona libre del buffer, con al menos read_size bytes, para escribir con recv_into.
+        La vista debe liberarse antes de llamar a commit.
+        """
+        if len(self.data) - self.end < self.read_size:
+            pending = self.end - self.start
+            if self.start > 0:
+                self.data[:pending] = self.data[self.start:self.end]
+                self.scan = max(0, self.scan - self.start)
+                self.start, self.end = 0, pending
+            if len(self.data) - self.end < self.read_size:
+                self.data.extend(bytes(self.end + self.read_size - len(self.data)))
+        return memoryview(self.data)[self.end:]
+
+    def commit(self, nbytes: int):
+        """
+        Marca como recibidos los nbytes escritos en la zona retornada por writable.
+        """
+        self.end += nbytes
+
+    def process(self, on_text: Callable[[str], None], on_frame: Callable[[int, memoryview], None]):
+        """
+        Procesa todos los mensajes completos del buffer.
+        Los mensajes de texto se entregan a on_text y las tramas binarias a on_frame.
+        La vista que recibe on_frame solo es válida durante la llamada.
+        """
+        data, start, end, scan = self.data, self.start, self.end, self.scan
+        with memoryview(data) as view:
+            while start < end:
+                if data[start] == BINARY_MAGIC:
+                    if end - start < FRAME_HEADER.size:
+                        break
+                    _, length, opcode = FRAME_HEADER.unpack_from(data, start)
+                    frame_end = start + FRAME_HEADER.size + length
+                    if frame_end > end:
+                        break
+                    with view[start + FRAME_HEADER.size:frame_end] as payload:
+                        on_frame(opcode, payload)
+                    start = frame_end
+                else:
+                    delimiter = data.find(DELIMITADOR_BYTES, max(start, scan), end)
+                    if delimiter < 0:
+                        # Se retrocede un byte menos que el delimitador, por si quedó partido entre dos lecturas
+                        scan = max(start, end - len(DELIMITADOR_BYTES) + 1)
+                        break
+                    on_text(str(view[start:delimiter], "utf-8"))
+                    start = delimiter + len(DELIMITADOR_BYTES)
+        if start == end:
+            start = end = scan = 0
+        self.start, self.end, self.scan = start, end, scan
+
 class NetworkProtocol(ABC):
     """
     Clase abstracta que define un protocolo de comunicación entre usuarios.
@@ -28,9 +127,19 @@ class NetworkProtocol(ABC):
     Además, esta clase define los métodos format_message y parse_message, que se encargan de formatear y parsear los mensajes, respectivamente.
 
     Con métodos abstractos, se espera que las clases hijas implementen estos métodos de acuerdo a sus necesidades.
+
+    Los protocolos que también se pueden enviar en formato binario definen OPCODE y BINARY_FORMAT,
+    e implementan receive_frame.
+
+    session es el número de la sesión (ver Session) a la que pertenece el mensaje.
+    Los protocolos de partes lo envían en cada mensaje, y al recibir se toma del mensaje.
     """
-    def __init__(self, user: "NetworkUser.MainUser"):
+    OPCODE: int | None = None
+    BINARY_FORMAT: struct.Struct | None = None
+
+    def __init__(self, user: "NetworkUser.MainUser", session: int = 0):
         self.user = user
+        self.session = session
 
     @abstractmethod
     def identifier(self: "NetworkProtocol | None" = None) -> str:
@@ -59,13 +168,48 @@ class NetworkProtocol(ABC):
         """
         return tuple(message.split(SEPARADOR_ARGUMENTOS))
 
+    def format_frame(self, *args) -> bytes:
+        """
+        Formatea una trama binaria con los campos de BINARY_FORMAT.
+        La trama se forma de la siguiente manera:
+        MAGIC | LONGITUD | OPCODE | CAMPOS
+        """
+        payload = self.BINARY_FORMAT.pack(*args)
+        return FRAME_HEADER.pack(BINARY_MAGIC, len(payload), self.OPCODE) + payload
+
+    def parse_frame(self, payload: memoryview) -> tuple:
+        """
+        Parsea el contenido de una trama binaria en una tupla de campos.
+        Recibe el contenido generado por format_frame, sin la cabecera.
+        """
+        return self.BINARY_FORMAT.unpack(payload)
+
+    def receive_frame(self, payload: memoryview) -> None:
+        """
+        Recibe el contenido de una trama binaria.
+        Solo los protocolos con OPCODE lo implementan.
+        """
+        raise Exception(f"El protocolo {self.identifier()} no soporta el formato binario")
+
+    async def send_message_async(self, other, *args) -> None:
+        """
+        Versión corrutina de send_message.
+        Envía el mensaje y, si el destino es una cola de salida asíncrona (AsyncNetworkUser.PeerWriter),
+        espera a que se haya escrito en la conexión.
+        """
+        self.send_message(other, *args)
+        drain = getattr(other, "drain", None)
+        if drain is not None:
+            await drain()
+
 class RequestConnectionProtocol(NetworkProtocol):
     """
     Protocolo:
-    REQUEST_CONNECTION=user_uuid;ip;port
+    REQUEST_CONNECTION=user_uuid;ip;port[;BIN1]
 
     Este protocolo se utiliza para solicitar una conexión con otro usuario.
     Este protocolo se envía a un usuario y se espera una respuesta con el protocolo ACCEPT_CONNECTION.
+    Si el usuario soporta el formato binario, se añade BINARY_CAPABILITY al final.
     """
     def identifier(self = None):
         return "REQUEST_CONNECTION"
@@ -76,7 +220,8 @@ class RequestConnectionProtocol(NetworkProtocol):
         Si no se especifica un usuario, se envía el mensaje desde el usuario actual.
         """
         if from_user is None: from_user = self.user
-        m = self.format_message(from_user.uuid, from_user.ip, from_user.port)
+        capabilities = [BINARY_CAPABILITY] if from_user.binary else []
+        m = self.format_message(from_user.uuid, from_user.ip, from_user.port, *capabilities)
         other.send(m)
 
     def receive_message(self, message: str, *args):
@@ -90,20 +235,20 @@ class RequestConnectionProtocol(NetworkProtocol):
         Además, a cada miembro del grupo se le envía un mensaje con el protocolo REQUEST_CONNECTION.
         Para que cada miembro del grupo se conecte con el usuario que envía la solicitud.
         """
-        uuid, ip, port = self.parse_message(message)
-        connection = self.user.addConnection(uuid=uuid, ip=ip, port=int(port))
+        uuid, ip, port, *capabilities = self.parse_message(message)
+        connection = self.user.addConnection(uuid=uuid, ip=ip, port=int(port), binary=BINARY_CAPABILITY in capabilities)
 
         if connection is None:
             return
         
-        for member in self.user.party.values():
+        for member in list(self.user.party.values()):
             if member.uuid != self.user.uuid:
                 self.send_message(member.host, from_user=connection)
 
 class AcceptConectionProtocol(NetworkProtocol):
     """
     Protocolo:
-    ACCEPT_CONNECTION=user_uuid;ip;port
+    ACCEPT_CONNECTION=user_uuid;ip;port[;BIN1]
 
     Este protocolo se utiliza para aceptar una conexión con otro usuario.
     Este protocolo se envía como respuesta a un protocolo REQUEST_CONNECTION.
@@ -121,7 +266,8 @@ class AcceptConectionProtocol(NetworkProtocol):
         Se envia cómo respuesta a un mensaje con el protocolo REQUEST_CONNECTION, indicando que la conexión ha sido aceptada.
         """
         if from_user is None: from_user = self.user
-        m = self.format_message(self.user.uuid, self.user.ip, self.user.port)
+        capabilities = [BINARY_CAPABILITY] if self.user.binary else []
+        m = self.format_message(self.user.uuid, self.user.ip, self.user.port, *capabilities)
         other.send(m)
 
     def receive_message(self, message: str, *args):
@@ -130,8 +276,47 @@ class AcceptConectionProtocol(NetworkProtocol):
         Se espera que el mensaje contenga el UUID, IP y puerto del usuario que acepta la conexión.
         Se crea una conexión con el usuario que acepta la conexión.
         """
-        uuid, ip, port = self.parse_message(message)
-        self.user.addConnection(uuid=uuid, ip=ip, port=int(port))
+        uuid, ip, port, *capabilities = self.parse_message(message)
+        self.user.addConnection(uuid=uuid, ip=ip, port=int(port), binary=BINARY_CAPABILITY in capabilities)
+
+class JoinProtocol(NetworkProtocol):
+    """
+    Protocolo:
+    JOIN=user_uuid;ip;port[;BIN1]
+
+    Este protocolo se utiliza en la conexión en bloque (MainUser.bootstrap).
+    A diferencia de REQUEST_CONNECTION, quien lo recibe no lo reenvía a los demás miembros ni responde con ACCEPT_CONNECTION,
+    porque cada usuario de la lista ya abre por su cuenta una conexión con todos los demás.
+    """
+    def identifier(self = None):
+        return "JOIN"
+
+    def send_message(self, other: Socket, *args) -> None:
+        capabilities = [BINARY_CAPABILITY] if self.user.binary else []
+        other.send(self.format_message(self.user.uuid, self.user.ip, self.user.port, *capabilities))
+
+    def receive_message(self, message: str, *args):
+        uuid, ip, port, *capabilities = self.parse_message(message)
+        self.user.onJoin(uuid, ip, int(port), BINARY_CAPABILITY in capabilities)
+
+class MembershipProtocol(NetworkProtocol):
+    """
+    Protocolo:
+    MEMBERSHIP=user_uuid;count;digest
+
+    Este protocolo se envía a todos al terminar la conexión en bloque (MainUser.bootstrap).
+    Contiene la cantidad de usuarios de la red y un resumen de la lista ordenada de sus UUID,
+    para comprobar que todos tienen la misma red antes de empezar a compartir.
+    """
+    def identifier(self = None):
+        return "MEMBERSHIP"
+
+    def send_message(self, other: Socket, digest: str = "", count: int = 0, *args) -> None:
+        other.send(self.format_message(self.user.uuid, count, digest))
+
+    def receive_message(self, message: str, *args):
+        uuid, count, digest = self.parse_message(message)
+        self.user.onReceiveMembership(uuid, int(count), digest)
 
 class MessageProtocol(NetworkProtocol):
     """
@@ -157,39 +342,69 @@ class ShareProtocol(NetworkProtocol, ABC):
     Se espera que las clases hijas implementen el método messageFunction.
 
     El mensaje se forma de la siguiente manera:
-        IDENTIFIER=user_uuid;value;mod;uuid;*args
+        IDENTIFIER=user_uuid;session;value;mod;uuid;*args
 
     user_uuid: UUID del usuario que envía el mensaje.
+    session: Número de la sesión del cálculo.
     value: Valor del share.
     mod: Modulo del share.
     uuid: UUID de la variable compartida.
     *args: Argumentos adicionales.
 
+    En formato binario, la trama lleva campos de tamaño fijo:
+        sender_index (2 bytes) | session (4 bytes) | sequence (4 bytes) | value (8 bytes) | *args
+
+    sender_index: Posición del emisor en la lista ordenada de la red, en lugar de su UUID.
+    sequence: Número de secuencia del emisor, que junto a su UUID identifica la variable compartida.
+    value: Valor del share. El módulo es el del receptor, que debe ser el mismo en toda la red.
+
     Esta clase existe para compartir valores entre usuarios.
     Así, se pueden compartir valores de forma segura y eficiente.
     """
+    BINARY_FORMAT = struct.Struct("!HIIQ")
 
     def send_message(self, other: Socket, share: Field | None = None, *args) -> None:
         if share is None:
             raise Exception("Ingresa un share válido")
 
-        message = self.format_message(self.user.uuid, share.value, share.mod, str(UUID.uuid4()), *args)
+        if self.user.usesBinary(other, share):
+            message = self.format_frame(self.user.index, self.session, self.user.nextSequence(), share.value, *args)
+        else:
+            message = self.format_message(self.user.uuid, self.session, share.value, share.mod, str(UUID.uuid4()), *args)
         try:
             other.send(message)
         except Exception as e:
-            pass
+            # Si no se puede enviar a un usuario, se registra el error y se sigue con los demás
+            self.user.pool.report_error(other, e, 1)
 
     def receive_message(self, message: str, *args):
         """
         Recibe un mensaje con el protocolo SHARE.
-        Se espera que el mensaje contenga el UUID, valor, módulo y UUID de la variable compartida.
+        Se espera que el mensaje contenga el UUID, la sesión, el valor, el módulo y el UUID de la variable compartida.
         Se crea un objeto Field a partir del valor y el módulo.
+        """
+        uuid, session, value, mod, varUUID, *other = self.parse_message(message)
+        self.session = int(session)
+        self.receive_share(uuid, Field(int(value), int(mod)), varUUID, *other)
+
+    def receive_frame(self, payload: memoryview) -> None:
+        """
+        Recibe una trama binaria con el protocolo SHARE.
+        El UUID del emisor se obtiene a partir de su posición en la red,
+        y el de la variable a partir del UUID del emisor y el número de secuencia.
+        """
+        sender_index, self.session, sequence, value, *other = self.parse_frame(payload)
+        uuid = self.user.uuidAt(sender_index)
+        if uuid is None:
+            self.user.log(f"Usuario desconocido: #{sender_index}")
+            return
+        self.receive_share(uuid, Field(value, self.user.mod), f"{uuid}:{sequence}", *other)
+
+    def receive_share(self, uuid: str, share: Field, varUUID: str, *other):
+        """
         Se crea un objeto SharedVariable a partir del Field, el UUID y el UUID de la variable compartida.
         Se llama al método messageFunction con el usuario que envía el mensaje y la variable compartida.
         """
-        uuid, value, mod, varUUID, *other = self.parse_message(message)
-        share = Field(int(value), int(mod))
-
         user = self.user.party.get(uuid)
         if user is None:
             self.user.log(f"Usuario desconocido: {uuid}")
@@ -205,18 +420,26 @@ class ShareProtocol(NetworkProtocol, ABC):
 
 class InputShareProtocol(ShareProtocol):
     """
-    INPUT_SHARE=user_uuid;value;mod;varUUID
+    INPUT_SHARE=user_uuid;session;value;mod;varUUID
     """
+    OPCODE = 1
+
     def identifier(self = None):
         return "INPUT_SHARE"
     
     def messageFunction(self, user: "NetworkUser.NetworkUser", share: Protocol.SharedVariable, *_) -> None:
-        self.user.onReceiveInputShare(user, share)
+        self.user.onReceiveInputShare(user, share, self.session)
 
 class ProductShareProtocol(NetworkProtocol):
     """
-    PRODUCT_SHARE=user_uuid;value;mod;varUUID;operation_index
+    PRODUCT_SHARE=user_uuid;session;value;mod;varUUID;operation_index
+
+    En formato binario:
+        sender_index (2 bytes) | session (4 bytes) | sequence (4 bytes) | value (8 bytes) | operation_index (4 bytes)
     """
+    OPCODE = 2
+    BINARY_FORMAT = struct.Struct("!HIIQI")
+
     def identifier(self = None):
         return "PRODUCT_SHARE"
     
@@ -226,27 +449,210 @@ class ProductShareProtocol(NetworkProtocol):
         if operation_index is None:
             raise Exception("Ingresa un índice de operación válido")
 
-        message = self.format_message(self.user.uuid, share.value, share.mod, str(UUID.uuid4()), operation_index, *args)
+        if self.user.usesBinary(other, share):
+            message = self.format_frame(self.user.index, self.session, self.user.nextSequence(), share.value, operation_index, *args)
+        else:
+            message = self.format_message(self.user.uuid, self.session, share.value, share.mod, str(UUID.uuid4()), operation_index, *args)
         other.send(message)
     
     def receive_message(self, message: str, *args):
-        uuid, value, mod, varUUID, opIndex = self.parse_message(message)
-        n = Field(int(value), int(mod))
-        variable = Protocol.MultiplicationVariable(Protocol.SharedVariable(n, uuid, varUUID), int(opIndex))
+        uuid, session, value, mod, varUUID, opIndex = self.parse_message(message)
+        self.session = int(session)
+        self.receive_share(uuid, Field(int(value), int(mod)), varUUID, int(opIndex))
+
+    def receive_frame(self, payload: memoryview) -> None:
+        sender_index, self.session, sequence, value, opIndex = self.parse_frame(payload)
+        uuid = self.user.uuidAt(sender_index)
+        if uuid is None:
+            self.user.log(f"Usuario desconocido: #{sender_index}")
+            return
+        self.receive_share(uuid, Field(value, self.user.mod), f"{uuid}:{sequence}", opIndex)
+
+    def receive_share(self, uuid: str, n: Field, varUUID: str, opIndex: int):
+        variable = Protocol.MultiplicationVariable(Protocol.SharedVariable(n, uuid, varUUID), opIndex)
 
         u = self.user.party.get(uuid)
         if u is None:
             self.user.log(f"Usuario desconocido: {uuid}")
             return
 
-        self.user.onReceiveProductShare(u, variable, int(opIndex))
+        self.user.onReceiveProductShare(u, variable, opIndex, self.session)
+
+class TreeShareProtocol(ProductShareProtocol):
+    """
+    TREE_SHARE=user_uuid;session;value;mod;varUUID;layer;position
+
+    Parte de una multiplicación del árbol de productos.
+    En lugar del índice de operación, se identifica con la capa del árbol y la posición de la pareja en esa capa.
+
+    En formato binario:
+        sender_index (2 bytes) | session (4 bytes) | sequence (4 bytes) | value (8 bytes) | layer (2 bytes) | position (4 bytes)
+    """
+    OPCODE = 4
+    BINARY_FORMAT = struct.Struct("!HIIQHI")
+
+    def identifier(self = None):
+        return "TREE_SHARE"
+
+    def send_message(self, other: Socket, share: Protocol.Field | None = None, layer: int | None = None, position: int | None = None, *args) -> None:
+        if position is None:
+            raise Exception("Ingresa una posición válida")
+        super().send_message(other, share, layer, position, *args)
+
+    def receive_message(self, message: str, *args):
+        uuid, session, value, mod, varUUID, layer, position = self.parse_message(message)
+        self.session = int(session)
+        self.receive_share(uuid, Field(int(value), int(mod)), varUUID, int(layer), int(position))
+
+    def receive_frame(self, payload: memoryview) -> None:
+        sender_index, self.session, sequence, value, layer, position = self.parse_frame(payload)
+        uuid = self.user.uuidAt(sender_index)
+        if uuid is None:
+            self.user.log(f"Usuario desconocido: #{sender_index}")
+            return
+        self.receive_share(uuid, Field(value, self.user.mod), f"{uuid}:{sequence}", layer, position)
+
+    def receive_share(self, uuid: str, n: Field, varUUID: str, layer: int, position: int):
+        variable = Protocol.MultiplicationVariable(Protocol.SharedVariable(n, uuid, varUUID), layer)
+
+        u = self.user.party.get(uuid)
+        if u is None:
+            self.user.log(f"Usuario desconocido: {uuid}")
+            return
+
+        self.user.onReceiveTreeShare(u, variable, layer, position, self.session)
+
+class ProductVectorProtocol(NetworkProtocol):
+    """
+    PRODUCT_VECTOR=user_uuid;session;mod;batch_id;value_1,value_2,...,value_k
+
+    Partes de k multiplicaciones independientes que se hacen en la misma ronda.
+    En lugar de un mensaje por multiplicación, cada usuario recibe en un solo mensaje
+    el vector con la parte de cada producto que le corresponde.
+
+    En formato binario:
+        sender_index (2 bytes) | session (4 bytes) | batch_id (4 bytes) | value_1 (8 bytes) | ... | value_k (8 bytes)
+
+    La cantidad de valores se obtiene de la longitud de la trama.
+    También se usa para abrir varios valores a la vez (MainUser.openBatch), enviando a todos el mismo vector.
+    """
+    OPCODE = 5
+    BINARY_FORMAT = struct.Struct("!HII")
+    VALUE_FORMAT = struct.Struct("!Q")
+
+    def identifier(self = None):
+        return "PRODUCT_VECTOR"
+
+    def send_message(self, other: Socket, values: list[int] | None = None, mod: int | None = None, batch_id: int | None = None, *args) -> None:
+        if values is None or mod is None:
+            raise Exception("Ingresa un vector de shares válido")
+        if batch_id is None:
+            raise Exception("Ingresa un identificador de lote válido")
+
+        if self.user.supportsBinary(other) and mod == self.user.mod and mod <= 2**64:
+            message = self.format_frame(self.user.index, batch_id, values)
+        else:
+            message = self.format_message(self.user.uuid, self.session, mod, batch_id, ",".join(map(str, values)))
+        other.send(message)
+
+    def format_frame(self, sender_index: int, batch_id: int, values: list[int]) -> bytes:
+        """
+        La cabecera tiene tamaño fijo y le siguen los valores, de 8 bytes cada uno.
+        """
+        payload = self.BINARY_FORMAT.pack(sender_index, self.session, batch_id) + struct.pack(f"!{len(values)}Q", *values)
+        return FRAME_HEADER.pack(BINARY_MAGIC, len(payload), self.OPCODE) + payload
+
+    def parse_frame(self, payload: memoryview) -> tuple:
+        sender_index, self.session, batch_id = self.BINARY_FORMAT.unpack_from(payload)
+        count = (len(payload) - self.BINARY_FORMAT.size) // self.VALUE_FORMAT.size
+        return sender_index, batch_id, list(struct.unpack_from(f"!{count}Q", payload, self.BINARY_FORMAT.size))
+
+    def receive_message(self, message: str, *args):
+        uuid, session, mod, batch_id, values = self.parse_message(message)
+        self.session = int(session)
+        self.receive_vector(uuid, [int(value) for value in values.split(",")] if values else [], int(mod), int(batch_id))
+
+    def receive_frame(self, payload: memoryview) -> None:
+        sender_index, batch_id, values = self.parse_frame(payload)
+        uuid = self.user.uuidAt(sender_index)
+        if uuid is None:
+            self.user.log(f"Usuario desconocido: #{sender_index}")
+            return
+        self.receive_vector(uuid, values, self.user.mod, batch_id)
+
+    def receive_vector(self, uuid: str, values: list[int], mod: int, batch_id: int):
+        u = self.user.party.get(uuid)
+        if u is None:
+            self.user.log(f"Usuario desconocido: {uuid}")
+            return
+        if mod != self.user.mod:
+            self.user.log(f"Módulo diferente en el lote {batch_id} de {uuid}: {mod}")
+            return
+
+        self.user.onReceiveProductVector(u, batch_id, values, self.session)
+
+class StreamChunkProtocol(NetworkProtocol):
+    """
+    STREAM_CHUNK=user_uuid;session;mod;stream_id;seq;last;value_1,value_2,...,value_k
+
+    Bloque número seq de las partes de un flujo (ver Streaming.StreamSharer). last es 1 en el último bloque del emisor.
+
+    En formato binario:
+        sender_index (2 bytes) | session (4 bytes) | stream_id (4 bytes) | seq (4 bytes) | last (1 byte) | value_1 (8 bytes) | ... | value_k (8 bytes)
+    """
+    OPCODE = 6
+    BINARY_FORMAT = struct.Struct("!HIIIB")
+    VALUE_FORMAT = struct.Struct("!Q")
+
+    def identifier(self = None):
+        return "STREAM_CHUNK"
+
+    def send_message(self, other: Socket, values: list[int] | None = None, stream_id: int | None = None, seq: int | None = None, last: bool = False, *args) -> None:
+        if values is None:
+            raise Exception("Ingresa un vector de shares válido")
+        if stream_id is None or seq is None:
+            raise Exception("Ingresa un flujo y un número de bloque válidos")
+
+        if self.user.supportsBinary(other) and self.user.mod <= 2**64:
+            payload = self.BINARY_FORMAT.pack(self.user.index, self.session, stream_id, seq, int(last)) + struct.pack(f"!{len(values)}Q", *values)
+            message = FRAME_HEADER.pack(BINARY_MAGIC, len(payload), self.OPCODE) + payload
+        else:
+            message = self.format_message(self.user.uuid, self.session, self.user.mod, stream_id, seq, int(last), ",".join(map(str, values)))
+        other.send(message)
+
+    def receive_message(self, message: str, *args):
+        uuid, session, mod, stream_id, seq, last, values = self.parse_message(message)
+        self.session = int(session)
+        if int(mod) != self.user.mod:
+            self.user.log(f"Módulo diferente en el flujo {stream_id} de {uuid}: {mod}")
+            return
+        self.receive_chunk(uuid, int(stream_id), int(seq), [int(value) for value in values.split(",")] if values else [], last == "1")
+
+    def receive_frame(self, payload: memoryview) -> None:
+        sender_index, self.session, stream_id, seq, last = self.BINARY_FORMAT.unpack_from(payload)
+        count = (len(payload) - self.BINARY_FORMAT.size) // self.VALUE_FORMAT.size
+        values = list(struct.unpack_from(f"!{count}Q", payload, self.BINARY_FORMAT.size))
+        uuid = self.user.uuidAt(sender_index)
+        if uuid is None:
+            self.user.log(f"Usuario desconocido: #{sender_index}")
+            return
+        self.receive_chunk(uuid, stream_id, seq, values, bool(last))
+
+    def receive_chunk(self, uuid: str, stream_id: int, seq: int, values: list[int], last: bool):
+        u = self.user.party.get(uuid)
+        if u is None:
+            self.user.log(f"Usuario desconocido: {uuid}")
+            return
+        self.user.onReceiveStreamChunk(u, stream_id, seq, values, last, self.session)
 
 class FinalShareProtocol(ShareProtocol):
     """
-    FINAL_SHARE=user_uuid;value;mod;varUUID
+    FINAL_SHARE=user_uuid;session;value;mod;varUUID
     """
+    OPCODE = 3
+
     def identifier(self = None):
         return "FINAL_SHARE"
     
     def messageFunction(self, user: "NetworkUser.NetworkUser", share: Protocol.SharedVariable, *_) -> None:
-        self.user.onReceiveFinalShare(user, share)
\ No newline at end of file
+        self.user.onReceiveFinalShare(user, share, self.session)
\ No newline at end of file
@@ -1,15 +1,25 @@
+import os
 import socket as Socket
 import ssl
 
 import uuid as UUID
 import threading
+import itertools
+import hashlib
+from bisect import insort
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
-from socket import socket as Socket, AF_INET, SOCK_STREAM
+from socket import socket as Socket, AF_INET, SOCK_STREAM, SHUT_RDWR
 from field_operations import Field
 
 import Protocol
-from NetworkProtocol import RequestConnectionProtocol, AcceptConectionProtocol, MessageProtocol, InputShareProtocol, FinalShareProtocol, ProductShareProtocol, NetworkProtocol, DELIMITADOR, SEPARADOR_IDENTIFICADOR
+from NetworkProtocol import RequestConnectionProtocol, AcceptConectionProtocol, JoinProtocol, MembershipProtocol, MessageProtocol, InputShareProtocol, FinalShareProtocol, ProductShareProtocol, TreeShareProtocol, ProductVectorProtocol, StreamChunkProtocol, NetworkProtocol, SEPARADOR_IDENTIFICADOR, FrameBuffer, RECV_SIZE
 import Shamirss
+import Streaming
+from ShareStore import ShareView
+from Session import Session, DEFAULT_SESSION
+from ConnectionPool import ConnectionPool, PooledConnection
 
 import time
 
@@ -17,9 +27,14 @@ import time
 DEFAULT_PROTOCOLS: list[type[NetworkProtocol]] = [
     RequestConnectionProtocol,
     AcceptConectionProtocol,
+    JoinProtocol,
+    MembershipProtocol,
     MessageProtocol,
     InputShareProtocol,
     ProductShareProtocol,
+    TreeShareProtocol,
+    ProductVectorProtocol,
+    StreamChunkProtocol,
     FinalShareProtocol
 ]
 """
@@ -27,6 +42,37 @@ Protocolos por defecto que se utilizan en la comunicación entre los usuarios.
 Tienen que estar en una lista para poder ser utilizados en la función receive.
 """
 
+BINARY_PROTOCOLS: dict[int, type[NetworkProtocol]] = {protocol.OPCODE: protocol for protocol in DEFAULT_PROTOCOLS if protocol.OPCODE is not None}
+"""
+Protocolos que se pueden recibir en formato binario, indexados por su código.
+"""
+
+ROUND_DELAY = 0.0
+"""
+Tiempo de espera opcional (en segundos) antes de iniciar la siguiente operación de multiplicación.
+Cada ronda empieza en cuanto llegan todas las partes de la anterior, así que por defecto no se espera.
+"""
+
+SERVER_TIMEOUT = 5.0
+"""
+Tiempo máximo (en segundos) que se espera a que el servidor esté escuchando al crear un MainUser.
+"""
+
+BOOTSTRAP_WORKERS = 32
+BOOTSTRAP_RETRIES = 8
+BOOTSTRAP_BACKOFF = 0.05
+BOOTSTRAP_MAX_DELAY = 2.0
+"""
+Conexión en bloque (MainUser.bootstrap): cantidad máxima de conexiones que se abren a la vez,
+e intentos y espera inicial (en segundos) al abrir cada una. La espera se duplica en cada intento, hasta BOOTSTRAP_MAX_DELAY.
+"""
+
+CLOSED_SESSIONS_LIMIT = 4096
+"""
+Cantidad máxima de sesiones cerradas que se recuerdan para descartar las partes que lleguen tarde.
+Al superarla se olvidan las más antiguas: una parte muy atrasada de una de ellas volvería a crear su estado.
+"""
+
 CERT_FILE = "ssl/cert.pem"
 KEY_FILE = "ssl/key.pem"
 HOSTNAME = "PC-Crypto"
@@ -39,11 +85,13 @@ class NetworkUser:
     """
     Clase que representa la conexión con otro usuario en la red.
     Almacena la información de la conexión y el UUID del usuario.
+    binary indica si el usuario anunció que soporta el formato binario.
     """
-    def __init__(self, host: Socket, uuid_str: str = ""):
+    def __init__(self, host: Socket, uuid_str: str = "", binary: bool = False):
         self.uuid = uuid_str if uuid_str != "" else str(UUID.uuid4())
         self.host = host
         self.ip, self.port = self.host.getpeername()
+        self.binary = binary
 
     def __eq__(self, value: 'object') -> bool:
         if isinstance(value, NetworkUser):
@@ -60,33 +108,69 @@ class MainUser:
 
     En su inicialización, se crean los contextos de conexión segura y se inicia el servidor en un hilo aparte.
 
-    Por defecto, el módulo de operaciones es 43112609, que es un número primo de Mersenne.
+    Por defecto, el módulo de operaciones es 43112609. Es primo, pero no es un primo de Mersenne:
+    es el exponente del primo de Mersenne 2^43112609 - 1, así que las operaciones usan la reducción genérica.
+
+    Si binary es True, el usuario anuncia que soporta el formato binario y lo usa con quienes también lo soporten.
+    recv_size es la cantidad máxima de bytes que se leen de una conexión en cada lectura.
+    Si se indica share_store, las partes de entrada también se guardan en ese archivo (ver ShareStore),
+    y al iniciar se cargan las que ya tenía.
+
+    El estado de cada cálculo está en una sesión (ver Session). Los métodos de cálculo reciben el número de sesión
+    (por defecto DEFAULT_SESSION), así varios cálculos independientes avanzan a la vez sobre las mismas conexiones.
+    Los atributos multiplication_results, batch_results, final_event, input_shares y final_shares son los de la sesión por defecto.
+    share_store solo se usa en la sesión por defecto.
+    Si se indica stream_store, las partes de los flujos recibidos (ver shareStream) se escriben en archivos en lugar de
+    guardarse en memoria. Puede contener {uuid}, {stream} y {session} (ver Streaming.sink_path).
     """
-    def __init__(self, ip: str, port: int, uuid: str | None = None):        
+    def __init__(self, ip: str, port: int, uuid: str | None = None, binary: bool = True, recv_size: int = RECV_SIZE, share_store: str | None = None, stream_store: str | None = None):        
         self.ip: str = ip
         self.port: int = port
+        self.binary: bool = binary
+        self.recv_size: int = recv_size
+        self.stream_store: str | None = stream_store
 
         self.mod = 43112609
 
         self.uuid: str = uuid if uuid else str(UUID.uuid4())
 
         self.party: dict[str, NetworkUser] = {}
+        self._party_order: list[str] = []
+        self._binary_hosts: set[Socket] = set()
+        self._sequence = itertools.count()
 
         self.server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
         self.server_context.load_cert_chain(certfile=CERT_FILE, keyfile=KEY_FILE)
 
         self.client_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
         self.client_context.load_verify_locations(CERT_FILE)
+        self.pool = ConnectionPool(self.client_context, HOSTNAME)
+        self.pool.on_error = self.onSendError
+        self.pool.start_keepalive()
+
+        self.sessions: dict[int, Session] = {DEFAULT_SESSION: Session(DEFAULT_SESSION, self.mod, share_store)}
+        self._session_ids = itertools.count(DEFAULT_SESSION + 1)
+        self._closed_sessions: dict[int, None] = {}
+        self._metrics: Counter[str] = Counter()
 
-        self._input_shares: dict[str, Protocol.SharedVariable] = {}
-        self.__multiplication_shares: dict[int, list[Protocol.MultiplicationVariable]] = {}
-        self.multiplication_results: list[Field] = []
-        self.final_shares: list[Protocol.SharedVariable] = []
+        self.round_delay: float = ROUND_DELAY
+        self._state_changed = threading.Condition(threading.RLock())
+        self.server_ready = threading.Event()
+        self.closed = False
+
+        self._roster: set[tuple[str, int]] = set()
+        self._outbound: dict[tuple[str, int], Socket] = {}
+        self._pending_joins: dict[tuple[str, int], tuple[str, bool]] = {}
+        self._expected_party = 0
+        self._memberships: dict[str, str] = {}
+        self.membership_agreed = False
+        self.membership_event = threading.Event()
     
         self.server_thread: threading.Thread = threading.Thread(target=self.start_server, daemon=True)
         self.server_thread.start()
+        self.server_ready.wait(SERVER_TIMEOUT)
 
-        self.addConnection(self.ip, self.port, self.uuid)
+        self.addConnection(self.ip, self.port, self.uuid, self.binary)
 
     def start_server(self):
         """
@@ -96,33 +180,66 @@ class MainUser:
         self.server = Socket(AF_INET, SOCK_STREAM)
         self.server.bind((self.ip, self.port))
         self.server.listen(5)
+        self.server_ready.set()
         self.log(f"Servidor iniciado en {self.ip}:{self.port}")
         while True:
-            connection, _ = self.server.accept()
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                if self.closed:
+                    return
+                raise
             threading.Thread(target=self.handle_client, args=(connection,), daemon=True).start()
 
+    def close(self):
+        """
+        Deja de aceptar conexiones y cierra las conexiones de salida (después de enviar lo pendiente).
+        Un usuario cerrado ya no muestra mensajes, aunque todavía terminen de llegar datos a sus hilos.
+        """
+        self.closed = True
+        try:
+            self.server.shutdown(SHUT_RDWR)
+        except OSError:
+            pass
+        self.server.close()
+        self.pool.close()
+
     def handle_client(self, connection: Socket):
         """"
         Maneja las conexiones entrantes.
         Envuelve la conexión en un socket seguro y recibe los mensajes.
-        Estos mensajes son almacenados en un buffer hasta que se reciba un delimitador.
-        Así, se pueden recibir varios mensajes en un solo paquete y evitar problemas de fragmentación.
-        Cada mensaje se envía a la función receive para su procesamiento.
+        Los datos se leen con recv_into sobre un FrameBuffer preasignado, hasta recv_size bytes por lectura.
+        Así, se pueden recibir varios mensajes en un solo paquete y evitar problemas de fragmentación,
+        sin copiar ni volver a recorrer los datos que ya se procesaron.
+        Cada mensaje se envía a la función receive o receiveFrame para su procesamiento.
         """
-        buffer = ""
+        buffer = FrameBuffer(self.recv_size)
         connection = self.server_context.wrap_socket(connection, server_side=True)
         while True:
             try:
-                data = connection.recv(1024).decode("utf-8")
-                if not data:
+                with buffer.writable() as target:
+                    received = connection.recv_into(target, self.recv_size)
+                if not received:
                     break
-                buffer += data
-                while DELIMITADOR in buffer:
-                    message, buffer = buffer.split(DELIMITADOR, 1)
-                    self.receive(message)
+                buffer.commit(received)
+                buffer.process(self.receive, self.receiveFrame)
             except Exception as e:
                 break
     
+    @property
+    def mod(self) -> int:
+        return self._mod
+
+    @mod.setter
+    def mod(self, mod: int):
+        """
+        Cambia el módulo de las operaciones, también en los almacenes de partes de las sesiones.
+        Solo se debe cambiar antes de recibir partes.
+        """
+        self._mod = mod
+        for state in getattr(self, "sessions", {}).values():
+            state.input_shares.set_mod(mod)
+
     @property
     def t(self) -> int:
         """
@@ -132,36 +249,304 @@ class MainUser:
         """
         return (len(self.party) - 1) // 2
     
+    def session(self, session: int = DEFAULT_SESSION) -> Session | None:
+        """
+        Retorna el estado de la sesión indicada. Si no existe, se crea, porque las partes de una sesión
+        pueden llegar antes de que este usuario la abra. Retorna None si la sesión ya se cerró.
+        """
+        with self._state_changed:
+            state = self.sessions.get(session)
+            if state is None:
+                if session in self._closed_sessions:
+                    return None
+                state = self.sessions[session] = Session(session, self.mod)
+            return state
+
+    def activeSession(self, session: int = DEFAULT_SESSION) -> Session:
+        """
+        Igual que session, pero lanza una excepción si la sesión ya se cerró.
+        """
+        state = self.session(session)
+        if state is None:
+            raise Exception(f"La sesión {session} está cerrada")
+        return state
+
+    def openSession(self, session: int | None = None) -> int:
+        """
+        Abre una sesión para un cálculo nuevo y retorna su número.
+        Si no se indica, se toma el siguiente de un contador, así que todos los usuarios deben abrir sus sesiones en el mismo orden.
+        El contador solo avanza con openSession: si las partes de esa sesión ya llegaron de otro usuario
+        (y se creó su estado), se usa ese estado en lugar de saltar al número siguiente.
+        """
+        with self._state_changed:
+            if session is None:
+                session = next(self._session_ids)
+            self._closed_sessions.pop(session, None)
+            self.session(session)
+            return session
+
+    def closeSession(self, session: int):
+        """
+        Cierra una sesión y libera su estado. Las partes que lleguen después para esa sesión se descartan,
+        mientras sea una de las últimas CLOSED_SESSIONS_LIMIT sesiones cerradas.
+        La sesión por defecto no se cierra, solo se reinicia (resetComputation).
+        """
+        if session == DEFAULT_SESSION:
+            self.resetComputation(session)
+            return
+        with self._state_changed:
+            state = self.sessions.pop(session, None)
+            self._closed_sessions[session] = None
+            # Se recuerdan en orden de cierre, y se olvida la más antigua al superar el límite
+            if len(self._closed_sessions) > CLOSED_SESSIONS_LIMIT:
+                del self._closed_sessions[next(iter(self._closed_sessions))]
+            if state is not None:
+                state.close()
+                self._metrics["sesiones_cerradas"] += 1
+            self._state_changed.notify_all()
+
+    def closeIdleSessions(self, max_idle: float) -> list[int]:
+        """
+        Cierra las sesiones (salvo la por defecto) que llevan más de max_idle segundos sin recibir partes.
+        Se retorna la lista de sesiones cerradas.
+        """
+        with self._state_changed:
+            idle = [session for session, state in self.sessions.items() if session != DEFAULT_SESSION and state.idle() > max_idle]
+        for session in idle:
+            self.closeSession(session)
+        return idle
+
     @property
-    def input_shares(self) -> list[Protocol.SharedVariable]:
+    def input_shares(self) -> ShareView:
+        """
+        Retorna las partes de las variables de entrada de la sesión por defecto (ver inputShares).
+        """
+        return self.inputShares()
+
+    def inputShares(self, session: int = DEFAULT_SESSION) -> ShareView:
         """
-        Retorna la lista de partes de las variables de entrada.
+        Retorna las partes de las variables de entrada de una sesión.
         Estas partes son las que se envían a los demás usuarios para realizar las operaciones.
-        Cada vez que se solicita se ordena para garantizar que todos los usuarios tengan el mismo orden.
+        Están ordenadas por emisor (y por orden de llegada de cada emisor) para garantizar que todos los usuarios tengan el mismo orden.
+        Es una vista del ShareStore, así que no se copian ni se ordenan las partes en cada acceso.
         """
-        return list(sorted(self._input_shares.values(), key=lambda x: x.sender))
+        return self.activeSession(session).input_shares.view(self.mod)
     
-    def getMultiplicationShare(self, index: int) -> list[Protocol.MultiplicationVariable]:
+    def getInputShares(self, uuid: str, session: int = DEFAULT_SESSION) -> list[Field]:
+        """
+        Retorna las partes de entrada que envió un usuario, en el orden en que las envió.
+        """
+        return [Field(value, self.mod) for value in self.activeSession(session).input_shares.values_from(uuid)]
+
+    def getMultiplicationShare(self, index: int, session: int = DEFAULT_SESSION) -> list[Protocol.MultiplicationVariable]:
         """
         De forma similar a input_shares, retorna las partes de la multiplicación en un índice específico.
-        Se ordenan para garantizar que todos los usuarios tengan el mismo orden.
+        Están en el orden de la red, porque cada ronda las guarda según la posición del emisor.
         No se encuentra publico en la API, pero se utiliza internamente y accedible a través de getMultiplicationShare y addMultiplicationShare.
         """
-        if not index in self.__multiplication_shares:
+        state = self.session(session)
+        if state is None or not index in state.multiplication_shares:
             return []
-        return list(sorted(self.__multiplication_shares[index], key=lambda x: x.sender))
+        return state.multiplication_shares[index].shares() # type: ignore
+
+    @property
+    def final_shares(self) -> list[Protocol.SharedVariable]:
+        """
+        Retorna las partes finales recibidas en la sesión por defecto, en el orden de la red.
+        """
+        return self.finalShares()
+
+    def finalShares(self, session: int = DEFAULT_SESSION) -> list[Protocol.SharedVariable]:
+        """
+        Retorna las partes finales recibidas en una sesión, en el orden de la red.
+        """
+        state = self.session(session)
+        return state.final_shares.shares() if state is not None and state.final_shares is not None else []
+
+    @property
+    def multiplication_results(self) -> list[Field]:
+        return self.sessions[DEFAULT_SESSION].multiplication_results
+
+    @property
+    def batch_results(self) -> dict[int, list[Field]]:
+        return self.sessions[DEFAULT_SESSION].batch_results
+
+    @property
+    def final_event(self) -> threading.Event:
+        return self.sessions[DEFAULT_SESSION].final_event
+
+    def newRound(self) -> Protocol.RoundShares:
+        """
+        Crea la estructura de una ronda con los usuarios conectados en este momento.
+        """
+        return Protocol.RoundShares(self._party_order)
     
-    def addMultiplicationShare(self, share: Protocol.MultiplicationVariable):
+    @property
+    def index(self) -> int:
+        """
+        Retorna la posición del usuario en la lista ordenada de la red.
+        Se usa en el formato binario en lugar del UUID.
+        """
+        return self._party_order.index(self.uuid)
+
+    def uuidAt(self, index: int) -> str | None:
+        """
+        Retorna el UUID del usuario en la posición indicada de la lista ordenada de la red.
+        Todos los usuarios deben tener la misma lista para que las posiciones coincidan.
+        """
+        if 0 <= index < len(self._party_order):
+            return self._party_order[index]
+        return None
+
+    def nextSequence(self) -> int:
+        """
+        Retorna el siguiente número de secuencia para identificar las variables compartidas en formato binario.
+        """
+        return next(self._sequence) & 0xFFFFFFFF
+
+    def supportsBinary(self, host: Socket) -> bool:
+        """
+        Indica si ambos usuarios anunciaron el formato binario.
+        """
+        return host in self._binary_hosts
+
+    def usesBinary(self, host: Socket, share: Field) -> bool:
+        """
+        Indica si un share se puede enviar en formato binario por un socket.
+        Ambos usuarios deben haber anunciado el formato binario, el share debe estar en el módulo
+        de la red (el receptor usa el suyo) y su valor debe caber en 8 bytes.
+        """
+        return self.supportsBinary(host) and share.mod == self.mod and share.value < 2**64
+
+    def roundEvent(self, index: int, session: int = DEFAULT_SESSION) -> threading.Event:
+        """
+        Retorna el evento que se activa cuando se completa la operación de multiplicación con el índice indicado.
+        """
+        with self._state_changed:
+            return self.activeSession(session).round_events.setdefault(index, threading.Event())
+
+    def waitUntil(self, predicate, timeout: float | None = None) -> bool:
+        """
+        Espera a que predicate() sea verdadero. Se vuelve a evaluar cada vez que llega una parte.
+        Retorna False si se agota el tiempo de espera.
+        """
+        with self._state_changed:
+            return self._state_changed.wait_for(predicate, timeout)
+
+    def waitForParty(self, count: int, timeout: float | None = None) -> bool:
+        """
+        Espera a que haya al menos count usuarios conectados (incluyendo a este usuario).
+        """
+        return self.waitUntil(lambda: len(self.party) >= count, timeout)
+
+    def waitForInputs(self, count: int, timeout: float | None = None, session: int = DEFAULT_SESSION) -> bool:
+        """
+        Espera a que se hayan recibido al menos count partes de variables de entrada.
+        Retorna False si se agota el tiempo de espera o si la sesión está cerrada.
+        """
+        state = self.session(session)
+        if state is None:
+            return False
+        store = state.input_shares
+        return self.waitUntil(lambda: len(store) >= count, timeout)
+
+    def waitForRound(self, index: int, timeout: float | None = None, session: int = DEFAULT_SESSION) -> bool:
         """
-        Añade una parte de la multiplicación a la lista de partes.
-        Se almacenan en un diccionario con el índice de la operación como clave.
+        Espera a que se complete la operación de multiplicación con el índice indicado.
         """
-        self.__multiplication_shares.setdefault(share.operation_index, []).append(share)
+        return self.roundEvent(index, session).wait(timeout)
+
+    def waitForFinalShares(self, timeout: float | None = None, session: int = DEFAULT_SESSION) -> bool:
+        """
+        Espera a que se hayan recibido las partes finales de todos los usuarios.
+        Retorna False si se agota el tiempo de espera o si la sesión está cerrada.
+        """
+        state = self.session(session)
+        if state is None:
+            return False
+        return state.final_event.wait(timeout)
+
+    def addMultiplicationShare(self, state: Session, share: Protocol.MultiplicationVariable) -> Protocol.RoundShares:
+        """
+        Añade una parte de la multiplicación a la ronda de su operación.
+        Las rondas se almacenan en un diccionario de la sesión con el índice de la operación como clave.
+        Se retorna la ronda.
+        """
+        shares = state.multiplication_shares.get(share.operation_index)
+        if shares is None:
+            shares = state.multiplication_shares[share.operation_index] = self.newRound()
+        self.countShare("partes_producto", shares.add(share))
+        return shares
+
+    def receivingSession(self, session: int) -> Session | None:
+        """
+        Retorna la sesión de una parte recibida y registra la actividad.
+        Si la sesión se cerró, la parte se descarta y se retorna None.
+        """
+        state = self.session(session)
+        if state is None:
+            self._metrics["partes_sesion_cerrada"] += 1
+            return None
+        state.touch()
+        return state
+
+    def countShare(self, kind: str, new: bool):
+        """
+        Actualiza los contadores de metrics: las partes nuevas de cada tipo y las descartadas (duplicadas o de emisores desconocidos).
+        """
+        self._metrics[kind if new else "partes_descartadas"] += 1
+
+    def metrics(self) -> dict[str, int | str]:
+        """
+        Retorna los contadores del usuario: partes recibidas de cada tipo, partes descartadas, partes de entrada almacenadas
+        (incluye las cargadas del archivo del almacén), rondas y lotes completados, sesiones abiertas,
+        y el avance (partes recibidas / esperadas) de cada ronda pendiente. El avance de las sesiones que no son
+        la por defecto lleva el número de sesión como prefijo.
+        """
+        with self._state_changed:
+            metrics: dict[str, int | str] = dict(self._metrics)
+            metrics["sesiones_abiertas"] = len(self.sessions)
+            for session, state in self.sessions.items():
+                prefix = "" if session == DEFAULT_SESSION else f"sesión {session}, "
+                metrics[f"{prefix}partes_entrada_almacenadas"] = len(state.input_shares)
+                for index, shares in state.multiplication_shares.items():
+                    if not shares.complete:
+                        metrics[f"{prefix}operación #{index}"] = f"{len(shares)}/{shares.size}"
+                for (layer, position), shares in state.tree_shares.items():
+                    if not shares.complete:
+                        metrics[f"{prefix}árbol {layer}.{position}"] = f"{len(shares)}/{shares.size}"
+                for batch_id, received in state.batch_shares.items():
+                    metrics[f"{prefix}lote #{batch_id}"] = f"{len(received)}/{len(self.party)}"
+                for stream_id, sink in state.streams.items():
+                    if not sink.complete(self._party_order):
+                        metrics[f"{prefix}flujo #{stream_id}"] = f"{len(sink.finished)}/{len(self.party)}"
+                if state.final_shares is not None and not state.final_shares.complete:
+                    metrics[f"{prefix}partes finales"] = f"{len(state.final_shares)}/{state.final_shares.size}"
+            metrics.update(self.pool.stats())
+            return metrics
+
+    def resetComputation(self, session: int = DEFAULT_SESSION):
+        """
+        Borra el estado del cálculo (partes, rondas, resultados y partes finales) para empezar otro con los mismos usuarios.
+        Las conexiones se conservan en el pool, así que el cálculo siguiente no vuelve a conectarse.
+
+        Todos los usuarios deben llamarlo después de reconstruir el resultado y antes de que alguno empiece el cálculo siguiente,
+        ya que las partes que lleguen antes de llamarlo se borran.
+        Para varios cálculos a la vez es mejor usar una sesión para cada uno (openSession, closeSession).
+        """
+        with self._state_changed:
+            state = self.session(session)
+            if state is not None:
+                state.reset()
+            self._metrics["calculos_reiniciados"] += 1
+            self._state_changed.notify_all()
 
     def log(self, message: str):
         """
-        Imprime un mensaje en la consola con el UUID del usuario.
+        Imprime un mensaje en la consola con el UUID del usuario, salvo que el usuario esté cerrado.
         """
+        if self.closed:
+            return
         print(f"\n[{self.uuid}] {message}")
 
     def broadcast(self, message: str):
@@ -180,25 +565,28 @@ class MainUser:
         Crea un socket y lo envuelve en una conexión segura.
         Se envía un mensaje de solicitud de conexión y se espera una respuesta.
         Si la conexión es exitosa, se retorna el socket seguro.
-        Este socket se descarta, ya que es temporal para la conexión.
+        Este socket se conserva y, cuando el usuario responde, es el que se usa para enviarle mensajes.
         """
         secure_connection = None
         attempt = 0
         
         while attempt < retries:
             try:
-                connection = Socket(AF_INET, SOCK_STREAM)
-                secure_connection = self.client_context.wrap_socket(connection, server_hostname=HOSTNAME)
-                secure_connection.connect((ip, port))
+                secure_connection = self.pool.open(ip, port)
                 
                 protocol = RequestConnectionProtocol(self)
                 protocol.send_message(secure_connection)
+
+                # La conexión se conserva para enviarle los mensajes cuando responda con ACCEPT_CONNECTION.
+                with self._state_changed:
+                    self._outbound[(ip, port)] = secure_connection
                 
                 self.log(f"Enviando solicitud de conexión a {ip}:{port}")
                 return secure_connection  # Return on successful connection
             
             except Exception as e:
-                if e.args[0] == 10061:
+                # 10061 en Windows y ECONNREFUSED en Linux: el usuario todavía no inició su servidor.
+                if isinstance(e, ConnectionRefusedError) or e.args[0] == 10061:
                     self.log(f"No se pudo conectar a {ip}:{port} (Intento {attempt + 1}/{retries}): {str(e)}")
                     attempt += 1
                     if attempt < retries:
@@ -210,27 +598,254 @@ class MainUser:
                     self.log(f"Error inesperado al conectar a {ip}:{port}: {str(e)}")
                     break
 
-    def addConnection(self, ip: str, port: int, uuid: str) -> NetworkUser | None:
+    def addConnection(self, ip: str, port: int, uuid: str, binary: bool = False, accept: bool = True) -> NetworkUser | None:
         """
         Añade un usuario a la lista de conexiones.
-        Se crea un socket seguro y se envía un mensaje de aceptación de conexión.
+        Se usa la conexión que se abrió al enviarle la solicitud (connect), o se crea un socket seguro nuevo,
+        y se envía un mensaje de aceptación de conexión (si accept es True).
         Se retorna el usuario creado.
         El usuario se almacena en un diccionario con el UUID como clave.
+
+        binary indica si el usuario anunció que soporta el formato binario.
+        Si el usuario ya existe, solo se actualiza este valor.
         """
+        with self._state_changed:
+            connection = self._outbound.pop((ip, port), None)
         if uuid in self.party:
+            self.setBinary(self.party[uuid], binary)
+            if connection is not None and connection is not self.party[uuid].host:
+                connection.close()
             return None
-        connection = Socket(AF_INET, SOCK_STREAM)
-        secure_connection = self.client_context.wrap_socket(connection, server_hostname=HOSTNAME)
-        secure_connection.connect((ip, port))
-        user = NetworkUser(secure_connection, uuid)
-        self.party[uuid] = user
-        self.party = dict(sorted(self.party.items()))
-        self.log(f"Conexión establecida con {uuid} | {ip}:{port}")
-        acceptProtocol = AcceptConectionProtocol(self)
-        acceptProtocol.send_message(user.host)
+        if connection is None:
+            connection = self.openConnection(ip, port)
+        user = self.registerUser(connection, uuid, ip, port, binary)
+        if user is None:
+            return None
+        if accept:
+            acceptProtocol = AcceptConectionProtocol(self)
+            acceptProtocol.send_message(user.host)
 
         return user
 
+    def registerUser(self, connection: Socket, uuid: str, ip: str, port: int, binary: bool) -> NetworkUser | None:
+        """
+        Añade a la red un usuario cuya conexión de salida ya está abierta.
+
+        El UUID se inserta en su lugar del orden de la red, sin reordenar todo el diccionario.
+        party y _party_order se reemplazan por copias en lugar de modificarse,
+        así quien los esté recorriendo en otro hilo no ve cambiar su tamaño.
+        Si otro hilo añadió al usuario mientras se abría la conexión, se cierra la conexión sobrante y se retorna None.
+        """
+        with self._state_changed:
+            if uuid in self.party:
+                self.setBinary(self.party[uuid], binary)
+                user = None
+            else:
+                user = NetworkUser(connection, uuid)
+                self.setBinary(user, binary)
+                order = list(self._party_order)
+                insort(order, uuid)
+                party = dict(self.party)
+                party[uuid] = user
+                self.party = {key: party[key] for key in order}
+                self.pool.adopt(uuid, connection)
+                self._party_order = order
+                self.checkMembership()
+                self._state_changed.notify_all()
+        if user is None:
+            connection.close()
+            return None
+        self.log(f"Conexión establecida con {uuid} | {ip}:{port}")
+        return user
+
+    def openConnectionRetrying(self, ip: str, port: int, retries: int = BOOTSTRAP_RETRIES, backoff: float = BOOTSTRAP_BACKOFF) -> Socket | None:
+        """
+        Abre la conexión de salida con un usuario, reintentando si todavía no inició su servidor.
+        Entre intentos se espera backoff, 2 · backoff, 4 · backoff... hasta BOOTSTRAP_MAX_DELAY.
+        Se retorna None si se agotan los intentos.
+        """
+        delay = backoff
+        for attempt in range(retries):
+            try:
+                return self.openConnection(ip, port)
+            except OSError as e:
+                if attempt + 1 == retries:
+                    self.log(f"No se pudo conectar a {ip}:{port} después de {retries} intentos: {e}")
+                    return None
+                time.sleep(delay)
+                delay = min(2 * delay, BOOTSTRAP_MAX_DELAY)
+
+    def bootstrap(self, roster: list[tuple[str, int]], timeout: float | None = None) -> bool:
+        """
+        Conecta al usuario con todos los de roster (direcciones IP y puertos) a la vez, en lugar de uno por uno con connect.
+        Todos los usuarios de la lista deben llamarlo con la misma lista; la dirección propia se ignora.
+
+        1. Se abren en paralelo (hasta BOOTSTRAP_WORKERS a la vez) las conexiones de salida con todos, con reintentos.
+        2. Por cada conexión se envía JOIN. Quien lo recibe añade al usuario a la red usando su propia conexión de salida
+           hacia él, sin reenviar el mensaje ni responder, así que cada par de usuarios abre solo dos conexiones.
+        3. Cuando la red está completa, se envía a todos MEMBERSHIP con un resumen de la lista de usuarios,
+           y se espera el de los demás.
+
+        Si un usuario anuncia en su JOIN una dirección distinta a la de la lista (por ejemplo, otro nombre del mismo equipo),
+        se le abre una conexión nueva y la que se abrió hacia la dirección de la lista queda sin usar;
+        al terminar, esas conexiones se cierran (ver dropUnclaimedJoins).
+
+        Así, la red se arma en un número constante de rondas sin importar la cantidad de usuarios.
+        Se retorna True si todos los usuarios terminaron con la misma lista.
+        """
+        peers = [(ip, int(port)) for ip, port in roster if (ip, int(port)) != (self.ip, self.port)]
+        with self._state_changed:
+            self._roster.update(peers)
+            self._expected_party = len(peers) + 1
+
+        if peers:
+            with ThreadPoolExecutor(min(len(peers), BOOTSTRAP_WORKERS)) as pool:
+                opened = list(pool.map(lambda peer: self.joinPeer(*peer), peers))
+            if not all(opened):
+                self.dropUnclaimedJoins(peers)
+                return False
+        complete = self.waitForParty(len(peers) + 1, timeout)
+        self.dropUnclaimedJoins(peers)
+        if not complete:
+            self.log(f"La red no se completó: {len(self.party)} de {len(peers) + 1} usuarios")
+            return False
+
+        self.sendMembership()
+        return self.waitForMembership(timeout)
+
+    def joinPeer(self, ip: str, port: int) -> bool:
+        """
+        Abre la conexión de salida con un usuario de la lista y le envía JOIN.
+        Si su JOIN ya había llegado, se lo añade a la red con esta conexión.
+        """
+        connection = self.openConnectionRetrying(ip, port)
+        if connection is None:
+            return False
+        JoinProtocol(self).send_message(connection)
+        with self._state_changed:
+            pending = self._pending_joins.pop((ip, port), None)
+            if pending is None:
+                self._outbound[(ip, port)] = connection
+        if pending is not None:
+            self.registerUser(connection, pending[0], ip, port, pending[1])
+        return True
+
+    def dropUnclaimedJoins(self, peers: list[tuple[str, int]]):
+        """
+        Cierra y descarta las conexiones de salida hacia direcciones de la lista que ningún JOIN reclamó,
+        porque el usuario anunció otra dirección o no llegó a unirse.
+        """
+        with self._state_changed:
+            unclaimed = [(peer, self._outbound.pop(peer)) for peer in peers if peer in self._outbound]
+            for peer in peers:
+                self._pending_joins.pop(peer, None)
+        for (ip, port), connection in unclaimed:
+            self.log(f"Se cierra la conexión sin JOIN con {ip}:{port}")
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def onJoin(self, uuid: str, ip: str, port: int, binary: bool):
+        """
+        Cuando llega JOIN, se añade al usuario con la conexión que se le abrió en joinPeer.
+        Si esa conexión todavía se está abriendo, se guarda el JOIN y se añade al terminar.
+        Si el usuario no está en la lista (o no se llamó a bootstrap), se abre una conexión nueva;
+        la que se le abrió con la dirección de la lista se cierra al terminar bootstrap.
+        """
+        with self._state_changed:
+            connection = self._outbound.pop((ip, port), None)
+            if connection is None and (ip, port) in self._roster and uuid not in self.party:
+                self._pending_joins[(ip, port)] = (uuid, binary)
+                return
+            if connection is None and self._roster and (ip, port) not in self._roster:
+                self.log(f"{uuid} anunció {ip}:{port}, que no está en la lista de bootstrap")
+        if connection is None:
+            self.addConnection(ip, port, uuid, binary, accept=False)
+        else:
+            self.registerUser(connection, uuid, ip, port, binary)
+
+    def membershipDigest(self) -> str:
+        """
+        Retorna un resumen (SHA-256 abreviado) de la lista ordenada de UUID de la red.
+        """
+        return hashlib.sha256("\n".join(self._party_order).encode("utf-8")).hexdigest()[:16]
+
+    def sendMembership(self):
+        """
+        Envía a todos el resumen de la red (MEMBERSHIP).
+        """
+        digest = self.membershipDigest()
+        for user in self.party.values():
+            MembershipProtocol(self).send_message(user.host, digest, len(self.party))
+
+    def onReceiveMembership(self, uuid: str, count: int, digest: str):
+        """
+        Guarda el resumen de la red de un usuario y comprueba si ya llegaron todos.
+        """
+        with self._state_changed:
+            if count != self._expected_party and self._expected_party:
+                self.log(f"{uuid} tiene {count} usuarios en la red, se esperaban {self._expected_party}")
+            self._memberships[uuid] = digest
+            self.checkMembership()
+
+    def checkMembership(self):
+        """
+        Cuando la red está completa y llegó el resumen de todos sus usuarios, se comparan con el propio.
+        membership_agreed indica si todos coinciden, y se avisa con membership_event.
+        """
+        with self._state_changed:
+            if self.membership_event.is_set() or len(self._party_order) < self._expected_party:
+                return
+            if any(uuid not in self._memberships for uuid in self._party_order):
+                return
+            own = self.membershipDigest()
+            different = [uuid for uuid, digest in self._memberships.items() if digest != own]
+            if different:
+                self.log(f"La red de {', '.join(different)} no coincide con la propia")
+            self.membership_agreed = not different
+            self.membership_event.set()
+
+    def waitForMembership(self, timeout: float | None = None) -> bool:
+        """
+        Espera el resumen de la red de todos los usuarios. Retorna True si todos coinciden.
+        """
+        return self.membership_event.wait(timeout) and self.membership_agreed
+
+    def openConnection(self, ip: str, port: int) -> PooledConnection:
+        """
+        Abre la conexión segura que se usa para enviar mensajes a un usuario.
+        La abre el pool de conexiones, que reanuda la sesión TLS si ya se había conectado con esa dirección.
+        """
+        return self.pool.open(ip, port)
+
+    def onSendError(self, connection: PooledConnection, error: Exception, messages: int):
+        """
+        Informa que no se pudieron enviar messages mensajes a una conexión, ya sea desde su hilo escritor
+        (ver PooledConnection) o al enviar un share (ver ShareProtocol.send_message).
+        """
+        self.log(f"No se pudieron enviar {messages} mensajes a {connection.ip}:{connection.port}: {error}")
+
+    def runLater(self, delay: float, function, *args):
+        """
+        Ejecuta function(*args) después de delay segundos.
+        En MainUser se espera en el mismo hilo que recibió el mensaje.
+        """
+        if delay > 0:
+            time.sleep(delay)
+        function(*args)
+
+    def setBinary(self, user: NetworkUser, binary: bool):
+        """
+        Actualiza si se usa el formato binario con un usuario.
+        Solo se usa si ambos lo soportan.
+        """
+        user.binary = binary
+        if binary and self.binary:
+            self._binary_hosts.add(user.host)
+        else:
+            self._binary_hosts.discard(user.host)
+
     def receive(self, message: str):
         """
         Despues de haberse separado correctamente el mensaje del buffer, se envía a esta función para su procesamiento.
@@ -248,7 +863,20 @@ class MainUser:
         except Exception as e:
             self.log(f"Error al recibir mensaje: {e}")
 
-    def send_number(self, numero: int, protocol: type[NetworkProtocol] = InputShareProtocol, *args) -> list[Field]:
+    def receiveFrame(self, opcode: int, payload: memoryview):
+        """
+        Procesa una trama binaria ya separada del buffer.
+        Se busca el protocolo por su código y se le entrega el contenido de la trama.
+        """
+        try:
+            protocol = BINARY_PROTOCOLS.get(opcode)
+            if protocol is None:
+                raise Exception(f"Código de protocolo no reconocido: {opcode}")
+            protocol(self).receive_frame(payload)
+        except Exception as e:
+            self.log(f"Error al recibir trama: {e}")
+
+    def send_number(self, numero: int, protocol: type[NetworkProtocol] = InputShareProtocol, *args, session: int = DEFAULT_SESSION) -> list[Field]:
         """
         Envia un número a todos los usuarios conectados.
 
@@ -256,6 +884,9 @@ class MainUser:
 
         Se utiliza el protocolo especificado para enviar la parte correspondiente.
         Por defecto, se utiliza InputShareProtocol.
+        Las partes pertenecen a la sesión indicada.
+        Cada parte solo se encola en la conexión de su usuario (ver PooledConnection), así que un usuario lento
+        no retrasa el envío a los demás.
 
         Se retorna una lista con las partes generadas por el protocolo.
         """
@@ -264,100 +895,393 @@ class MainUser:
         for indice, uuid in enumerate(self.party):
             user  = self.party[uuid]
             share = shares[indice]
-            protocol_instance = protocol(self)
+            protocol_instance = protocol(self, session)
             protocol_instance.send_message(user.host, share, *args)
         return shares
 
-    def onReceiveInputShare(self, user: NetworkUser, share: Protocol.SharedVariable):
+    def send_numbers(self, numeros: list[int], protocol: type[NetworkProtocol] = InputShareProtocol, *args, session: int = DEFAULT_SESSION):
         """
-        Cuando se recibe una parte de una variable de entrada, se almacena en la lista de partes.
+        Envía un vector de números a todos los usuarios conectados.
+
+        A diferencia de send_number, las partes de todos los números se generan de una vez con
+        ShamirSecretSharing.generate_batch_shares, que evalúa todos los polinomios como un producto de matrices.
+        A cada usuario se le envía la fila de la matriz que le corresponde.
+
+        Se retorna la matriz de partes (una fila por usuario, una columna por número).
         """
-        self._input_shares[share.uuid] = share
+        shares = Shamirss.ShamirSecretSharing.generate_batch_shares(numeros, len(self.party), self.t, self.mod)
+        for indice, uuid in enumerate(self.party):
+            user = self.party[uuid]
+            protocol_instance = protocol(self, session)
+            for value in shares[indice]:
+                protocol_instance.send_message(user.host, Field(int(value), self.mod), *args)
+        return shares
 
-    def onReceiveProductShare(self, user: NetworkUser, share: Protocol.MultiplicationVariable, operation_index: int):
+    def onReceiveInputShare(self, user: NetworkUser, share: Protocol.SharedVariable, session: int = DEFAULT_SESSION):
+        """
+        Cuando se recibe una parte de una variable de entrada, se almacena en la lista de partes de su sesión.
+        Una parte de una variable que ya se recibió (mismo UUID de variable) se descarta.
+        Se avisa a quienes estén esperando partes con waitUntil o waitForInputs.
         """
-        Cuando se recibe una parte de una multiplicación, se almacena en la lista de partes.
+        if share.value.mod != self.mod:
+            self.log(f"Parte de {user.uuid} con módulo diferente: {share.value.mod}")
+            return
+        with self._state_changed:
+            state = self.receivingSession(session)
+            if state is None:
+                return
+            new = state.input_shares.add(share.sender, share.value.value, share.uuid) is not None
+            self.countShare("partes_entrada_recibidas", new)
+            if new:
+                self._state_changed.notify_all()
+
+    def onReceiveProductShare(self, user: NetworkUser, share: Protocol.MultiplicationVariable, operation_index: int, session: int = DEFAULT_SESSION):
+        """
+        Cuando se recibe una parte de una multiplicación, se almacena en la lista de partes de su sesión.
         Se verifica si se han recibido todas las partes de la multiplicación.
 
         Si se han recibido todas las partes, se calcula el resultado de la multiplicación y se envía a los demás usuarios.
         Este proceso se repite hasta que se hayan calculado todos los resultados de las multiplicaciones.
 
         Cuando se han calculado todos los resultados, se envía la parte final a los demás usuarios.
+
+        La siguiente ronda empieza en cuanto se completa esta (después de round_delay, que por defecto es 0).
+        La verificación se hace con un candado, para que solo uno de los hilos que reciben partes complete la ronda.
         """
-        self.addMultiplicationShare(share)
+        with self._state_changed:
+            state = self.receivingSession(session)
+            if state is None:
+                return
+            shares = self.addMultiplicationShare(state, share)
 
-        shares = self.getMultiplicationShare(operation_index)
+            if not shares.complete or operation_index in state.completed_rounds:
+                return
+            state.completed_rounds.add(operation_index)
+            self._metrics["rondas_completas"] += 1
+            result = Shamirss.ShamirSecretSharing.recuperar_secreto(shares.shares()) # type: ignore
+            state.multiplication_results.append(result)
+            finished = len(state.multiplication_results) >= len(state.input_shares) - 1
+            self.roundEvent(operation_index, session).set()
+            self._state_changed.notify_all()
 
-        if len(shares) == len(self.party):
-            result = Shamirss.ShamirSecretSharing.recuperar_secreto(shares) # type: ignore
-            self.multiplication_results.append(result)
-            if len(self.multiplication_results) < len(self.input_shares) - 1:
-                time.sleep(2.2)
-                self.sendOperation(operation_index + 1)
-            else:
-                time.sleep(2.2)
-                self.sendFinalShare(user)
+        if not finished:
+            self.runLater(self.round_delay, self.sendOperation, operation_index + 1, session)
+        else:
+            self.runLater(self.round_delay, self.sendFinalShares, session)
     
-    def sendFinalShare(self, user: NetworkUser):
+    def sendTreeOperation(self, layer: int = 0, session: int = DEFAULT_SESSION):
         """
-        Envia la parte final de la multiplicación a un usuario específico.
+        Envía las multiplicaciones de una capa del árbol de productos a todos los usuarios conectados.
+
+        En la capa 0 se usan las partes de las variables de entrada. Cada pareja de valores se multiplica localmente
+        y se comparte con TreeShareProtocol, identificada por (capa, posición). Todas las parejas de la capa se envían
+        en la misma ronda, así que el producto de n entradas toma ceil(log2 n) rondas en lugar de n - 1.
+        Si la capa tiene una cantidad impar de valores, el último pasa a la capa siguiente sin comunicación.
         """
-        protocol = FinalShareProtocol(self)
-        protocol.send_message(user.host, self.multiplication_results[-1])
+        with self._state_changed:
+            state = self.session(session)
+            if state is None:
+                return
+            if layer == 0:
+                state.tree_layers[0] = [share.value for share in self.inputShares(session)]
+            values = state.tree_layers[layer]
+            products = Protocol.Multiplication.generate_tree_multiplications(values) # type: ignore
+            if layer + 1 not in state.tree_layers:
+                state.tree_layers[layer + 1] = Protocol.Multiplication.next_tree_layer(values, [None] * len(products)) # type: ignore
+                state.tree_pending[layer + 1] = len(products)
+        for position, product in enumerate(products):
+            self.send_number(product.value, TreeShareProtocol, layer, position, session=session)
 
+    def onReceiveTreeShare(self, user: NetworkUser, share: Protocol.MultiplicationVariable, layer: int, position: int, session: int = DEFAULT_SESSION):
+        """
+        Cuando se recibe una parte de una multiplicación del árbol, se almacena según su capa y posición.
 
-    def onReceiveFinalShare(self, user: NetworkUser, share: Protocol.SharedVariable):
+        Cuando están las partes de todos los usuarios para una pareja, se reduce el grado con Shamir Secret Sharing
+        y el resultado pasa a la capa siguiente. Cuando se completan todas las parejas de la capa se envía la capa siguiente,
+        o la parte final si solo queda un valor.
+        Las partes de una capa pueden llegar antes de que este usuario la haya enviado; se guardan hasta que esté completa.
         """
-        Al recibir la parte final de una multiplicación, se almacena en la lista de partes finales.
-        Se verifica si se han recibido todas las partes finales.
+        with self._state_changed:
+            state = self.receivingSession(session)
+            if state is None:
+                return
+            shares = state.tree_shares.get((layer, position))
+            if shares is None:
+                shares = state.tree_shares[(layer, position)] = self.newRound()
+            new = shares.add(share)
+            self.countShare("partes_arbol", new)
+            if not new:
+                return
+
+            next_layer = state.tree_layers.get(layer + 1)
+            if not shares.complete or next_layer is None or next_layer[position] is not None:
+                return
+            result = Shamirss.ShamirSecretSharing.recuperar_secreto(shares.shares()) # type: ignore
+            next_layer[position] = result
+            state.multiplication_results.append(result)
+            state.tree_pending[layer + 1] -= 1
+            if state.tree_pending[layer + 1] > 0:
+                return
+            self._metrics["rondas_completas"] += 1
+            finished = len(next_layer) == 1
+            self.roundEvent(layer, session).set()
+            self._state_changed.notify_all()
+
+        if not finished:
+            self.runLater(self.round_delay, self.sendTreeOperation, layer + 1, session)
+        else:
+            self.runLater(self.round_delay, self.sendFinalShares, session)
+
+    def multiplyBatch(self, left: list[Field], right: list[Field], batch_id: int | None = None, session: int = DEFAULT_SESSION) -> int:
+        """
+        Inicia k multiplicaciones independientes en una sola ronda: left[j] * right[j] para cada j.
+
+        Se multiplican localmente las partes, y todos los productos se reparten a la vez con
+        ShamirSecretSharing.generate_batch_shares. A cada usuario se le envía en un solo mensaje (ProductVectorProtocol)
+        el vector con su parte de cada producto, así que la cantidad de mensajes y de rondas no crece con k.
+
+        Todos los usuarios deben llamar a multiplyBatch con los mismos productos y en el mismo orden,
+        porque el identificador del lote se toma de un contador de la sesión (o se indica con batch_id).
+        El resultado se obtiene con waitForBatch o en batch_results.
+
+        Se retorna el identificador del lote.
+        """
+        if len(left) != len(right):
+            raise Exception("Los vectores deben tener la misma longitud")
+        return self.shareBatch([(a * b).value for a, b in zip(left, right)], batch_id, session)
+
+    def shareBatch(self, values: list[int], batch_id: int | None = None, session: int = DEFAULT_SESSION) -> int:
+        """
+        Reparte un vector de valores propios con ShamirSecretSharing.generate_batch_shares,
+        enviando a cada usuario su fila de la matriz en un solo mensaje (ProductVectorProtocol).
+
+        Cada usuario combina los vectores de todos con los coeficientes de Lagrange, así que el resultado del lote
+        son partes de Σ λ_i · v_i, donde v_i es el vector del usuario i. En multiplyBatch, v_i son los productos locales
+        y la combinación reduce el grado. Si cada usuario reparte valores aleatorios, el resultado son partes de valores
+        aleatorios que nadie conoce (ver Beaver.TriplePool).
+
+        Se retorna el identificador del lote.
+        """
+        if batch_id is None:
+            batch_id = next(self.activeSession(session).batch_ids)
+        shares = Shamirss.ShamirSecretSharing.generate_batch_shares(values, len(self.party), self.t, self.mod)
+        protocol = ProductVectorProtocol(self, session)
+        for indice, user in enumerate(list(self.party.values())):
+            protocol.send_message(user.host, [int(value) for value in shares[indice]], self.mod, batch_id)
+        return batch_id
+
+    def openBatch(self, values: list[Field], batch_id: int | None = None, session: int = DEFAULT_SESSION) -> int:
+        """
+        Abre varios valores compartidos a la vez.
+        Se envía a todos los usuarios el mismo vector con las partes propias (ProductVectorProtocol),
+        y cada uno recupera los valores con interpolación de Lagrange, igual que al reducir el grado en multiplyBatch.
+        Los valores abiertos se obtienen con waitForBatch o en batch_results.
+
+        Se retorna el identificador del lote.
+        """
+        if batch_id is None:
+            batch_id = next(self.activeSession(session).batch_ids)
+        protocol = ProductVectorProtocol(self, session)
+        vector = [value.value for value in values]
+        for user in list(self.party.values()):
+            protocol.send_message(user.host, vector, self.mod, batch_id)
+        return batch_id
+
+    def onReceiveProductVector(self, user: NetworkUser, batch_id: int, values: list[int], session: int = DEFAULT_SESSION):
+        """
+        Cuando se recibe el vector de partes de un lote, se almacena según el usuario que lo envió.
+        Cuando están los vectores de todos los usuarios, se reduce el grado de todos los productos a la vez
+        (los coeficientes de Lagrange son los mismos para todas las columnas) y se guarda el resultado en los resultados de lotes de la sesión.
+        """
+        with self._state_changed:
+            state = self.receivingSession(session)
+            if state is None or batch_id in state.batch_results:
+                return
+            received = state.batch_shares.setdefault(batch_id, {})
+            self.countShare("vectores", user.uuid not in received)
+            received[user.uuid] = values
+            if len(received) < len(self.party):
+                return
+            rows = [received[uuid] for uuid in self._party_order]
+            if len(set(map(len, rows))) != 1:
+                self.log(f"Los vectores del lote {batch_id} tienen longitudes diferentes")
+                return
+            state.batch_results[batch_id] = Shamirss.ShamirSecretSharing.recuperar_secretos(rows, self.mod)
+            del state.batch_shares[batch_id]
+            self._metrics["lotes_completos"] += 1
+            self._state_changed.notify_all()
+
+    def waitForBatch(self, batch_id: int, timeout: float | None = None, session: int = DEFAULT_SESSION) -> list[Field] | None:
+        """
+        Espera a que se complete el lote indicado y retorna las partes de sus productos.
+        Retorna None si se agota el tiempo de espera o si la sesión está cerrada.
+        """
+        state = self.session(session)
+        if state is None:
+            return None
+        results = state.batch_results
+        if not self.waitUntil(lambda: batch_id in results, timeout):
+            return None
+        return results[batch_id]
 
-        Si esta parte es nueva, se añade a la lista de partes finales y se envía las partes del usuario a los demás.
+    def openStream(self, stream_id: int, session: int = DEFAULT_SESSION) -> Streaming.StreamSink | None:
         """
-        if (share in self.final_shares):
+        Retorna dónde se guardan las partes recibidas del flujo indicado, y lo crea si no existe.
+        Retorna None si la sesión ya se cerró.
+        """
+        with self._state_changed:
+            state = self.session(session)
+            if state is None:
+                return None
+            sink = state.streams.get(stream_id)
+            if sink is None:
+                path = Streaming.sink_path(self.stream_store, self.uuid, stream_id, session)
+                sink = state.streams[stream_id] = Streaming.StreamSink(stream_id, self.mod, path)
+            return sink
+
+    def shareStream(self, blocks, stream_id: int = 0, session: int = DEFAULT_SESSION, window: int = Streaming.STREAM_WINDOW) -> dict:
+        """
+        Reparte un flujo de bloques de elementos del campo (por ejemplo Streaming.read_blocks) con memoria acotada:
+        cada bloque se reparte con generate_batch_shares y cada usuario recibe su fila en un mensaje STREAM_CHUNK
+        (ver Streaming.StreamSharer). Todos los usuarios pueden repartir su propio flujo con el mismo stream_id.
+        Se retornan las estadísticas del envío.
+        """
+        return Streaming.StreamSharer(self, stream_id, session, window).share(blocks)
+
+    def shareFile(self, path: str, stream_id: int = 0, session: int = DEFAULT_SESSION, block: int = Streaming.STREAM_BLOCK) -> dict:
+        """
+        Reparte el contenido de un archivo como un flujo, leyéndolo por bloques de block elementos.
+        Se retornan las estadísticas del envío, con el tamaño del archivo en "bytes".
+        """
+        stats = self.shareStream(Streaming.read_blocks(path, self.mod, block), stream_id, session)
+        stats["bytes"] = os.path.getsize(path)
+        return stats
+
+    def sendStreamChunk(self, user: NetworkUser, stream_id: int, seq: int, values: list[int], last: bool, session: int = DEFAULT_SESSION):
+        """
+        Envía a un usuario un bloque de sus partes de un flujo.
+        """
+        StreamChunkProtocol(self, session).send_message(user.host, values, stream_id, seq, last)
+
+    def onReceiveStreamChunk(self, user: NetworkUser, stream_id: int, seq: int, values: list[int], last: bool, session: int = DEFAULT_SESSION):
+        """
+        Cuando se recibe un bloque de un flujo, se añade a las partes del emisor en ese flujo.
+        Los bloques repetidos o fuera de orden se descartan.
+        """
+        with self._state_changed:
+            if self.receivingSession(session) is None:
+                return
+            sink = self.openStream(stream_id, session)
+            self.countShare("bloques_flujo", sink.add(user.uuid, seq, values, last)) # type: ignore
+            if last:
+                self._state_changed.notify_all()
+
+    def waitForStream(self, stream_id: int, timeout: float | None = None, session: int = DEFAULT_SESSION) -> Streaming.StreamSink | None:
+        """
+        Espera a que terminen los flujos de todos los usuarios con el identificador indicado y retorna sus partes.
+        Retorna None si se agota el tiempo de espera.
+        """
+        sink = self.openStream(stream_id, session)
+        if sink is None or not self.waitUntil(lambda: sink.complete(self._party_order), timeout):
+            return None
+        return sink
+
+    def sendFinalShare(self, user: NetworkUser, session: int = DEFAULT_SESSION):
+        """
+        Envia la parte final de la multiplicación a un usuario específico.
+        """
+        state = self.session(session)
+        if state is None:
+            self.log(f"No se envía la parte final: la sesión {session} está cerrada")
             return
-        self.final_shares.append(share)
-        self.final_shares = list(sorted(self.final_shares, key=lambda x: x.sender))
+        protocol = FinalShareProtocol(self, session)
+        protocol.send_message(user.host, state.multiplication_results[-1])
 
-        self.log(f"Recibida parte final de {user.uuid}")
+    def sendFinalShares(self, session: int = DEFAULT_SESSION):
+        """
+        Envia la parte final de la multiplicación a todos los usuarios conectados.
+        Se llama una sola vez, cuando se completa la última operación.
+        """
+        for user in list(self.party.values()):
+            self.sendFinalShare(user, session)
 
-        for user in self.party.values():
-            self.sendFinalShare(user)
+    def onReceiveFinalShare(self, user: NetworkUser, share: Protocol.SharedVariable, session: int = DEFAULT_SESSION):
+        """
+        Al recibir la parte final de una multiplicación, se almacena en la lista de partes finales de su sesión.
+        Se verifica si se han recibido todas las partes finales.
+
+        Si esta parte es nueva, se añade a la lista de partes finales.
+        Cuando están las partes de todos los usuarios, se activa el final_event de la sesión.
+        """
+        with self._state_changed:
+            state = self.receivingSession(session)
+            if state is None:
+                return
+            if state.final_shares is None:
+                state.final_shares = self.newRound()
+            new = state.final_shares.add(share)
+            self.countShare("partes_finales", new)
+            if not new:
+                return
+            if state.final_shares.complete:
+                state.final_event.set()
+            self._state_changed.notify_all()
+
+        self.log(f"Recibida parte final de {user.uuid}" + (f" (sesión {session})" if session != DEFAULT_SESSION else ""))
         
-    def sendOperation(self, index: int = 0):
+    def sendOperation(self, index: int = 0, session: int = DEFAULT_SESSION):
         """
         Envía la operación de multiplicación a todos los usuarios conectados.
         Se genera la multiplicación correspondiente y se envía a los demás usuarios.
         Se utiliza el índice para identificar la operación.
         Se deben hacer n - 1 operaciones, donde n es el número de partes.
         """
-        index = len(self.multiplication_results)
-        m = Protocol.Multiplication.generate_next_multiplication(self, self.multiplication_results, self.input_shares, index)
-        self.send_number(m.value, ProductShareProtocol, index)
+        state = self.session(session)
+        if state is None:
+            return
+        index = len(state.multiplication_results)
+        m = Protocol.Multiplication.generate_next_multiplication(self, state.multiplication_results, self.inputShares(session), index)
+        self.send_number(m.value, ProductShareProtocol, index, session=session)
 
 
-    def reconstruct_secret(self) -> Field:
+    def reconstruct_secret(self, timeout: float | None = 0, session: int = DEFAULT_SESSION) -> Field:
         """
         Recupera el secreto a partir de las partes finales.
+        Si se indica timeout, primero se esperan las partes finales de todos los usuarios (None espera indefinidamente).
         Se verifica que haya suficientes partes para reconstruir el secreto.
         Utiliza Shamir Secret Sharing (interpolación de Lagrange) para recuperar el secreto.
         """
-        if len(self.final_shares) < self.t:
+        if timeout != 0:
+            self.waitForFinalShares(timeout, session)
+        final_shares = self.finalShares(session)
+        if len(final_shares) < self.t:
             raise Exception("No hay suficientes partes para reconstruir el secreto.")
-        return Shamirss.ShamirSecretSharing.recuperar_secreto(self.final_shares)
+        return Shamirss.ShamirSecretSharing.recuperar_secreto(final_shares)
     
-    def status(self):
+    def status(self, session: int = DEFAULT_SESSION):
         """
         Imprime en la consola el estado actual del usuario.
-        Se muestran los usuarios conectados, las partes de las variables de entrada, las operaciones y los resultados.
+        Se muestran los usuarios conectados, las sesiones abiertas, y las partes de las variables de entrada,
+        las operaciones y los resultados de la sesión indicada.
         """
         print(f"Usuarios conectados: ")
         for user in self.party.values():
             print(f"  - {user.uuid} ({user.ip}:{user.port})")
+        print("Sesiones: ", *sorted(self.sessions))
+        state = self.session(session)
+        if state is None:
+            print(f"La sesión {session} está cerrada.")
+            return
         print(f"Partes: ")
-        for share in self.input_shares:
+        for share in self.inputShares(session):
             print(f"  - {share}")
         print("Operaciones: ")
-        for index in range(len(self.__multiplication_shares)):
-            print(f"  - Operación #{index}: ", *self.getMultiplicationShare(index))
-        print("Resultados: ", *self.multiplication_results)
-        print("Final Shares: ", *self.final_shares)
\ No newline at end of file
+        for index in range(len(state.multiplication_shares)):
+            print(f"  - Operación #{index}: ", *self.getMultiplicationShare(index, session))
+        for layer, position in sorted(state.tree_shares):
+            print(f"  - Árbol capa {layer}, posición {position}: ", *state.tree_shares[(layer, position)].shares())
+        for batch_id, results in sorted(state.batch_results.items()):
+            print(f"  - Lote #{batch_id}: ", *results)
+        print("Resultados: ", *state.multiplication_results)
+        print("Final Shares: ", *self.finalShares(session))
+        print("Métricas: ", *(f"{name}={value}" for name, value in self.metrics().items()))
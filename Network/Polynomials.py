@@ -1,6 +1,17 @@
 import random
 from field_operations import Field
 
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional, sin él se usan listas de enteros de Python.
+    np = None
+
+EVAL_MANY_NUMPY_MIN = 64
+"""
+Cantidad mínima de puntos para que eval_many use NumPy (si está instalado).
+Con menos puntos cuesta más crear los arreglos que evaluar con enteros de Python.
+"""
+
 class Polynomio:
     """
     Clase que representa un polinomio.
@@ -20,6 +31,9 @@ class Polynomio:
     
     eval(x: int) -> int:
         Evalúa el polinomio en el valor x.
+
+    eval_many(xs: list[int]) -> list[Field]:
+        Evalúa el polinomio en varios puntos a la vez.
     
     __str__() -> str:
         Devuelve una representación en cadena del polinomio.
@@ -38,16 +52,46 @@ class Polynomio:
         return Polynomio(coefs)
 
     def eval(self, x: Field) -> Field:
+        """
+        Evalúa el polinomio con la regla de Horner, p(x) = c_0 + x(c_1 + x(c_2 + ...)), reduciendo en cada paso.
+        Se opera con enteros y solo se crea un Field al final.
+        """
         mod = self.coefs[0].mod
         if x.mod != mod:
             raise ValueError("El campo de evaluación no coincide con el campo del polinomio.")
 
-        result = Field(0, mod)
-        x_power = Field(1, mod)
-        for coef in self.coefs:
-            result += coef * x_power
-            x_power *= x
-        return result
+        point = x.value
+        result = 0
+        for coef in reversed(self.coefs):
+            result = (result * point + coef.value) % mod
+        return Field(result, mod)
+
+    def eval_many(self, xs: list[int]) -> list[Field]:
+        """
+        Evalúa el polinomio en todos los puntos xs (enteros) en una sola pasada por los coeficientes.
+
+        Es la regla de Horner aplicada a todos los puntos a la vez: en cada paso se actualiza el acumulador
+        de cada punto con un coeficiente, reduciendo módulo p, así los enteros nunca pasan de p^2 + p.
+        Con NumPy y al menos EVAL_MANY_NUMPY_MIN puntos, cada paso es una operación sobre un arreglo int64
+        (si p^2 + p cabe en 63 bits), y el costo pasa de n · (t + 1) operaciones de Python a t + 1 operaciones de arreglos.
+        """
+        mod = self.coefs[0].mod
+        values = [coef.value for coef in reversed(self.coefs)]
+
+        if np is not None and len(xs) >= EVAL_MANY_NUMPY_MIN and (mod - 1) * mod + mod < 2**63:
+            points = np.array([x % mod for x in xs], dtype=np.int64)
+            results = np.zeros(len(xs), dtype=np.int64)
+            for value in values:
+                results *= points
+                results += value
+                results %= mod
+            return [Field(int(result), mod) for result in results]
+
+        results = [0] * len(xs)
+        points = [x % mod for x in xs]
+        for value in values:
+            results = [(result * point + value) % mod for result, point in zip(results, points)]
+        return [Field(result, mod) for result in results]
 
     def __str__(self):
         terms = []
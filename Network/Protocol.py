@@ -39,6 +39,50 @@ class MultiplicationVariable(SharedVariable):
     def __str__(self):
         return super().__str__() + f" [{self.sender}]"
 
+class RoundShares:
+    """
+    Partes de una ronda (una operación de multiplicación, una pareja del árbol o las partes finales),
+    indexadas por la posición del emisor en la lista ordenada de la red.
+
+    Insertar, detectar duplicados y saber si la ronda está completa cuesta O(1),
+    y las partes ya quedan en el orden de la red, así que no hace falta ordenarlas.
+    La lista de emisores se fija al crear la ronda.
+    """
+    __slots__ = ("positions", "slots", "count")
+
+    def __init__(self, senders: list[str]):
+        self.positions = {sender: position for position, sender in enumerate(senders)}
+        self.slots: list[SharedVariable | None] = [None] * len(senders)
+        self.count = 0
+
+    def add(self, share: SharedVariable) -> bool:
+        """
+        Añade la parte de un emisor. Retorna False si el emisor no pertenece a la ronda o si ya había enviado su parte.
+        """
+        position = self.positions.get(share.sender)
+        if position is None or self.slots[position] is not None:
+            return False
+        self.slots[position] = share
+        self.count += 1
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def size(self) -> int:
+        return len(self.slots)
+
+    @property
+    def complete(self) -> bool:
+        return self.count == len(self.slots)
+
+    def shares(self) -> list[SharedVariable]:
+        """
+        Retorna las partes recibidas, en el orden de la red.
+        """
+        return [share for share in self.slots if share is not None]
+
 class Multiplication:
     @staticmethod
     def generate_next_multiplication(user: "NetworkUser.MainUser", multiplication_results: list[Field], input_shares: list[SharedVariable], index: int) -> Field:
@@ -61,3 +105,35 @@ class Multiplication:
         product = a * b
         return product
 
+    @staticmethod
+    def tree_depth(count: int) -> int:
+        """
+        Retorna la cantidad de rondas que necesita el árbol de productos para count valores, es decir ceil(log2 count).
+        """
+        return (count - 1).bit_length() if count > 1 else 0
+
+    @staticmethod
+    def generate_tree_multiplications(values: list[Field]) -> list[Field]:
+        """
+        Genera las multiplicaciones locales de una capa del árbol de productos.
+
+        Se multiplican los valores por parejas: la posición p de la capa siguiente es values[2p] * values[2p + 1].
+        Todas las parejas de una capa son independientes, así que se pueden enviar en la misma ronda.
+
+        Args:
+            values (list[Field]): Valores de la capa actual.
+        """
+        return [values[i] * values[i + 1] for i in range(0, len(values) - 1, 2)]
+
+    @staticmethod
+    def next_tree_layer(values: list[Field], products: list[Field | None]) -> list[Field | None]:
+        """
+        Retorna la capa siguiente del árbol de productos a partir de los productos de la capa actual.
+        Si la capa actual tiene una cantidad impar de valores, el último pasa a la capa siguiente sin multiplicarse.
+
+        Args:
+            values (list[Field]): Valores de la capa actual.
+            products (list[Field | None]): Productos de cada pareja (None si aún no se ha recibido).
+        """
+        return list(products) + values[2 * len(products):]
+
@@ -0,0 +1,89 @@
+import itertools
+import threading
+import time
+
+from field_operations import Field
+from ShareStore import ShareStore
+from Streaming import StreamSink
+import Protocol
+
+DEFAULT_SESSION = 0
+"""
+Sesión que se usa cuando no se indica otra. Es la que usan la consola y el modo por archivo.
+"""
+
+class Session:
+    """
+    Estado de un cálculo: partes de entrada, rondas de multiplicación, lotes, resultados y partes finales.
+
+    Un MainUser tiene una sesión por cálculo, identificada por un número que viaja en todos los mensajes de partes.
+    Así, varios cálculos independientes avanzan a la vez sobre las mismas conexiones sin mezclar sus partes.
+    Todos los usuarios deben usar el mismo número para el mismo cálculo.
+
+    Las sesiones no tienen candado propio: MainUser las modifica siempre con su candado (_state_changed).
+    """
+    def __init__(self, session_id: int, mod: int, share_store: str | None = None):
+        self.id = session_id
+        self.input_shares = ShareStore(mod, share_store)
+        self.multiplication_shares: dict[int, Protocol.RoundShares] = {}
+        self.multiplication_results: list[Field] = []
+        self.tree_layers: dict[int, list[Field | None]] = {}
+        self.tree_pending: dict[int, int] = {}
+        self.tree_shares: dict[tuple[int, int], Protocol.RoundShares] = {}
+        self.batch_ids = itertools.count()
+        self.batch_shares: dict[int, dict[str, list[int]]] = {}
+        self.batch_results: dict[int, list[Field]] = {}
+        self.final_shares: Protocol.RoundShares | None = None
+        self.streams: dict[int, StreamSink] = {}
+        self.round_events: dict[int, threading.Event] = {}
+        self.completed_rounds: set[int] = set()
+        self.final_event = threading.Event()
+        self.created = self.last_activity = time.monotonic()
+
+    def touch(self):
+        """
+        Registra actividad en la sesión, para closeIdleSessions.
+        """
+        self.last_activity = time.monotonic()
+
+    def idle(self) -> float:
+        """
+        Retorna los segundos desde la última actividad.
+        """
+        return time.monotonic() - self.last_activity
+
+    def reset(self):
+        """
+        Borra el estado del cálculo para empezar otro en la misma sesión.
+        El almacén de partes se vacía en lugar de reemplazarse, así conserva su archivo.
+        Los contadores de lotes siguen, para que un lote nuevo no se confunda con uno anterior.
+        """
+        self.input_shares.clear()
+        self.multiplication_shares = {}
+        self.multiplication_results = []
+        self.tree_layers = {}
+        self.tree_pending = {}
+        self.tree_shares = {}
+        self.batch_shares = {}
+        self.batch_results = {}
+        self.final_shares = None
+        self.close_streams()
+        self.round_events = {}
+        self.completed_rounds = set()
+        self.final_event.clear()
+        self.touch()
+
+    def close(self):
+        """
+        Libera el almacén de partes de la sesión y cierra los archivos de sus flujos.
+        """
+        self.input_shares.close()
+        self.close_streams()
+
+    def close_streams(self):
+        """
+        Cierra los archivos de los flujos recibidos y los olvida. Los archivos no se borran.
+        """
+        for sink in self.streams.values():
+            sink.close()
+        self.streams = {}
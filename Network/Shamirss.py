@@ -3,6 +3,12 @@ import Protocol
 from field_operations import Field
 
 import Lagrange
+import random
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional, sin él se usan listas de enteros de Python.
+    np = None
 
 class ShamirSecretSharing:
     """
@@ -25,8 +31,17 @@ class ShamirSecretSharing:
     generate_shares(t: int) -> list[SecretShare]:
         Genera las partes del secreto usando un polinomio aleatorio de grado t-1, a través de evaluaciones en el campo primo.
     
+    generate_batch_shares(secrets: list[int], num_shares: int, t: int, mod: int):
+        Genera las partes de un vector de secretos con un único producto de matrices.
+
+    generate_packed_shares(secrets: list[int], num_shares: int, t: int, k: int, mod: int):
+        Genera las partes de un vector de secretos empaquetando k secretos en cada polinomio.
+
     recuperar_secreto(shares: list[SecretShare], primo: int) -> Field:
         Recupera el secreto mediante interpolación de Lagrange en un campo finito.
+
+    recuperar_secretos_empaquetados(rows: list[list[int]], mod: int, k: int, count: int) -> list[Field]:
+        Recupera los secretos de un reparto empaquetado.
     """
     def __init__(self, secret: Field, num_shares: int):
         self.secret = secret
@@ -46,13 +61,148 @@ class ShamirSecretSharing:
         list[SecretShare]
             Lista de partes del secreto generadas.
         """
-        shares = []
         coeficientes_polinomio = Polynomio.random(t, self.secret)
-        for i in range(1, self.num_shares + 1):
-            shares.append(coeficientes_polinomio.eval(Field(i, self.secret.mod)))
-        
-        return shares
+        return coeficientes_polinomio.eval_many(range(1, self.num_shares + 1))
     
+    @staticmethod
+    def generate_batch_shares(secrets: list[int], num_shares: int, t: int, mod: int):
+        """
+        Genera las partes de un vector de secretos en una sola operación.
+
+        Cada secreto se comparte con su propio polinomio aleatorio de grado t, pero en lugar de
+        evaluar cada polinomio por separado con objetos Field, se construye la matriz de Vandermonde
+        V (num_shares x (t + 1)) de los puntos x = 1..n y se calcula S = V · C (mod p), donde
+        C ((t + 1) x k) tiene en cada columna los coeficientes de un polinomio.
+
+        Con NumPy se usa int64 cuando p^2 + p cabe en 63 bits (se reduce después de cada término,
+        así el resultado es exacto), y un arreglo de tipo object en otro caso.
+        Sin NumPy se usan listas de enteros de Python.
+
+        Parámetros:
+        -----------
+        secrets : list[int]
+            Secretos a compartir.
+        num_shares : int
+            Número de partes (n).
+        t : int
+            Grado de los polinomios.
+        mod : int
+            Módulo del campo.
+
+        Retorna:
+        --------
+        Matriz de num_shares x k, donde la fila i contiene las partes de la parte i + 1,
+        una por secreto (numpy.ndarray o list[list[int]]).
+        """
+        k = len(secrets)
+        vandermonde = [[pow(x, j, mod) for j in range(t + 1)] for x in range(1, num_shares + 1)]
+        # Los coeficientes salen siempre del módulo random, así una misma semilla da las mismas partes con o sin NumPy
+        coefs = [[s % mod for s in secrets]] + [[random.randrange(mod) for _ in range(k)] for _ in range(t)]
+
+        if np is None:
+            columns = list(zip(*coefs))
+            return [[sum(v * c for v, c in zip(row, column)) % mod for column in columns] for row in vandermonde]
+
+        if (mod - 1) * mod < 2**63:
+            V = np.array(vandermonde, dtype=np.int64)
+            C = np.array(coefs, dtype=np.int64)
+            S = np.zeros((num_shares, k), dtype=np.int64)
+            for j in range(t + 1):
+                S += np.outer(V[:, j], C[j])  # Cada término es menor que p^2
+                S %= mod
+            return S
+
+        V = np.array(vandermonde, dtype=object)
+        C = np.array(coefs, dtype=object)
+        return V.dot(C) % mod
+
+    @staticmethod
+    def generate_packed_shares(secrets: list[int], num_shares: int, t: int, k: int, mod: int) -> list[list[int]]:
+        """
+        Genera las partes de un vector de secretos con reparto empaquetado (Franklin–Yung).
+
+        Los secretos se agrupan en bloques de k (el último se completa con ceros). Cada bloque se guarda en un solo
+        polinomio de grado k + t - 1, que vale los k secretos en x = 0, -1, ..., -(k - 1) y t valores aleatorios
+        en x = -k, ..., -(k + t - 1). Cada parte recibe la evaluación del polinomio en su coordenada, así que por
+        cada k secretos se envía una parte a cada usuario en lugar de k.
+
+        A cambio, el umbral cambia: t partes no revelan nada de los secretos, pero se necesitan k + t partes
+        para reconstruirlos (en lugar de t + 1). Con k = 1 es el esquema de Shamir normal.
+
+        Las evaluaciones son un producto de matrices: la matriz de Lagrange de packed_sharing_matrix (en caché)
+        por la matriz de valores de cada bloque. Con NumPy se usa el mismo criterio que generate_batch_shares.
+
+        Parámetros:
+        -----------
+        secrets : list[int]
+            Secretos a compartir.
+        num_shares : int
+            Número de partes (n).
+        t : int
+            Cantidad de partes que pueden coludirse sin aprender nada de los secretos.
+        k : int
+            Secretos por polinomio.
+        mod : int
+            Módulo del campo.
+
+        Retorna:
+        --------
+        Matriz de num_shares x ceil(len(secrets) / k), donde la fila i contiene las partes de la parte i + 1,
+        una por bloque.
+        """
+        if k < 1 or t < 1:
+            raise ValueError("k y t deben ser al menos 1")
+        if k + t > num_shares:
+            raise ValueError(f"Con k={k} y t={t} se necesitan al menos {k + t} partes para reconstruir, y solo hay {num_shares}")
+        if num_shares + k + t > mod:
+            raise ValueError("El módulo es demasiado pequeño para las coordenadas del reparto empaquetado")
+
+        blocks = -(-len(secrets) // k)
+        padded = [s % mod for s in secrets] + [0] * (blocks * k - len(secrets))
+        # values[m][b]: valor del polinomio del bloque b en el punto m (primero los k secretos, después los t aleatorios)
+        values = [padded[j::k] for j in range(k)] + [[random.randrange(mod) for _ in range(blocks)] for _ in range(t)]
+        matrix = Lagrange.packed_sharing_matrix(mod, k, t, num_shares)
+
+        if np is not None and (mod - 1) * mod < 2**63:
+            L = np.array(matrix, dtype=np.int64)
+            Y = np.array(values, dtype=np.int64)
+            S = np.zeros((num_shares, blocks), dtype=np.int64)
+            for m in range(k + t):
+                S += np.outer(L[:, m], Y[m])  # Cada término es menor que p^2
+                S %= mod
+            return S.tolist()
+
+        columns = list(zip(*values))
+        return [[sum(l * y for l, y in zip(row, column)) % mod for column in columns] for row in matrix]
+
+    @staticmethod
+    def recuperar_secretos_empaquetados(rows: list[list[int]], mod: int, k: int, count: int | None = None, xs: tuple[int, ...] | None = None) -> list[Field]:
+        """
+        Recupera los secretos de un reparto empaquetado (generate_packed_shares).
+
+        Parámetros:
+        -----------
+        rows : list[list[int]]
+            Una fila por parte (al menos k + t), con una parte de cada bloque.
+        mod : int
+            Módulo del campo.
+        k : int
+            Secretos por polinomio.
+        count : int | None
+            Cantidad de secretos originales, para descartar los ceros del último bloque.
+        xs : tuple[int, ...] | None
+            Coordenadas de las filas, si no son 1..len(rows).
+
+        Retorna:
+        --------
+        list[Field]
+            Secretos recuperados, en el orden original.
+        """
+        secrets = Lagrange.lagrange_interpolation_packed(rows, mod, k, xs)
+        if count is not None:
+            secrets = secrets[:count]
+        return [Field(value, mod) for value in secrets]
+
     def __str__(self):
         return f"ShamirSecretSharing(secret={self.secret}, num_shares={self.num_shares})"
     
@@ -74,4 +224,23 @@ class ShamirSecretSharing:
         ordered_shares = sorted(shares, key=lambda x: x.sender)
         return Lagrange.lagrange_interpolation(ordered_shares, required_x=0)
 
+    @staticmethod
+    def recuperar_secretos(rows: list[list[int]], mod: int) -> list[Field]:
+        """
+        Recupera varios secretos a la vez mediante interpolación de Lagrange.
+
+        Parámetros:
+        -----------
+        rows : list[list[int]]
+            Una fila por parte, ordenadas de 1 a n, con una parte de cada secreto.
+        mod : int
+            Módulo del campo.
+
+        Retorna:
+        --------
+        list[Field]
+            Secretos recuperados, en el mismo orden que las columnas de rows.
+        """
+        return [Field(value, mod) for value in Lagrange.lagrange_interpolation_batch(rows, mod, required_x=0)]
+
         
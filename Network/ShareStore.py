@@ -0,0 +1,275 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_right, insort
+
+from field_operations import Field
+import Protocol
+
+STORE_MAGIC = b"SHS1"
+STORE_HEADER = struct.Struct("!4sQQ")
+STORE_RECORD = struct.Struct("!HQ")
+INITIAL_CAPACITY = 4096
+"""
+Formato del archivo de partes:
+    MAGIC (4 bytes) | MOD (8 bytes) | CANTIDAD (8 bytes) | REGISTRO_1 | REGISTRO_2 | ...
+
+Cada registro tiene la posición del emisor en la tabla de emisores (2 bytes) y el valor (8 bytes).
+El número de variable (slot) de cada parte es su orden entre los registros del mismo emisor.
+La tabla de emisores (sus UUID) se guarda aparte, en un archivo JSON con el mismo nombre y la extensión .senders.json.
+Los identificadores de las variables recibidas se guardan en otro archivo, con la extensión .keys, uno por línea.
+El archivo se reserva en bloques de INITIAL_CAPACITY registros (y luego del doble) y se escribe a través de mmap.
+"""
+
+class ShareView:
+    """
+    Vista de solo lectura de las partes de un ShareStore, ordenadas por emisor y luego por número de variable.
+
+    Se crea en O(e), donde e es la cantidad de emisores, sin copiar ni ordenar las partes:
+    cada acceso busca el emisor con una búsqueda binaria sobre las cantidades acumuladas.
+    Los elementos se entregan como SharedVariable, creados solo al accederlos.
+    Las partes que lleguen después de crear la vista no aparecen en ella.
+    """
+    def __init__(self, store: "ShareStore", mod: int):
+        self.mod = mod
+        self.senders = list(store.sorted_senders)
+        self.columns = [store.columns[store.rows[sender]] for sender in self.senders]
+        self.offsets = [0]
+        for column in self.columns:
+            self.offsets.append(self.offsets[-1] + len(column))
+
+    def __len__(self) -> int:
+        return self.offsets[-1]
+
+    def __getitem__(self, index: int) -> Protocol.SharedVariable:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Índice fuera de rango")
+        position = bisect_right(self.offsets, index) - 1
+        slot = index - self.offsets[position]
+        sender = self.senders[position]
+        return Protocol.SharedVariable(Field(self.columns[position][slot], self.mod), sender, f"{sender}:{slot}")
+
+    def __iter__(self):
+        for sender, column in zip(self.senders, self.columns):
+            for slot in range(len(column)):
+                yield Protocol.SharedVariable(Field(column[slot], self.mod), sender, f"{sender}:{slot}")
+
+class ShareStore:
+    """
+    Almacén compacto de partes de variables de entrada, indexado por emisor y número de variable (slot).
+
+    Cada emisor tiene un array de enteros sin signo de 8 bytes con sus valores, en el orden en que llegaron,
+    así que cada parte ocupa 8 bytes en lugar de un objeto SharedVariable con su Field y su UUID.
+    Los emisores se mantienen ordenados al añadirse, y view() retorna una vista ordenada sin reordenar las partes.
+
+    Si se indica path, cada parte también se escribe en un archivo a través de mmap, y al crear el almacén
+    se cargan las partes que ya tenía el archivo. Así, un usuario que se reinicia conserva sus partes sin que
+    los demás tengan que volver a enviarlas.
+
+    Las partes se pueden añadir con el identificador de su variable (key), y una parte con un identificador repetido
+    se descarta. Si hay archivo, los identificadores también se guardan (ver keys_path) y se recuperan al abrirlo,
+    así que un usuario que se reinicia sigue descartando las partes que ya tenía.
+    """
+    def __init__(self, mod: int, path: str | None = None):
+        self.mod = mod
+        self.path = path
+        self.rows: dict[str, int] = {}
+        self.senders: list[str] = []
+        self.sorted_senders: list[str] = []
+        self.columns: list[array] = []
+        self.keys: set[str] = set()
+        self.count = 0
+
+        self.file = None
+        self.keys_file = None
+        self.map: mmap.mmap | None = None
+        self.capacity = 0
+        if path is not None:
+            self.open_file(path)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def senders_path(self) -> str:
+        return f"{self.path}.senders.json"
+
+    @property
+    def keys_path(self) -> str:
+        return f"{self.path}.keys"
+
+    def add(self, sender: str, value: int, key: str | None = None) -> int | None:
+        """
+        Añade la parte value enviada por sender y retorna su número de variable.
+        Si ya se añadió una parte con el mismo key, no se añade y se retorna None.
+        El key se registra solo después de guardar la parte, así que si falla no queda marcado como recibido.
+        """
+        if key is not None and key in self.keys:
+            return None
+        row = self.rows.get(sender)
+        if row is None:
+            row = self.add_sender(sender)
+        column = self.columns[row]
+        column.append(value)
+        self.count += 1
+        if self.map is not None:
+            try:
+                self.write_record(row, value)
+            except Exception:
+                column.pop()
+                self.count -= 1
+                raise
+        if key is not None:
+            self.keys.add(key)
+            if self.keys_file is not None:
+                self.keys_file.write(key + "\n")
+        return len(column) - 1
+
+    def add_sender(self, sender: str) -> int:
+        """
+        Registra un emisor nuevo. Si hay archivo, la tabla de emisores se guarda antes de escribir sus partes.
+        """
+        row = len(self.senders)
+        if row > 0xFFFF:
+            raise Exception("Demasiados emisores para el almacén de partes")
+        self.rows[sender] = row
+        self.senders.append(sender)
+        insort(self.sorted_senders, sender)
+        self.columns.append(array("Q"))
+        if self.path is not None:
+            with open(self.senders_path, 'w', encoding='utf-8') as file:
+                json.dump(self.senders, file)
+        return row
+
+    def set_mod(self, mod: int):
+        """
+        Cambia el módulo de las partes. Solo se puede si el almacén está vacío.
+        """
+        if mod == self.mod:
+            return
+        if self.count > 0:
+            raise Exception("No se puede cambiar el módulo de un almacén con partes")
+        self.mod = mod
+        if self.map is not None:
+            STORE_HEADER.pack_into(self.map, 0, STORE_MAGIC, self.mod, 0)
+
+    def get(self, sender: str, slot: int) -> Field:
+        """
+        Retorna la parte con el número de variable slot del emisor indicado.
+        """
+        return Field(self.columns[self.rows[sender]][slot], self.mod)
+
+    def values_from(self, sender: str) -> array:
+        """
+        Retorna los valores del emisor, en el orden en que llegaron.
+        """
+        row = self.rows.get(sender)
+        return self.columns[row] if row is not None else array("Q")
+
+    def view(self, mod: int | None = None) -> ShareView:
+        """
+        Retorna una vista de las partes ordenadas por emisor, sin copiarlas ni ordenarlas.
+        """
+        return ShareView(self, self.mod if mod is None else mod)
+
+    def nbytes(self) -> int:
+        """
+        Retorna la memoria que ocupan los valores de las partes, en bytes.
+        """
+        return sum(column.itemsize * len(column) for column in self.columns)
+
+    def open_file(self, path: str):
+        """
+        Abre (o crea) el archivo del almacén, lo mapea en memoria y carga las partes que tenga.
+        """
+        exists = os.path.exists(path) and os.path.getsize(path) >= STORE_HEADER.size
+        self.file = open(path, "r+b" if exists else "w+b")
+        if not exists:
+            self.file.truncate(STORE_HEADER.size + INITIAL_CAPACITY * STORE_RECORD.size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.capacity = (len(self.map) - STORE_HEADER.size) // STORE_RECORD.size
+
+        if not exists:
+            STORE_HEADER.pack_into(self.map, 0, STORE_MAGIC, self.mod, 0)
+            # Con buffer de línea, cada identificador llega al archivo al añadir su parte
+            self.keys_file = open(self.keys_path, 'w', encoding='utf-8', buffering=1)
+            return
+
+        magic, mod, count = STORE_HEADER.unpack_from(self.map, 0)
+        if magic != STORE_MAGIC:
+            raise Exception(f"El archivo {path} no es un almacén de partes")
+        if mod != self.mod:
+            raise Exception(f"El almacén de partes {path} es del módulo {mod}")
+
+        senders = []
+        if os.path.exists(self.senders_path):
+            with open(self.senders_path, 'r', encoding='utf-8') as file:
+                senders = json.load(file)
+        for sender in senders:
+            self.rows[sender] = len(self.senders)
+            self.senders.append(sender)
+            insort(self.sorted_senders, sender)
+            self.columns.append(array("Q"))
+        for row, value in STORE_RECORD.iter_unpack(self.map[STORE_HEADER.size:STORE_HEADER.size + count * STORE_RECORD.size]):
+            self.columns[row].append(value)
+        self.count = count
+
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, 'r', encoding='utf-8') as file:
+                self.keys.update(line.rstrip("\n") for line in file if line.strip())
+        self.keys_file = open(self.keys_path, 'a', encoding='utf-8', buffering=1)
+
+    def write_record(self, row: int, value: int):
+        """
+        Escribe una parte al final del archivo. Si no hay espacio, el archivo crece al doble.
+        """
+        if self.count > self.capacity:
+            self.grow()
+        STORE_RECORD.pack_into(self.map, STORE_HEADER.size + (self.count - 1) * STORE_RECORD.size, row, value)
+        STORE_HEADER.pack_into(self.map, 0, STORE_MAGIC, self.mod, self.count)
+
+    def grow(self):
+        self.map.flush() # type: ignore
+        self.map.close() # type: ignore
+        self.capacity *= 2
+        self.file.truncate(STORE_HEADER.size + self.capacity * STORE_RECORD.size) # type: ignore
+        self.map = mmap.mmap(self.file.fileno(), 0) # type: ignore
+
+    def clear(self):
+        """
+        Borra todas las partes. Los emisores se conservan, y si hay archivo, solo se reinicia su cantidad de registros.
+        """
+        for column in self.columns:
+            del column[:]
+        self.keys.clear()
+        self.count = 0
+        if self.map is not None:
+            STORE_HEADER.pack_into(self.map, 0, STORE_MAGIC, self.mod, 0)
+        if self.keys_file is not None:
+            self.keys_file.truncate(0)
+
+    def flush(self):
+        """
+        Fuerza la escritura del archivo en disco.
+        """
+        if self.map is not None:
+            self.map.flush()
+
+    def close(self):
+        """
+        Cierra el archivo del almacén, si lo tiene.
+        """
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.keys_file is not None:
+            self.keys_file.close()
+            self.keys_file = None
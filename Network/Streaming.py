@@ -0,0 +1,270 @@
+import os
+import queue
+import threading
+import time
+from array import array
+from typing import Iterable, Iterator
+
+import Lagrange
+import Shamirss
+
+STREAM_BLOCK = 4096
+"""
+Cantidad de elementos del campo por bloque (y por mensaje STREAM_CHUNK). Con partes de 8 bytes, cada mensaje ocupa unos 32 KiB.
+"""
+
+STREAM_WINDOW = 8
+"""
+Cantidad máxima de bloques ya repartidos que esperan a ser enviados.
+Si la red es más lenta que la lectura, el hilo que lee el archivo se detiene hasta que se libere espacio,
+así la memoria no depende del tamaño del archivo: a lo sumo STREAM_WINDOW bloques de n partes.
+"""
+
+def limb_bytes(mod: int) -> int:
+    """
+    Retorna cuántos bytes completos caben en un elemento del campo sin reducirse: el mayor b tal que 256^b <= mod.
+    Para 43112609 (26 bits) son 3 bytes por elemento; para 2^61 - 1, 7 bytes.
+    """
+    size = (mod.bit_length() - 1) // 8
+    if size < 1:
+        raise ValueError(f"El módulo {mod} es demasiado pequeño para guardar un byte por elemento")
+    return size
+
+def encode_limbs(data: bytes, mod: int) -> list[int]:
+    """
+    Divide los bytes en partes de limb_bytes(mod) bytes (big-endian), cada una menor que el módulo.
+    La última parte se completa con ceros a la derecha; la longitud original se necesita para decodificar.
+    """
+    size = limb_bytes(mod)
+    if len(data) % size:
+        data = data + bytes(size - len(data) % size)
+    return [int.from_bytes(data[i:i + size], "big") for i in range(0, len(data), size)]
+
+def decode_limbs(values: Iterable[int], mod: int, length: int | None = None) -> bytes:
+    """
+    Inversa de encode_limbs. Si se indica length, se descartan los ceros de relleno del final.
+    """
+    size = limb_bytes(mod)
+    data = b"".join(int(value).to_bytes(size, "big") for value in values)
+    return data if length is None else data[:length]
+
+def encode_integer(value: int, mod: int) -> list[int]:
+    """
+    Divide un entero no negativo en partes de (bits de mod - 1) bits, de la menos significativa a la más significativa.
+    Sirve para compartir números mayores que el módulo sin que se reduzcan (por ejemplo 525234423423424 con 43112609).
+    """
+    if value < 0:
+        raise ValueError("Solo se pueden codificar enteros no negativos")
+    bits = mod.bit_length() - 1
+    mask = (1 << bits) - 1
+    limbs = [value & mask]
+    value >>= bits
+    while value:
+        limbs.append(value & mask)
+        value >>= bits
+    return limbs
+
+def decode_integer(limbs: Iterable[int], mod: int) -> int:
+    """
+    Inversa de encode_integer.
+    """
+    bits = mod.bit_length() - 1
+    value = 0
+    for shift, limb in enumerate(limbs):
+        value |= int(limb) << (shift * bits)
+    return value
+
+def read_blocks(path: str, mod: int, block: int = STREAM_BLOCK) -> Iterator[list[int]]:
+    """
+    Lee el archivo por partes y entrega bloques de a lo sumo block elementos del campo (encode_limbs).
+    Solo hay un bloque en memoria a la vez, sin importar el tamaño del archivo.
+    """
+    chunk = block * limb_bytes(mod)
+    with open(path, "rb") as file:
+        while True:
+            data = file.read(chunk)
+            if not data:
+                return
+            yield encode_limbs(data, mod)
+
+class StreamSink:
+    """
+    Partes recibidas de un flujo (stream) en una sesión, separadas por emisor.
+
+    Cada emisor envía su flujo en bloques numerados (seq) y marca el último. Los bloques de una conexión llegan en orden,
+    así que cada bloque se añade al final; uno repetido o fuera de orden se descarta.
+    Si se indica path, las partes de cada emisor se escriben en el archivo {path}.{uuid del emisor} y no se guardan en memoria,
+    así un flujo de varios GB se recibe con memoria constante. Sin path se guardan en un array de 8 bytes por parte.
+    """
+    def __init__(self, stream_id: int, mod: int, path: str | None = None):
+        self.stream_id = stream_id
+        self.mod = mod
+        self.path = path
+        self.counts: dict[str, int] = {}
+        self.next_seq: dict[str, int] = {}
+        self.finished: set[str] = set()
+        self.values: dict[str, array] = {}
+        self.files = {}
+
+    def add(self, sender: str, seq: int, values: list[int], last: bool) -> bool:
+        """
+        Añade un bloque del emisor. Retorna False si se descartó por estar repetido o fuera de orden.
+        """
+        if sender in self.finished or seq != self.next_seq.get(sender, 0):
+            return False
+        self.next_seq[sender] = seq + 1
+        self.counts[sender] = self.counts.get(sender, 0) + len(values)
+        block = array("Q", values)
+        if self.path is None:
+            self.values.setdefault(sender, array("Q")).extend(block)
+        else:
+            file = self.files.get(sender)
+            if file is None:
+                file = self.files[sender] = open(self.sender_path(sender), "wb")
+            block.tofile(file)
+        if last:
+            self.finished.add(sender)
+            if sender in self.files:
+                self.files[sender].flush()
+        return True
+
+    def sender_path(self, sender: str) -> str:
+        return f"{self.path}.{sender}"
+
+    def complete(self, senders: Iterable[str]) -> bool:
+        """
+        Indica si ya terminaron los flujos de todos los emisores indicados.
+        """
+        return all(sender in self.finished for sender in senders)
+
+    def read(self, sender: str, start: int, count: int) -> array:
+        """
+        Retorna a lo sumo count partes del emisor desde la posición start.
+        """
+        if self.path is None:
+            return self.values.get(sender, array("Q"))[start:start + count]
+        values = array("Q")
+        if sender not in self.counts:
+            return values
+        if sender in self.files:
+            self.files[sender].flush()
+        with open(self.sender_path(sender), "rb") as file:
+            file.seek(start * values.itemsize)
+            values.frombytes(file.read(count * values.itemsize))
+        return values
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+        self.files = {}
+
+def open_stream(sinks: list[StreamSink], sender: str, mod: int, block: int = STREAM_BLOCK) -> Iterator[list[int]]:
+    """
+    Reconstruye por bloques el flujo del emisor indicado a partir de los StreamSink de todas las partes,
+    ordenados como las partes (la primera tiene x = 1). Cada bloque se interpola con los mismos coeficientes
+    de Lagrange (lagrange_interpolation_batch), y solo hay un bloque de cada parte en memoria a la vez.
+    """
+    total = min(sink.counts.get(sender, 0) for sink in sinks)
+    for start in range(0, total, block):
+        rows = [sink.read(sender, start, block) for sink in sinks]
+        yield Lagrange.lagrange_interpolation_batch(rows, mod, required_x=0)
+
+class StreamSharer:
+    """
+    Reparte un flujo de bloques de elementos del campo con memoria acotada.
+
+    Es una tubería de dos etapas unidas por una cola de a lo sumo window bloques:
+    - Un hilo toma los bloques del generador (por ejemplo read_blocks) y genera sus partes con
+      ShamirSecretSharing.generate_batch_shares.
+    - El hilo que llama a share envía a cada usuario su fila de partes en un mensaje STREAM_CHUNK.
+    Si la red no da abasto, los envíos se bloquean (ver SEND_QUEUE_BYTES en ConnectionPool), la cola se llena
+    y el hilo lector se detiene. Así, el archivo se lee al ritmo al que se puede enviar.
+    """
+    def __init__(self, user, stream_id: int, session: int = 0, window: int = STREAM_WINDOW):
+        self.user = user
+        self.stream_id = stream_id
+        self.session = session
+        self.window = window
+        self.stats = {"bloques": 0, "elementos": 0, "mensajes": 0, "segundos": 0.0, "esperas_cola": 0}
+
+    @staticmethod
+    def offer(pending: queue.Queue, item, stop: threading.Event) -> bool:
+        """
+        Pone item en la cola, esperando si está llena, hasta que se pueda o hasta que se active stop.
+        Retorna False si se detuvo sin ponerlo: share ya no saca elementos de la cola.
+        """
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(self, blocks: Iterable[list[int]], pending: queue.Queue, stop: threading.Event):
+        """
+        Etapa de reparto: genera las partes de cada bloque y las pone en la cola, esperando si está llena.
+        Al terminar pone None; si hay un error, lo pone en la cola para que share lo lance.
+        Todas las esperas terminan cuando share activa stop (por ejemplo, si falla un envío).
+        """
+        try:
+            for block in blocks:
+                shares = Shamirss.ShamirSecretSharing.generate_batch_shares(block, len(self.user.party), self.user.t, self.user.mod)
+                rows = [[int(value) for value in row] for row in shares]
+                if pending.full():
+                    self.stats["esperas_cola"] += 1
+                if not self.offer(pending, rows, stop):
+                    return
+            self.offer(pending, None, stop)
+        except Exception as e:
+            self.offer(pending, e, stop)
+
+    def share(self, blocks: Iterable[list[int]]) -> dict:
+        """
+        Reparte todos los bloques y retorna estadísticas del envío.
+        Los usuarios se toman al empezar; la red no debe cambiar durante el flujo.
+        """
+        users = [self.user.party[uuid] for uuid in self.user._party_order]
+        pending: queue.Queue = queue.Queue(maxsize=self.window)
+        stop = threading.Event()
+        producer = threading.Thread(target=self.produce, args=(blocks, pending, stop), daemon=True)
+        start = time.perf_counter()
+        producer.start()
+
+        seq = 0
+        try:
+            rows = pending.get()
+            while rows is not None:
+                if isinstance(rows, Exception):
+                    raise rows
+                following = pending.get()
+                last = following is None
+                for user, row in zip(users, rows):
+                    self.user.sendStreamChunk(user, self.stream_id, seq, row, last, self.session)
+                self.stats["mensajes"] += len(users)
+                self.stats["bloques"] += 1
+                self.stats["elementos"] += len(rows[0])
+                seq += 1
+                rows = following
+            if seq == 0:
+                # Flujo vacío: se envía solo la marca de fin
+                for user in users:
+                    self.user.sendStreamChunk(user, self.stream_id, 0, [], True, self.session)
+                self.stats["mensajes"] += len(users)
+        finally:
+            stop.set()
+            producer.join()
+        self.stats["segundos"] = time.perf_counter() - start
+        return self.stats
+
+def sink_path(template: str | None, uuid: str, stream_id: int, session: int) -> str | None:
+    """
+    Retorna la ruta base de los archivos de un flujo recibido, reemplazando {uuid}, {stream} y {session}.
+    """
+    if template is None:
+        return None
+    path = template.format(uuid=uuid, stream=stream_id, session=session)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return path
@@ -1,9 +1,18 @@
 from field_operations import Field
 import NetworkUser
+import NetworkProtocol
+import Protocol
+import Shamirss
+import Streaming
+import os
 import random
-import time
+import sys
+import tempfile
 
-WAIT_TIME = 2.5
+WAIT_TIME = 30.0
+"""
+Tiempo máximo (en segundos) que se espera a cada etapa de la prueba.
+"""
 
 def create_users(num_users: int, mod: int, base_port: int = 5500) -> list[NetworkUser.MainUser]:
     """
@@ -29,7 +38,27 @@ def connect_users(users: list[NetworkUser.MainUser]) -> None:
     """
     for i in range(1, len(users)):
         users[i].connect("127.0.0.1", users[0].port)
-        time.sleep(WAIT_TIME)
+        users[i].waitForParty(i + 1, WAIT_TIME)
+    for user in users:
+        user.waitForParty(len(users), WAIT_TIME)
+
+def bootstrap_users(users: list[NetworkUser.MainUser]) -> None:
+    """
+    Conecta a los usuarios entre sí con la conexión en bloque (MainUser.bootstrap).
+    Cada usuario la inicia en su propio hilo, como si fueran procesos distintos.
+    :param users: Lista de usuarios a conectar.
+    """
+    import threading
+    roster = [(user.ip, user.port) for user in users]
+    results = [False] * len(users)
+    def run(i: int):
+        results[i] = users[i].bootstrap(roster, WAIT_TIME)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(users))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(results), "No todos los usuarios coinciden en la red"
 
 def test_connections(users: list[NetworkUser.MainUser]) -> None:
     """
@@ -60,16 +89,21 @@ def send_shares(users: list[NetworkUser.MainUser], numbers: list[list[int]]) ->
     for user, num_usuario in zip(users, numbers):
         for num in num_usuario:
             user.send_number(num)
-            time.sleep(WAIT_TIME)
+    expected = sum(len(num_usuario) for num_usuario in numbers)
+    for user in users:
+        user.waitForInputs(expected, WAIT_TIME)
 
-def send_operations(users: list[NetworkUser.MainUser]) -> None:
+def send_operations(users: list[NetworkUser.MainUser], tree: bool = False) -> None:
     """
     Comparte la operación de multiplicación entre los usuarios.
     :param users: Lista de usuarios a compartir la operación.
+    :param tree: Si se usa el árbol de productos en lugar de la cadena.
     """
     for user in users:
-        user.sendOperation()
-        time.sleep(WAIT_TIME)
+        if tree:
+            user.sendTreeOperation()
+        else:
+            user.sendOperation()
 
 def test_reconstruct(users: list[NetworkUser.MainUser], real_secret: Field) -> None:
     """
@@ -78,24 +112,175 @@ def test_reconstruct(users: list[NetworkUser.MainUser], real_secret: Field) -> N
     :param real_secret: Secreto real a comparar.
     """
     for user in users:
-        reconstructed = user.reconstruct_secret()
+        reconstructed = user.reconstruct_secret(WAIT_TIME)
         assert reconstructed == real_secret, f"Secreto reconstruido incorrecto: {reconstructed} != {real_secret}"
     print("Prueba de shares exitosa.")
 
+def test_batch_multiplication(users: list[NetworkUser.MainUser], num_products: int, mod: int) -> None:
+    """
+    Prueba k multiplicaciones independientes en una sola ronda con MainUser.multiplyBatch.
+    Se reparten dos vectores aleatorios de k números, cada usuario multiplica sus partes
+    y se verifica que cada producto reconstruido sea correcto.
+    :param users: Lista de usuarios a probar.
+    :param num_products: Número de multiplicaciones del lote.
+    :param mod: Módulo para las operaciones de campo.
+    """
+    left = [random.randrange(mod) for _ in range(num_products)]
+    right = [random.randrange(mod) for _ in range(num_products)]
+    left_shares = Shamirss.ShamirSecretSharing.generate_batch_shares(left, len(users), users[0].t, mod)
+    right_shares = Shamirss.ShamirSecretSharing.generate_batch_shares(right, len(users), users[0].t, mod)
+
+    # La fila i de las partes corresponde a x = i + 1, que es la posición del usuario en el orden de la red
+    by_uuid = {user.uuid: user for user in users}
+    ordered = [by_uuid[uuid] for uuid in users[0]._party_order]
+    batch_ids = [user.multiplyBatch([Field(int(x), mod) for x in left_shares[i]], [Field(int(x), mod) for x in right_shares[i]]) for i, user in enumerate(ordered)]
+    results = [user.waitForBatch(batch_id, WAIT_TIME) for user, batch_id in zip(ordered, batch_ids)]
+    assert all(result is not None for result in results), "No se completó el lote"
+
+    for j in range(num_products):
+        shares = [Protocol.SharedVariable(result[j], user.uuid) for user, result in zip(ordered, results)] # type: ignore
+        reconstructed = Shamirss.ShamirSecretSharing.recuperar_secreto(shares)
+        assert reconstructed == Field(left[j] * right[j], mod), f"Producto #{j} incorrecto: {reconstructed}"
+    print("Prueba de multiplicación por lotes exitosa.")
+
+def test_sessions(users: list[NetworkUser.MainUser], num_sessions: int, mod: int) -> None:
+    """
+    Prueba varios productos independientes a la vez, cada uno en su propia sesión, sobre las mismas conexiones.
+    Todos los usuarios abren las sesiones con los mismos números, comparten un número en cada una
+    y empiezan todas las multiplicaciones sin esperar a que termine ninguna.
+    :param users: Lista de usuarios a probar.
+    :param num_sessions: Número de sesiones (cálculos) simultáneas.
+    :param mod: Módulo para las operaciones de campo.
+    """
+    sessions = [users[0].openSession() for _ in range(num_sessions)]
+    for user in users[1:]:
+        for session in sessions:
+            user.openSession(session)
+
+    numbers = {session: create_numbers(len(users), mod) for session in sessions}
+    for session in sessions:
+        for user, num_usuario in zip(users, numbers[session]):
+            for num in num_usuario:
+                user.send_number(num, session=session)
+    for session in sessions:
+        for user in users:
+            user.waitForInputs(len(users), WAIT_TIME, session)
+
+    for session in sessions:
+        for user in users:
+            user.sendOperation(session=session)
+
+    for session in sessions:
+        real_secret = Field(1, mod)
+        for num_usuario in numbers[session]:
+            for num in num_usuario:
+                real_secret *= Field(num, mod)
+        for user in users:
+            reconstructed = user.reconstruct_secret(WAIT_TIME, session)
+            assert reconstructed == real_secret, f"Sesión {session}: secreto incorrecto {reconstructed} != {real_secret}"
+            user.closeSession(session)
+    print("Prueba de sesiones simultáneas exitosa.")
+
+def test_streaming(users: list[NetworkUser.MainUser], size: int, mod: int) -> None:
+    """
+    Prueba el reparto de archivos por flujos (MainUser.shareFile).
+    Cada usuario reparte un archivo aleatorio de size bytes, y se verifica que cada archivo
+    se reconstruya igual a partir de las partes de todos los usuarios.
+    :param users: Lista de usuarios a probar.
+    :param size: Tamaño en bytes de cada archivo.
+    :param mod: Módulo para las operaciones de campo.
+    """
+    stream_id = 1
+    contents = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for user in users:
+            path = os.path.join(directory, f"{user.uuid}.bin")
+            contents[user.uuid] = os.urandom(size)
+            with open(path, "wb") as file:
+                file.write(contents[user.uuid])
+            stats = user.shareFile(path, stream_id, block=1024)
+            print(f"{user.uuid}: {stats['bloques']} bloques en {stats['segundos']:.3f} s")
+
+        order = users[0]._party_order
+        by_uuid = {user.uuid: user for user in users}
+        sinks = [by_uuid[uuid].waitForStream(stream_id, WAIT_TIME) for uuid in order]
+        assert all(sink is not None for sink in sinks), "No se completaron los flujos"
+        for uuid, data in contents.items():
+            blocks = Streaming.open_stream(sinks, uuid, mod) # type: ignore
+            rebuilt = Streaming.decode_limbs((value for block in blocks for value in block), mod, size)
+            assert rebuilt == data, f"El archivo de {uuid} no se reconstruyó igual"
+    print("Prueba de flujos exitosa.")
+
+def test_streaming_send_error(users: list[NetworkUser.MainUser], mod: int) -> None:
+    """
+    Prueba que si falla un envío de un flujo, StreamSharer.share lance el error en lugar de quedarse esperando
+    al hilo que reparte los bloques, aunque la cola esté llena (ventana de 1 bloque).
+    :param users: Lista de usuarios a probar.
+    :param mod: Módulo para las operaciones de campo.
+    """
+    import threading
+    import time
+
+    class FailingUser:
+        def __init__(self, user: NetworkUser.MainUser):
+            self.party, self._party_order, self.t, self.mod = user.party, user._party_order, user.t, user.mod
+
+        def sendStreamChunk(self, *args):
+            # Se espera a que el hilo que reparte llene la cola y quede esperando para poner el fin del flujo
+            time.sleep(0.5)
+            raise OSError("Envío fallido")
+
+    errors = []
+    def run():
+        try:
+            Streaming.StreamSharer(FailingUser(users[0]), stream_id=2, window=1).share([[1, 2, 3]] * 3)
+        except OSError as e:
+            errors.append(e)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(WAIT_TIME)
+    assert not thread.is_alive(), "StreamSharer.share no terminó después de un envío fallido"
+    assert errors, "StreamSharer.share no lanzó el error del envío"
+    print("Prueba de envío fallido en flujos exitosa.")
+
+def test_share_send_error(users: list[NetworkUser.MainUser], mod: int) -> None:
+    """
+    Prueba que si falla el envío de un share a un usuario, ShareProtocol.send_message no lance el error,
+    sino que lo cuente en las métricas (errores_envio) para que se siga enviando a los demás.
+    :param users: Lista de usuarios a probar.
+    :param mod: Módulo para las operaciones de campo.
+    """
+    class FailingHost:
+        ip, port = "127.0.0.1", 0
+
+        def send(self, data: bytes) -> int:
+            raise OSError("Envío fallido")
+
+    before = users[0].pool.stats()["errores_envio"]
+    NetworkProtocol.InputShareProtocol(users[0]).send_message(FailingHost(), Field(1, mod))
+    assert users[0].pool.stats()["errores_envio"] == before + 1, "No se contó el envío fallido"
+    print("Prueba de envío fallido de shares exitosa.")
+
 def main():
     """
     Función principal para probar la red de usuarios.
     Genera n usuarios, los conecta, comparte números, realiza operaciones y reconstruye el secreto.
+    El número de usuarios se puede indicar como argumento (python TestNetwork.py 4); si no, se pide por consola.
+    Con --bootstrap, los usuarios se conectan en bloque (MainUser.bootstrap) en lugar de uno por uno.
     """
 
-    num_users = int(input("Ingrese el número de usuarios a crear: "))
+    args = [arg for arg in sys.argv[1:] if arg != "--bootstrap"]
+    num_users = int(args[0]) if args else int(input("Ingrese el número de usuarios a crear: "))
     primo = 43112609
     
     # Crear usuarios
     users = create_users(num_users, primo)
 
     # Los conecta entre sí
-    connect_users(users)
+    if "--bootstrap" in sys.argv[1:]:
+        bootstrap_users(users)
+    else:
+        connect_users(users)
 
     # Prueba que todos estén conectados entre sí
     test_connections(users)
@@ -128,11 +313,23 @@ def main():
         print("\n" * 2)
     
     print("Reconstruyendo secreto...")
-    # Da tiempo para que se realice la reconstrucción
-    time.sleep(WAIT_TIME * 5)
-
     # Prueba que el secreto reconstruido sea correcto
     test_reconstruct(users, real_secret)
 
+    # Prueba varias multiplicaciones independientes en una sola ronda
+    test_batch_multiplication(users, 100, primo)
+
+    # Prueba varios cálculos a la vez, cada uno en su propia sesión
+    test_sessions(users, 8, primo)
+
+    # Prueba el reparto de archivos por flujos
+    test_streaming(users, 100000, primo)
+
+    # Prueba que un envío fallido no deje colgado el reparto por flujos
+    test_streaming_send_error(users, primo)
+
+    # Prueba que un envío fallido de un share no corte el envío a los demás
+    test_share_send_error(users, primo)
+
 if __name__ == "__main__":
     main()
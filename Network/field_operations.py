@@ -3,8 +3,13 @@ import random
 class Field:
     """
     Representa un campo finito \(\mathbb{Z}_m\), donde los cálculos se realizan módulo un número \(m\).
+
+    Usa __slots__ para no reservar un __dict__ por instancia, y soporta operaciones en el lugar
+    (+=, -=, *=) que modifican el valor sin crear un objeto nuevo.
+    Para ciclos críticos que no necesitan objetos, ver PrimeField y los demás contextos de field_backend.
     """
-    
+    __slots__ = ("value", "mod")
+
     def __init__(self, value: int, mod: int):
         """
         Inicializa una instancia de la clase Field.
@@ -92,6 +97,57 @@ class Field:
             return Field(pow(self.value, other.value, self.mod), self.mod)
         raise TypeError("No se puede elevar un campo con algo que no sea un campo")
 
+    def __iadd__(self, other):
+        """
+        Suma en el lugar. Modifica el valor de la instancia en vez de crear un Field nuevo.
+
+        Parameters:
+        other (Field): El otro campo con el cual sumar.
+
+        Returns:
+        Field: La misma instancia, con el resultado de la suma.
+        """
+        if isinstance(other, Field):
+            if self.mod != other.mod:
+                raise ValueError("No se puede operar dos campos con módulos diferentes")
+            self.value = (self.value + other.value) % self.mod
+            return self
+        raise TypeError("No se puede sumar un campo con algo que no sea un campo")
+
+    def __isub__(self, other):
+        """
+        Resta en el lugar. Modifica el valor de la instancia en vez de crear un Field nuevo.
+
+        Parameters:
+        other (Field): El otro campo con el cual restar.
+
+        Returns:
+        Field: La misma instancia, con el resultado de la resta.
+        """
+        if isinstance(other, Field):
+            if self.mod != other.mod:
+                raise ValueError("No se puede operar dos campos con módulos diferentes")
+            self.value = (self.value - other.value) % self.mod
+            return self
+        raise TypeError("No se puede restar un campo con algo que no sea un campo")
+
+    def __imul__(self, other):
+        """
+        Multiplicación en el lugar. Modifica el valor de la instancia en vez de crear un Field nuevo.
+
+        Parameters:
+        other (Field): El otro campo con el cual multiplicar.
+
+        Returns:
+        Field: La misma instancia, con el resultado de la multiplicación.
+        """
+        if isinstance(other, Field):
+            if self.mod != other.mod:
+                raise ValueError("No se puede operar dos campos con módulos diferentes")
+            self.value = self.value * other.value % self.mod
+            return self
+        raise TypeError("No se puede multiplicar un campo con algo que no sea un campo")
+
     def __eq__(self, other):
         """
         Compara dos instancias de Field para ver si son iguales.
@@ -108,10 +164,11 @@ class Field:
     
     def __radd__(self, other):
         """	
-        Cuando un campo se suma con 0, se devuelve el campo original, ya que 0 es el elemento neutro de la suma.
+        Cuando un campo se suma con 0, se devuelve una copia del campo original, ya que 0 es el elemento neutro de la suma.
+        Es una copia para que una suma en el lugar posterior no modifique el campo original.
         """
         if other == 0:
-            return self
+            return Field(self.value, self.mod)
         return self.__add__(other)
 
     def inverse(self):
@@ -123,6 +180,31 @@ class Field:
         """
         return Field(pow(self.value, self.mod - 2, self.mod), self.mod)
 
+    @staticmethod
+    def batch_inverse(values: list["Field"]) -> list["Field"]:
+        """
+        Calcula el inverso multiplicativo de una lista de campos con el truco de Montgomery.
+
+        Se acumulan los productos prefijos, se invierte solo el producto total (una única exponenciación)
+        y se recorren los prefijos hacia atrás para obtener cada inverso.
+        En total son 3(n-1) multiplicaciones y una exponenciación, en lugar de n exponenciaciones.
+
+        Parameters:
+        values (list[Field]): Campos a invertir, todos con el mismo módulo.
+
+        Returns:
+        list[Field]: Los inversos, en el mismo orden que values.
+
+        Raises:
+        ValueError: Si alguno de los valores es cero, ya que no tiene inverso.
+        """
+        if not values:
+            return []
+        mod = values[0].mod
+        if any(value.mod != mod for value in values):
+            raise ValueError("No se puede operar dos campos con módulos diferentes")
+        return [Field(inverso, mod) for inverso in PrimeField(mod).batch_inverse([value.value for value in values])]
+
     def __str__(self):
         """
         Representación en cadena de la instancia de Field. Muestra el valor y el módulo.
@@ -144,3 +226,288 @@ class Field:
         Field: Una nueva instancia de Field con un valor aleatorio en el rango [0, mod-1].
         """
         return Field(random.randint(0, mod - 1), mod)
+
+
+class PrimeField:
+    """
+    Contexto de un campo primo \(\mathbb{Z}_p\) que guarda el módulo una sola vez.
+
+    Sus operaciones reciben y retornan enteros en el rango [0, p-1], sin crear objetos Field
+    ni verificar tipos o módulos en cada operación. Está pensado para los ciclos críticos
+    (evaluación de polinomios, interpolación) donde todos los valores pertenecen al mismo campo.
+    Para volver a un Field basta con llamar al contexto: PrimeField(p)(valor).
+    """
+    __slots__ = ("mod",)
+
+    def __init__(self, mod: int):
+        """
+        Parameters:
+        mod (int): El módulo del campo.
+        """
+        self.mod = mod
+
+    def __call__(self, value: int) -> Field:
+        """
+        Crea un Field con el módulo del contexto.
+        """
+        return Field(value, self.mod)
+
+    def reduce(self, a: int) -> int:
+        return a % self.mod
+
+    def add(self, a: int, b: int) -> int:
+        return (a + b) % self.mod
+
+    def sub(self, a: int, b: int) -> int:
+        return (a - b) % self.mod
+
+    def mul(self, a: int, b: int) -> int:
+        return a * b % self.mod
+
+    def neg(self, a: int) -> int:
+        return -a % self.mod
+
+    def pow(self, a: int, exponent: int) -> int:
+        return pow(a, exponent, self.mod)
+
+    def inverse(self, a: int) -> int:
+        """
+        Inverso multiplicativo por el pequeño teorema de Fermat.
+        """
+        return pow(a, self.mod - 2, self.mod)
+
+    def batch_inverse(self, values: list[int]) -> list[int]:
+        """
+        Calcula el inverso de una lista de enteros con el truco de Montgomery.
+
+        Se acumulan los productos prefijos, se invierte solo el producto total (una única exponenciación)
+        y se recorren los prefijos hacia atrás para obtener cada inverso.
+        En total son 3(n-1) multiplicaciones y una exponenciación, en lugar de n exponenciaciones.
+
+        Raises:
+        ValueError: Si alguno de los valores es cero, ya que no tiene inverso.
+        """
+        mod = self.mod
+        prefixes = []
+        acumulado = 1
+        for value in values:
+            if value % mod == 0:
+                raise ValueError("El cero no tiene inverso multiplicativo")
+            prefixes.append(acumulado)
+            acumulado = acumulado * value % mod
+
+        inverso = pow(acumulado, mod - 2, mod)
+        inverses = [0] * len(values)
+        for i in range(len(values) - 1, -1, -1):
+            inverses[i] = inverso * prefixes[i] % mod
+            inverso = inverso * values[i] % mod
+        return inverses
+
+    def dot(self, a: list[int], b: list[int]) -> int:
+        """
+        Producto punto de dos vectores con una sola reducción al final.
+        Los enteros de Python no se desbordan, así que no hace falta reducir en cada término.
+        """
+        return sum(x * y for x, y in zip(a, b)) % self.mod
+
+    def random(self) -> int:
+        """
+        Genera un entero aleatorio en el rango [0, p-1].
+        """
+        return random.randint(0, self.mod - 1)
+
+    def encode(self, a: int) -> int:
+        """
+        Convierte un entero a la representación interna del contexto. En el contexto genérico es la identidad.
+        Los ciclos que se escriben para cualquier contexto codifican sus entradas y decodifican el resultado.
+        """
+        return a
+
+    def decode(self, a: int) -> int:
+        """
+        Convierte un entero de la representación interna del contexto a su valor en [0, p-1].
+        """
+        return a
+
+def is_mersenne(mod: int) -> bool:
+    """
+    Indica si el módulo es de la forma 2^k - 1.
+    43112609 no lo es: es el exponente del primo de Mersenne 2^43112609 - 1.
+    """
+    return mod > 2 and (mod + 1) & mod == 0
+
+class MersenneField(PrimeField):
+    """
+    Contexto para un primo de Mersenne p = 2^k - 1 (por ejemplo 2^31 - 1, el primo del simulador).
+
+    Como 2^k ≡ 1 (mod p), un número a = a_alto · 2^k + a_bajo es congruente con a_alto + a_bajo,
+    así que se reduce con desplazamientos y sumas en lugar de una división:
+    dos pliegues bastan para cualquier a < p^2, y una resta final deja el resultado en [0, p-1].
+    """
+    __slots__ = ("bits",)
+
+    def __init__(self, mod: int):
+        if not is_mersenne(mod):
+            raise ValueError(f"{mod} no es de la forma 2^k - 1")
+        super().__init__(mod)
+        self.bits = mod.bit_length()
+
+    def reduce(self, a: int) -> int:
+        if a < 0:
+            return a % self.mod
+        mod, bits = self.mod, self.bits
+        while a > mod:
+            a = (a & mod) + (a >> bits)
+        return 0 if a == mod else a
+
+    def add(self, a: int, b: int) -> int:
+        a += b
+        return a - self.mod if a >= self.mod else a
+
+    def sub(self, a: int, b: int) -> int:
+        a -= b
+        return a + self.mod if a < 0 else a
+
+    def mul(self, a: int, b: int) -> int:
+        a *= b
+        mod, bits = self.mod, self.bits
+        a = (a & mod) + (a >> bits)
+        a = (a & mod) + (a >> bits)
+        return a - mod if a >= mod else a
+
+    def neg(self, a: int) -> int:
+        return self.mod - a if a else 0
+
+class BarrettField(PrimeField):
+    """
+    Contexto con reducción de Barrett para cualquier primo.
+
+    Se precalcula m = floor(4^k / p), con k los bits de p. Para a < p^2 el cociente a // p se aproxima con
+    (a · m) >> 2k, que se equivoca a lo sumo por 2, así que la reducción es una multiplicación, un desplazamiento
+    y a lo sumo dos restas, sin división.
+    """
+    __slots__ = ("shift", "factor")
+
+    def __init__(self, mod: int):
+        super().__init__(mod)
+        self.shift = 2 * mod.bit_length()
+        self.factor = (1 << self.shift) // mod
+
+    def reduce(self, a: int) -> int:
+        if a < 0 or a >= self.mod * self.mod:
+            return a % self.mod
+        a -= ((a * self.factor) >> self.shift) * self.mod
+        while a >= self.mod:
+            a -= self.mod
+        return a
+
+    def add(self, a: int, b: int) -> int:
+        a += b
+        return a - self.mod if a >= self.mod else a
+
+    def sub(self, a: int, b: int) -> int:
+        a -= b
+        return a + self.mod if a < 0 else a
+
+    def mul(self, a: int, b: int) -> int:
+        a *= b
+        mod = self.mod
+        a -= ((a * self.factor) >> self.shift) * mod
+        while a >= mod:
+            a -= mod
+        return a
+
+class MontgomeryField(PrimeField):
+    """
+    Contexto con reducción de Montgomery para cualquier primo impar.
+
+    Los valores se guardan en la forma de Montgomery a·R mod p, con R = 2^k > p. El producto de dos valores
+    se reduce con REDC(t) = (t + ((t · p') mod R) · p) / R, que solo usa multiplicaciones, máscaras y desplazamientos.
+    Las entradas se convierten con encode y los resultados con decode; la suma y la resta no cambian.
+    """
+    __slots__ = ("bits", "mask", "factor", "r2")
+
+    def __init__(self, mod: int):
+        if mod % 2 == 0:
+            raise ValueError("La reducción de Montgomery necesita un módulo impar")
+        super().__init__(mod)
+        self.bits = mod.bit_length()
+        self.mask = (1 << self.bits) - 1
+        self.factor = -pow(mod, -1, 1 << self.bits) & self.mask  # p' = -p^-1 mod R
+        self.r2 = pow(1 << self.bits, 2, mod)  # R^2 mod p, para codificar con un REDC
+
+    def redc(self, t: int) -> int:
+        """
+        Retorna t · R^-1 mod p, para 0 <= t < p · R.
+        """
+        t = (t + ((t * self.factor) & self.mask) * self.mod) >> self.bits
+        return t - self.mod if t >= self.mod else t
+
+    def encode(self, a: int) -> int:
+        return self.redc((a % self.mod) * self.r2)
+
+    def decode(self, a: int) -> int:
+        return self.redc(a)
+
+    def __call__(self, value: int) -> Field:
+        return Field(self.decode(value), self.mod)
+
+    def reduce(self, a: int) -> int:
+        return self.encode(a)
+
+    def add(self, a: int, b: int) -> int:
+        a += b
+        return a - self.mod if a >= self.mod else a
+
+    def sub(self, a: int, b: int) -> int:
+        a -= b
+        return a + self.mod if a < 0 else a
+
+    def mul(self, a: int, b: int) -> int:
+        t = a * b
+        t = (t + ((t * self.factor) & self.mask) * self.mod) >> self.bits
+        return t - self.mod if t >= self.mod else t
+
+    def pow(self, a: int, exponent: int) -> int:
+        return self.encode(pow(self.decode(a), exponent, self.mod))
+
+    def inverse(self, a: int) -> int:
+        return self.encode(pow(self.decode(a), self.mod - 2, self.mod))
+
+    def batch_inverse(self, values: list[int]) -> list[int]:
+        return [self.encode(inverse) for inverse in PrimeField.batch_inverse(self, [self.decode(value) for value in values])]
+
+    def dot(self, a: list[int], b: list[int]) -> int:
+        # La suma se reduce módulo p · R (congruente módulo p) para que REDC la acepte
+        return self.redc(sum(x * y for x, y in zip(a, b)) % (self.mod << self.bits))
+
+    def random(self) -> int:
+        return self.encode(random.randint(0, self.mod - 1))
+
+FIELD_BACKENDS = {
+    "generic": PrimeField,
+    "mersenne": MersenneField,
+    "barrett": BarrettField,
+    "montgomery": MontgomeryField,
+}
+"""
+Contextos de campo disponibles, por nombre. Todos tienen las mismas operaciones que PrimeField.
+"""
+
+def field_backend(mod: int, backend: str = "generic") -> PrimeField:
+    """
+    Crea el contexto de campo para el módulo indicado.
+    Con "auto" se usa MersenneField si el módulo es de la forma 2^k - 1 y PrimeField en otro caso.
+
+    El contexto por defecto es el genérico: en CPython el operador % sobre enteros es una sola operación en C,
+    y los desplazamientos, máscaras y restas de las otras reducciones son varias instrucciones del intérprete,
+    así que resultan más lentas (ver Benchmarks.bench_backends). Las demás sirven donde la división es cara.
+
+    Raises:
+    ValueError: Si el nombre no existe, o si se pide "mersenne" para un módulo que no es de Mersenne.
+    """
+    if backend == "auto":
+        backend = "mersenne" if is_mersenne(mod) else "generic"
+    if backend not in FIELD_BACKENDS:
+        raise ValueError(f"Contexto de campo desconocido: {backend} (opciones: auto, {', '.join(FIELD_BACKENDS)})")
+    return FIELD_BACKENDS[backend](mod)
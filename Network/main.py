@@ -11,7 +11,10 @@ class CommandHandler:
             "message": self.send_message,
             "number": self.send_number,
             "multiply": self.send_operation,
+            "multiply-tree": self.send_tree_operation,
             "reconstruct": self.reconstruct_secret,
+            "reset": self.reset_computation,
+            "close-session": self.close_session,
             "status": self.show_status,
             "exit": self.exit_program
         }
@@ -59,24 +62,41 @@ class CommandHandler:
         # Se envía el mensaje unido por espacios.
         self.main_user.broadcast(" ".join(message))
 
-    def send_number(self, number):
+    # Los comandos de cálculo aceptan como último argumento opcional el número de sesión (por defecto 0).
+
+    def send_number(self, number, session="0"):
         # Se envía el número propio a todos los usuarios conectados.
-        self.main_user.send_number(numero=int(number))
+        self.main_user.send_number(numero=int(number), session=int(session))
         print("Número enviado.")
 
-    def send_operation(self):
+    def send_operation(self, session="0"):
         # Se envía el resultado de la operación a todos los usuarios conectados.
-        self.main_user.sendOperation()
+        self.main_user.sendOperation(session=int(session))
+        print("Operación enviada.")
+
+    def send_tree_operation(self, session="0"):
+        # Se inicia la multiplicación en forma de árbol balanceado (ceil(log2 n) rondas).
+        self.main_user.sendTreeOperation(session=int(session))
         print("Operación enviada.")
 
-    def reconstruct_secret(self):
+    def reconstruct_secret(self, session="0"):
         # Se reconstruye el secreto con las partes recibidas.
-        secret = self.main_user.reconstruct_secret()
+        secret = self.main_user.reconstruct_secret(session=int(session))
         print(f"Secreto reconstruido: {secret}")
 
-    def show_status(self):
+    def reset_computation(self, session="0"):
+        # Se borra el estado del cálculo, conservando las conexiones.
+        self.main_user.resetComputation(int(session))
+        print("Cálculo reiniciado.")
+
+    def close_session(self, session):
+        # Se cierra una sesión y se libera su estado.
+        self.main_user.closeSession(int(session))
+        print(f"Sesión {session} cerrada.")
+
+    def show_status(self, session="0"):
         # Se muestra el estado actual del usuario.
-        self.main_user.status()
+        self.main_user.status(int(session))
 
     def exit_program(self):
         # Detiene el sistema.
@@ -90,7 +110,7 @@ class CommandHandler:
             print(f"  - {cmd}")
 
 
-def handle_console(ip: str | None, port: int | None, uuid: str | None = None):
+def handle_console(ip: str | None, port: int | None, uuid: str | None = None, binary: bool = True, asynchronous: bool = False, share_store: str | None = None):
         """
         Inicia el sistema de comunicación por consola.
         Se crean un usuario principal y un manejador de comandos.
@@ -102,6 +122,9 @@ def handle_console(ip: str | None, port: int | None, uuid: str | None = None):
         :param ip: Dirección IP del servidor.
         :param port: Puerto del servidor.
         :param uuid: UUID del usuario.
+        :param binary: Si se anuncia el formato binario a los demás usuarios.
+        :param asynchronous: Si se usa el motor de red basado en asyncio (AsyncMainUser).
+        :param share_store: Archivo donde se guardan las partes de entrada ({uuid} se reemplaza por el del usuario).
         """
         import random
 
@@ -120,11 +143,11 @@ def handle_console(ip: str | None, port: int | None, uuid: str | None = None):
             print("Debes ingresar una dirección IP y un puerto.")
             return
         
-        main_user = NetworkUser.MainUser(ip, port, uuid)
+        main_user = user_class(asynchronous)(ip, port, uuid, binary, share_store=store_path(share_store, uuid))
         handler = CommandHandler(main_user)
         handler.run()
 
-def handle_file(file_path: str, ip: str | None = None, port: int | None = None, uuid: str | None = None):
+def handle_file(file_path: str, ip: str | None = None, port: int | None = None, uuid: str | None = None, binary: bool = True, asynchronous: bool = False, tree: bool = False, circuit_path: str | None = None, triples_path: str | None = None, share_store: str | None = None, bulk: bool = False, stream_path: str | None = None, stream_store: str | None = None):
     """
     Lee el archivo de conexiones y ejecuta las acciones correspondientes.
     En caso de que se pasen los argumentos de IP, puerto y UUID, se crea un host con esos datos.
@@ -143,44 +166,71 @@ def handle_file(file_path: str, ip: str | None = None, port: int | None = None,
     :param ip: Dirección IP del servidor.
     :param port: Puerto del servidor.
     :param uuid: UUID del usuario.
+    :param binary: Si se anuncia el formato binario a los demás usuarios.
+    :param asynchronous: Si se usa el motor de red basado en asyncio (AsyncMainUser).
+    :param tree: Si la multiplicación se hace en forma de árbol balanceado en lugar de en cadena.
+    :param circuit_path: Archivo JSON con un circuito. Si se indica, se evalúa el circuito en lugar del producto.
+    :param triples_path: Archivo de tripletas de Beaver para las multiplicaciones del circuito ({uuid} se reemplaza por el del host).
+    :param share_store: Archivo donde se guardan las partes de entrada ({uuid} se reemplaza por el del host).
+    :param bulk: Si se conecta con todos los usuarios del archivo a la vez (FileManager.bootstrap).
+    :param stream_path: Archivo que se reparte como un flujo en lugar de los números ({uuid} se reemplaza por el del host).
+    :param stream_store: Ruta base de los archivos donde se guardan las partes de los flujos recibidos (ver Streaming.sink_path).
     """
     import FileManager
-    import time
+    import Circuit
 
     cf = FileManager.ConnectionsFile(file_path)
-    host = cf.create_host(ip, port, uuid)
+    host = cf.create_host(ip, port, uuid, binary, user_class(asynchronous), store_path(share_store, uuid or cf.host.get("uuid")))
 
+    host.stream_store = stream_store
     host.status()
 
     print("Conectando con usuarios...")
-    cf.connect_with_users(host)
+    if bulk:
+        cf.bootstrap(host)
+    else:
+        cf.connect_with_users(host)
     print("Conexiones establecidas.")
 
     host.status()
 
+    if stream_path is not None:
+        path = stream_path.format(uuid=host.uuid)
+        print(f"Repartiendo {path} como flujo...")
+        stats = cf.share_stream(host, path)
+        megabytes = stats["bytes"] / 2**20
+        print(f"{megabytes:.2f} MiB en {stats['bloques']} bloques, {stats['segundos']:.2f} s ({megabytes / max(stats['segundos'], 1e-9):.2f} MiB/s)")
+        print(f"La cola de bloques estuvo llena {stats['esperas_cola']} veces.")
+        input("Presiona Enter para continuar...")
+        return
+
     print("Enviando shares...")
     cf.send_shares(host)
 
-    while len(host.input_shares) < len(host.party):
-        print("Esperando shares...")
-        time.sleep(1)
-
     print("Shares enviados.")
 
     host.status()
 
-    print("Enviando operaciones...")
-    cf.send_operations(host)
+    if circuit_path is not None:
+        circuit = Circuit.Circuit.load(circuit_path)
+        print(f"Evaluando circuito {circuit}...")
+        outputs = cf.evaluate_circuit(host, circuit, triples_path)
+        for name, value in outputs.items():
+            print(f"Salida {name}: {value}")
 
-    while len(host.getMultiplicationShare(0)) < len(host.party):
-        print("Esperando multiplicaciones...")
-        time.sleep(1)
+        try:
+            expected = circuit.evaluate_plain(circuit.assign_inputs(cf.numbers_by_owner()), host.mod)
+            print("Salidas esperadas: ", *(f"{name}={value}" for name, value in expected.items()))
+        except Exception as e:
+            print(f"No se pueden calcular las salidas esperadas: {e}")
 
-    print("Operaciones enviadas.")
+        input("Presiona Enter para continuar...")
+        return
 
-    host.status()
+    print("Enviando operaciones...")
+    cf.send_operations(host, tree)
 
-    time.sleep(15)
+    print("Operaciones enviadas.")
 
     host.status()
 
@@ -194,6 +244,28 @@ def handle_file(file_path: str, ip: str | None = None, port: int | None = None,
     input("Presiona Enter para continuar...")
 
 
+def user_class(asynchronous: bool) -> type[NetworkUser.MainUser]:
+    """
+    Retorna la clase de usuario según el motor de red elegido.
+    """
+    if asynchronous:
+        import AsyncNetworkUser
+        return AsyncNetworkUser.AsyncMainUser
+    return NetworkUser.MainUser
+
+
+def store_path(share_store: str | None, uuid: str | None) -> str | None:
+    """
+    Retorna la ruta del almacén de partes, reemplazando {uuid} por el UUID del usuario.
+    Si se pide un almacén con {uuid} pero no se indicó el UUID, se genera uno nuevo en cada ejecución, y el archivo no se podría recuperar.
+    """
+    if share_store is None:
+        return None
+    if "{uuid}" in share_store and not uuid:
+        raise Exception("Para usar --store con {uuid} se debe indicar --uuid.")
+    return share_store.format(uuid=uuid)
+
+
 def get_local_ip():
         """
         Obtiene la dirección IP local del dispositivo.
@@ -220,6 +292,15 @@ if __name__ == "__main__":
     --port: Puerto del servidor.
     --uuid: UUID del usuario.
     --file: Archivo de conexiones.
+    --text: Usa solo mensajes de texto, sin negociar el formato binario.
+    --async: Usa el motor de red basado en asyncio.
+    --tree: Multiplica en forma de árbol balanceado (solo con --file).
+    --circuit: Evalúa el circuito del archivo JSON indicado en lugar del producto (solo con --file).
+    --triples: Archivo de tripletas de Beaver para multiplicar en el circuito (solo con --circuit).
+    --store: Archivo donde se guardan las partes de entrada, para recuperarlas al reiniciar.
+    --bulk: Se conecta con todos los usuarios del archivo a la vez (solo con --file).
+    --stream: Archivo que se reparte como un flujo en lugar de los números, con {uuid} para el del usuario (solo con --file).
+    --stream-store: Ruta base de los archivos donde se guardan las partes de los flujos recibidos (solo con --file).
 
     En caso de que se pase un archivo, se ejecuta handle_file.
     En caso contrario, se ejecuta handle_console.
@@ -234,9 +315,18 @@ if __name__ == "__main__":
     parser.add_argument("--port", help="Puerto del servidor.", type=int, required=False)
     parser.add_argument("--uuid", help="UUID del usuario.", type=str, required=False)
     parser.add_argument("--file", help="Archivo de conexiones.", type=str, required=False)
+    parser.add_argument("--text", help="Usa solo mensajes de texto, sin negociar el formato binario.", action="store_true")
+    parser.add_argument("--async", help="Usa el motor de red basado en asyncio.", action="store_true", dest="asynchronous")
+    parser.add_argument("--tree", help="Multiplica en forma de árbol balanceado, en ceil(log2 n) rondas.", action="store_true")
+    parser.add_argument("--circuit", help="Archivo JSON con el circuito a evaluar.", type=str, required=False)
+    parser.add_argument("--triples", help="Archivo de tripletas de Beaver para el circuito, por ejemplo triples_{uuid}.json.", type=str, required=False)
+    parser.add_argument("--store", help="Archivo donde se guardan las partes de entrada, por ejemplo shares_{uuid}.bin.", type=str, required=False)
+    parser.add_argument("--bulk", help="Se conecta con todos los usuarios del archivo a la vez.", action="store_true")
+    parser.add_argument("--stream", help="Archivo que se reparte como un flujo, por ejemplo datos_{uuid}.bin.", type=str, required=False)
+    parser.add_argument("--stream-store", help="Ruta base de las partes de los flujos recibidos, por ejemplo flujos/{uuid}_{stream}.", type=str, required=False)
     args = parser.parse_args()
 
     if args.file is not None:
-        handle_file(file_path=args.file, ip=args.ip, port=args.port, uuid=args.uuid)
+        handle_file(file_path=args.file, ip=args.ip, port=args.port, uuid=args.uuid, binary=not args.text, asynchronous=args.asynchronous, tree=args.tree, circuit_path=args.circuit, triples_path=args.triples, share_store=args.store, bulk=args.bulk, stream_path=args.stream, stream_store=args.stream_store)
     else:
-        handle_console(args.ip, args.port, args.uuid)
+        handle_console(args.ip, args.port, args.uuid, not args.text, args.asynchronous, args.store)
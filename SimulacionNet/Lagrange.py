@@ -1,23 +1,40 @@
-from field_operations import Field
+from functools import lru_cache
+from field_operations import Field, PrimeField
 
-def lagrange_interpolation(shares, prime):
-    secret = Field(0, prime)
-    num_shares = len(shares)
-    #Se comienza la sumatoria
-    for j in range(num_shares):
-        xj, yj = shares[j]
-
-        numerator = Field(1, prime)
-        denominator = Field(1, prime)
+LAGRANGE_CACHE_SIZE = 256
+"""
+Número máximo de conjuntos de coeficientes que se guardan en la caché.
+Esta caché es independiente de la de Network/Lagrange.py, aunque usa la misma clave: (módulo, coordenadas x ordenadas, x requerido).
+SimulacionNet y Network son programas separados, cada uno con sus propios módulos (field_operations, Shamirss,
+Lagrange) que se importan desde su carpeta, y nunca corren en el mismo proceso, así que no podrían compartir entradas.
+"""
 
-        #Se comienza la productoria, al evaluarlo directamente en x=0 para obtener el secreto
-        for i in range(num_shares):
+@lru_cache(maxsize=LAGRANGE_CACHE_SIZE)
+def lagrange_coefficients(prime, xs, required_x=0):
+    """
+    Calcula los coeficientes de Lagrange λ_j tales que f(required_x) = Σ λ_j · f(x_j).
+    Solo dependen del primo y de las coordenadas, por lo que se guardan en una caché LRU.
+    """
+    numerators, denominators = [], []
+    for j, xj in enumerate(xs):
+        numerator, denominator = 1, 1
+        for i, xi in enumerate(xs):
             if i != j:
-                xi, _ = shares[i]
-                numerator *= Field(-xi, prime)
-                denominator *= Field(xj - xi, prime)
+                numerator = numerator * (required_x - xi) % prime
+                denominator = denominator * (xj - xi) % prime
+        numerators.append(numerator)
+        denominators.append(denominator)
 
-        lj = numerator * denominator.inverse()
-        secret += Field(yj, prime) * lj
-    return secret
+    #Todos los denominadores se invierten con una sola exponenciación
+    inverses = PrimeField(prime).batch_inverse(denominators)
+    coefficients = [numerator * inverse % prime for numerator, inverse in zip(numerators, inverses)]
+    return tuple(coefficients)
+
+def lagrange_interpolation(shares, prime):
+    #Se ordenan los shares por su coordenada x, para que la clave de la caché no dependa del orden
+    shares = sorted(shares)
+    xs = tuple(x for x, _ in shares)
 
+    #Los coeficientes se evalúan directamente en x=0 para obtener el secreto
+    coefficients = lagrange_coefficients(prime, xs, 0)
+    return Field(sum(l * y for l, (_, y) in zip(coefficients, shares)), prime)
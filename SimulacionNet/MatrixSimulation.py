@@ -0,0 +1,179 @@
+import random
+from Lagrange import lagrange_coefficients
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional, sin él solo está el simulador de main.py con listas.
+    np = None
+
+LIMB_BITS = 16
+"""
+Tamaño (en bits) de las partes en que se dividen los números para multiplicar matrices con float64.
+"""
+
+MAX_INNER = 2**19
+"""
+Longitud máxima de la dimensión interna de un producto de matrices exacto con float64:
+cada término es menor que 2^34 y la suma debe ser menor que 2^53.
+"""
+
+PAIRS_BLOCK = 2**24
+"""
+Cantidad máxima de acciones (parejas x dealers x receptores) que se reparten a la vez en una capa del árbol.
+Limita la memoria: cada bloque ocupa unas pocas veces PAIRS_BLOCK * 8 bytes.
+"""
+
+def split_limbs(M):
+    """
+    Divide una matriz de enteros menores que 2^31 en sus partes de LIMB_BITS bits, m = m1 * 2^16 + m0.
+    Retorna (m0, m1, m0 + m1) como float64, listas para matmul_mod.
+    """
+    mask = (1 << LIMB_BITS) - 1
+    low = (M & mask).astype(np.float64)
+    high = (M >> LIMB_BITS).astype(np.float64)
+    return low, high, low + high
+
+def matmul_mod(A, B, prime, A_limbs=None, B_limbs=None):
+    """
+    Calcula A @ B (mod prime) de forma exacta, con la misma semántica de np.matmul (incluye vectores y lotes de matrices).
+
+    Si prime < 2^31, cada operando se divide en dos partes de 16 bits y se hacen tres productos con float64 (que usan BLAS),
+    como en Karatsuba: a0·b0, a1·b1 y (a0 + a1)·(b0 + b1). Cada término es menor que 2^34, así que las sumas son exactas
+    mientras la dimensión interna no pase de MAX_INNER. Los productos se combinan con int64 reduciendo módulo prime.
+    Si un operando es constante (la matriz de Vandermonde o el vector de recombinación), sus partes se pueden calcular una vez con split_limbs.
+    En otro caso se multiplica con arreglos de tipo object (enteros de Python), que es exacto pero mucho más lento.
+    """
+    A = np.asarray(A)
+    if prime >= 2**31 or A.shape[-1] > MAX_INNER:
+        return np.matmul(A.astype(object), np.asarray(B).astype(object)) % prime
+
+    A0, A1, A01 = A_limbs if A_limbs is not None else split_limbs(A)
+    B0, B1, B01 = B_limbs if B_limbs is not None else split_limbs(np.asarray(B))
+
+    low = np.matmul(A0, B0).astype(np.int64)
+    high = np.matmul(A1, B1).astype(np.int64)
+    middle = np.matmul(A01, B01).astype(np.int64) - low - high
+
+    # Cada término es menor que 2^31 después de reducir, así que cada producto cabe en int64
+    result = high % prime * pow(2, 2 * LIMB_BITS, prime) % prime
+    result += middle % prime * pow(2, LIMB_BITS, prime) % prime
+    result += low
+    return result % prime
+
+class MatrixProtocol:
+    """
+    Simulador del protocolo en el que las acciones de todas las partes se guardan en matrices de NumPy.
+
+    Las acciones de k secretos forman una matriz k x n: la fila s tiene las acciones del secreto s
+    y la columna j las que tiene la parte j + 1.
+    Repartir es un producto de matrices con la matriz de Vandermonde de los puntos x = 1..n, y la matriz de lo que envía
+    cada parte (dealer x receptor) se transpone para obtener lo que recibe cada una.
+    La reducción de grado es un producto matriz-vector con el vector de recombinación λ (coeficientes de Lagrange en x = 0),
+    que solo depende de n y se calcula una vez.
+
+    Así se pueden simular miles de partes: cada ronda son unos pocos productos de matrices en lugar de ciclos de Python.
+    """
+    def __init__(self, prime: int, num_parties: int, degree: int, seed=None):
+        if np is None:
+            raise ImportError("MatrixProtocol necesita NumPy")
+        if degree >= num_parties / 2:
+            raise ValueError(f"El grado debe ser menor que {num_parties / 2}")
+        self.prime = prime
+        self.num_parties = num_parties
+        self.degree = degree
+        self.dtype = np.int64 if prime < 2**31 else object
+        self.rng = np.random.default_rng(seed)
+        self.object_rng = random.Random(seed)
+
+        xs = range(1, num_parties + 1)
+        # powers[e][j] = (j + 1)^e, la matriz de Vandermonde transpuesta ((t + 1) x n)
+        self.powers = np.array([[pow(x, e, prime) for x in xs] for e in range(degree + 1)], dtype=self.dtype)
+        self.recombination = np.array(lagrange_coefficients(prime, tuple(xs), 0), dtype=self.dtype)
+        self.powers_limbs = split_limbs(self.powers) if self.dtype is np.int64 else None
+        self.recombination_limbs = split_limbs(self.recombination) if self.dtype is np.int64 else None
+
+    def random(self, shape):
+        """
+        Retorna una matriz de elementos aleatorios del campo.
+        """
+        if self.dtype is object:
+            values = np.empty(shape, dtype=object)
+            values.flat = [self.object_rng.randrange(self.prime) for _ in range(values.size)]
+            return values
+        return self.rng.integers(0, self.prime, size=shape, dtype=np.int64)
+
+    def share(self, secrets):
+        """
+        Reparte un arreglo de secretos (de cualquier forma) con polinomios aleatorios de grado t.
+        Se retorna un arreglo con una dimensión más al final: el último índice es la parte que recibe la acción.
+        """
+        secrets = np.asarray(secrets).astype(self.dtype) % self.prime
+        coefs = self.random(secrets.shape + (self.degree + 1,))
+        coefs[..., 0] = secrets
+        return matmul_mod(coefs, self.powers, self.prime, B_limbs=self.powers_limbs)
+
+    def input_shares(self, values):
+        """
+        Cada parte reparte su valor. Se retorna la matriz k x n de acciones, una fila por secreto.
+        """
+        return self.share(values)
+
+    def multiply_pairs(self, left, right):
+        """
+        Multiplica las parejas de acciones (filas de left y right, de m x n) en una sola ronda.
+
+        Cada parte multiplica localmente sus acciones y reparte cada producto. dealt[p, i, j] es la acción que
+        la parte i + 1 envía a la parte j + 1 del producto p, así que lo que recibe la parte j + 1 es la columna j
+        (la fila j de la transpuesta), y su nueva acción es el producto de esa columna por el vector de recombinación.
+        Todas las columnas se reducen a la vez con λ · dealt, sin copiar la transpuesta.
+        Las parejas se reparten en bloques de a lo sumo PAIRS_BLOCK acciones, para limitar la memoria.
+        """
+        local = np.asarray(left).astype(self.dtype) * np.asarray(right).astype(self.dtype) % self.prime
+        m, n = local.shape
+        block = max(1, PAIRS_BLOCK // (n * n))
+        result = np.empty((m, n), dtype=self.dtype)
+        for start in range(0, m, block):
+            dealt = self.share(local[start:start + block])
+            result[start:start + block] = matmul_mod(self.recombination, dealt, self.prime, A_limbs=self.recombination_limbs)
+        return result
+
+    def multiply(self, left, right):
+        """
+        Multiplica dos vectores de acciones (uno por parte). Es una ronda del protocolo.
+        """
+        return self.multiply_pairs(np.asarray(left)[None, :], np.asarray(right)[None, :])[0]
+
+    def product(self, shares, tree: bool = False):
+        """
+        Calcula las acciones del producto de todos los secretos (filas de shares).
+        Con tree se multiplican por parejas en forma de árbol balanceado, en ceil(log2 k) rondas;
+        en otro caso, en cadena, en k - 1 rondas, igual que secure_product_reorganized.
+        """
+        shares = np.asarray(shares)
+        if len(shares) < 2:
+            raise ValueError("Se necesitan al menos 2 secretos para la multiplicación")
+        if not tree:
+            result = shares[0]
+            for row in shares[1:]:
+                result = self.multiply(result, row)
+            return result
+
+        layer = shares
+        while len(layer) > 1:
+            pairs = len(layer) // 2
+            products = self.multiply_pairs(layer[0:2 * pairs:2], layer[1:2 * pairs:2])
+            layer = np.concatenate([products, layer[2 * pairs:]]) if len(layer) % 2 else products
+        return layer[0]
+
+    def reconstruct(self, shares) -> int:
+        """
+        Reconstruye el secreto a partir de las acciones de todas las partes.
+        """
+        return int(matmul_mod(self.recombination, np.asarray(shares), self.prime, A_limbs=self.recombination_limbs))
+
+def simulate_product(values: list[int], prime: int, degree: int, tree: bool = False, seed=None) -> int:
+    """
+    Simula el producto seguro de los valores, uno por parte, y retorna el resultado reconstruido.
+    """
+    protocol = MatrixProtocol(prime, len(values), degree, seed)
+    return protocol.reconstruct(protocol.product(protocol.input_shares(values), tree))
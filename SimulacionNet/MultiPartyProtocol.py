@@ -13,24 +13,21 @@ class Protocol:
         - Cada jugador mantiene su primer fragmento.
         - Envía los otros fragmentos a los jugadores correctos.
         """
-        n = len(players)  # Número de jugadores
-        
-        # Crear una copia de los fragmentos de cada jugador para evitar sobreescribir datos en el proceso
-        new_shares = [p.shares[:] for p in players]
-
-        # Distribuir los fragmentos entre los jugadores
-        for i in range(n):
-            for j in range(n):
-                if i != j:
-                    new_shares[j][i] = players[i].shares[j]  # Cada jugador recibe el fragmento de otro jugador
-        
+        # El jugador j recibe el fragmento j de cada jugador, es decir, la columna j de la matriz de fragmentos.
+        # La repartición es la transpuesta de la matriz, que zip calcula sin índices de Python.
+        new_shares = [list(column) for column in zip(*(p.shares for p in players))]
+
         # Aplicar la nueva distribución de fragmentos a cada jugador
-        for i in range(n):
-            players[i].shares = new_shares[i]
+        for player, shares in zip(players, new_shares):
+            player.shares = shares
 
         return players
 
-    def run_protocol(self, valores: list[int], t):
+    def run_protocol(self, valores: list[int], t, verbose: bool = True):
+        """
+        Genera y reparte las acciones de los secretos de cada jugador.
+        Con verbose en False no se imprimen las acciones (modo por lotes).
+        """
         n = self.number_players 
         secrets = valores.copy() 
 
@@ -42,8 +39,9 @@ class Protocol:
             # Se generan los fragmentos usando el esquema de Shamir
             shamir = ShamirSecretSharing(self.field, secret, n)
             shares = shamir.generate_shares(t) 
-            print(f"Shares generados por el jugador {i}:")
-            print(f"{shares}\n")
+            if verbose:
+                print(f"Shares generados por el jugador {i}:")
+                print(f"{shares}\n")
             
             # Se crea un objeto Party (jugador) y se añade a la lista de jugadores
             players.append(Party(i, self.field, shares))
@@ -52,9 +50,10 @@ class Protocol:
         # Llamamos a send_message para distribuir los fragmentos entre los jugadores
         self.send_message(players)
 
-        print("\nFragmentos después de la repartición:")
-        for p in players:
-            print(p)
+        if verbose:
+            print("\nFragmentos después de la repartición:")
+            for p in players:
+                print(p)
 
         players_shares = [p.shares for p in players]  # Obtener los fragmentos de cada jugador
 
@@ -1,7 +1,5 @@
 from field_operations import Field
 from Shamirss import ShamirSecretSharing
-from Party import Party
-from MultiPartyProtocol import Protocol
 from Lagrange import lagrange_interpolation
 
 def secure_multiplication_reorganized(party_values, prime, num_parties, degree):
@@ -24,20 +22,56 @@ def secure_multiplication_reorganized(party_values, prime, num_parties, degree):
         product = Field(party_shares[0] * party_shares[1], prime).value
         local_products.append(product)
     
-    # Paso 2: Cada parte comparte secretamente su producto local
-    players = []
-    for i, product in enumerate(local_products):
-        shamir = ShamirSecretSharing(prime, product, num_parties)
-        shares = shamir.generate_shares(degree)
-        players.append(Party(i + 1, prime, shares))  # Usando la clase Party actualizada
-    
-    # Paso 3: Enviar acciones de manera segura entre las partes usando el Protocolo
-    players = Protocol.send_message(players)
+    # Paso 2 y 3: Se comparten todos los productos locales a la vez.
+    # La fila i de la matriz contiene los fragmentos que recibe la parte i + 1 de cada una de las demás,
+    # por lo que la matriz ya está repartida entre las partes.
+    received_shares = ShamirSecretSharing.generate_batch_shares(prime, local_products, num_parties, degree)
     
     # Paso 4: Cada parte calcula su acción del producto final usando interpolación de Lagrange
     final_shares = []
-    for player in players:
-        lagrange_data = [(i + 1, share) for i, share in enumerate(player.shares)]
+    for party_shares in received_shares:
+        lagrange_data = [(i + 1, int(share)) for i, share in enumerate(party_shares)]
         final_shares.append(lagrange_interpolation(lagrange_data, prime).value)
     
     return final_shares
+
+def secure_multiplication_pairs(party_values, prime, num_parties, degree):
+    """
+    Multiplica de forma segura, en una sola ronda, todas las parejas de acciones de una capa del árbol de productos.
+    La pareja p está formada por las acciones 2p y 2p + 1 de cada parte.
+
+    Los productos locales de todas las parejas se comparten a la vez con generate_batch_shares,
+    y cada parte reduce el grado de cada producto con interpolación de Lagrange.
+
+    Args:
+        party_values: Lista donde party_values[i] contiene las acciones de la capa que tiene la parte i+1
+        prime: Número primo para el campo finito
+        num_parties: Número de partes
+        degree: Grado de los polinomios
+
+    Returns:
+        Lista donde el elemento i contiene las acciones de los productos de cada pareja que tiene la parte i+1
+    """
+    num_pairs = len(party_values[0]) // 2
+    if num_pairs < 1:
+        raise ValueError("Cada parte necesita al menos 2 acciones para la multiplicación")
+
+    # Paso 1: Cada parte multiplica localmente cada pareja de acciones
+    local_products = [
+        [Field(party_shares[2 * p] * party_shares[2 * p + 1], prime).value for p in range(num_pairs)]
+        for party_shares in party_values
+    ]
+
+    # Paso 2 y 3: Cada parte comparte todos sus productos locales a la vez.
+    # received[j][i][p] es el fragmento que recibe la parte i + 1 del producto p de la parte j + 1.
+    received = [ShamirSecretSharing.generate_batch_shares(prime, products, num_parties, degree) for products in local_products]
+
+    # Paso 4: Cada parte calcula su acción de cada producto usando interpolación de Lagrange
+    results = []
+    for i in range(num_parties):
+        party_results = []
+        for p in range(num_pairs):
+            lagrange_data = [(j + 1, int(received[j][i][p])) for j in range(num_parties)]
+            party_results.append(lagrange_interpolation(lagrange_data, prime).value)
+        results.append(party_results)
+    return results
@@ -29,17 +29,11 @@ class Party:
         - Cada jugador mantiene su primer fragmento.
         - Envía los otros fragmentos a los jugadores correctos.
         """
-        n = len(players)
-    
-        # Crear una copia para evitar sobreescribir datos en el proceso
-        new_shares = [p.shares[:] for p in players]
-        for i in range(n):
-            for j in range(n):
-                if i != j:
-                    new_shares[j][i] = players[i].shares[j]  # Cada jugador recibe el fragmento de otro jugador
+        # El jugador j recibe el fragmento j de cada jugador: la repartición es la transpuesta de la matriz de fragmentos
+        new_shares = [list(column) for column in zip(*(p.shares for p in players))]
     
         # Aplicar la nueva distribución a cada jugador
-        for i in range(n):
-            players[i].shares = new_shares[i]
+        for player, shares in zip(players, new_shares):
+            player.shares = shares
         return players  # Modifica los jugadores directamente y los devuelve opcionalmente
     
\ No newline at end of file
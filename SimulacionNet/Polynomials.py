@@ -1,6 +1,17 @@
 import random
 from field_operations import Field
 
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional, sin él se usan listas de enteros de Python.
+    np = None
+
+EVAL_MANY_NUMPY_MIN = 64
+"""
+Cantidad mínima de puntos para que eval_many use NumPy (si está instalado).
+Con menos puntos cuesta más crear los arreglos que evaluar con enteros de Python.
+"""
+
 class Polynomio:
     """
     Clase que representa un polinomio.
@@ -9,6 +20,8 @@ class Polynomio:
     ----------
     coefs : list[int]
         Lista de coeficientes del polinomio.
+    prime : int | None
+        Primo del campo. Si se indica, las evaluaciones se reducen en cada paso; si no, se calculan con enteros exactos.
 
     Métodos:
     --------
@@ -20,12 +33,16 @@ class Polynomio:
     
     eval(x: int) -> int:
         Evalúa el polinomio en el valor x.
+
+    eval_many(xs: list[int]) -> list[int]:
+        Evalúa el polinomio en varios puntos a la vez.
     
     __str__() -> str:
         Devuelve una representación en cadena del polinomio.
     """
-    def __init__(self, coefs: list[int]):
+    def __init__(self, coefs: list[int], prime: int | None = None):
         self.coefs = coefs
+        self.prime = prime
 
     '''
     Genera un polinomio aleatorio de grado degree, con el valor x en la posición 0
@@ -37,16 +54,51 @@ class Polynomio:
         maxint: int = prime
         coefs = [ Field(random.randint(minint, maxint),prime).value for _ in range(t + 1)]
         coefs[0] = Field(secret, prime).value
-        return Polynomio(coefs)
+        return Polynomio(coefs, prime)
 
     def eval(self, x: int):
+        """
+        Evalúa el polinomio con la regla de Horner, p(x) = c_0 + x(c_1 + x(c_2 + ...)).
+        Si el polinomio tiene primo, se reduce en cada paso y el resultado está en [0, p-1].
+        """
         result = 0
-        x_power = 1
-        for coef in self.coefs:
-            result += coef * x_power
-            x_power *= x
+        if self.prime is None:
+            for coef in reversed(self.coefs):
+                result = result * x + coef
+            return result
+        for coef in reversed(self.coefs):
+            result = (result * x + coef) % self.prime
         return result
 
+    def eval_many(self, xs: list[int]) -> list[int]:
+        """
+        Evalúa el polinomio en todos los puntos xs en una sola pasada por los coeficientes (Horner en todos los puntos a la vez).
+        Con primo, cada paso se reduce módulo p, y con NumPy y al menos EVAL_MANY_NUMPY_MIN puntos
+        cada paso es una operación sobre un arreglo int64 (si p^2 + p cabe en 63 bits).
+        """
+        coefs = list(reversed(self.coefs))
+        prime = self.prime
+        if prime is None:
+            results = [0] * len(xs)
+            for coef in coefs:
+                results = [result * x + coef for result, x in zip(results, xs)]
+            return results
+
+        if np is not None and len(xs) >= EVAL_MANY_NUMPY_MIN and (prime - 1) * prime + prime < 2**63:
+            points = np.array([x % prime for x in xs], dtype=np.int64)
+            results = np.zeros(len(xs), dtype=np.int64)
+            for coef in coefs:
+                results *= points
+                results += coef
+                results %= prime
+            return results.tolist()
+
+        points = [x % prime for x in xs]
+        results = [0] * len(xs)
+        for coef in coefs:
+            results = [(result * x + coef) % prime for result, x in zip(results, points)]
+        return results
+
     def __str__(self):
         terms = []
         for i, coef in enumerate(self.coefs):
@@ -1,5 +1,10 @@
 from Polynomials import Polynomio
-from field_operations import Field
+import random
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional, sin él se usan listas de enteros de Python.
+    np = None
 
 class ShamirSecretSharing:
     """
@@ -39,13 +44,47 @@ class ShamirSecretSharing:
 
     def generate_shares(self, t):
         if t < self.num_shares:
-            s_i = []
             coeficientes_polinomio = Polynomio.random(t, self.secret, self.prime)
-            for i in range(1, self.num_shares + 1):
-                s_i.append(coeficientes_polinomio.eval(i))
-            # print(coeficientes_polinomio)
-            for i in range(0, self.num_shares):
-                s_i[i]=Field(int(s_i[i]), self.prime).value
-            return s_i
+            # Se evalúa en los puntos 1..n en una sola pasada; los resultados ya están reducidos en [0, p-1]
+            return coeficientes_polinomio.eval_many(range(1, self.num_shares + 1))
         else:
             raise ValueError("El valor de t debe ser menor o igual que el número total de partes")
+
+    @staticmethod
+    def generate_batch_shares(prime, secrets, num_shares, t):
+        """
+        Genera las partes de un vector de secretos con un único producto de matrices.
+
+        Se construye la matriz de Vandermonde V (num_shares x (t + 1)) de los puntos x = 1..n y se
+        calcula S = V · C (mod p), donde cada columna de C tiene los coeficientes de un polinomio.
+        La fila i de S contiene las partes que recibe la parte i + 1, una por secreto, es decir,
+        la matriz ya está repartida y no hace falta transponer las listas de cada jugador.
+
+        Con NumPy se usa int64 cuando p^2 + p cabe en 63 bits (reduciendo después de cada término),
+        y un arreglo de tipo object en otro caso. Sin NumPy se usan listas de enteros.
+        """
+        if t >= num_shares:
+            raise ValueError("El valor de t debe ser menor o igual que el número total de partes")
+
+        k = len(secrets)
+        vandermonde = [[pow(x, j, prime) for j in range(t + 1)] for x in range(1, num_shares + 1)]
+
+        if np is None:
+            coefs = [[s % prime for s in secrets]] + [[random.randrange(prime) for _ in range(k)] for _ in range(t)]
+            columns = list(zip(*coefs))
+            return [[sum(v * c for v, c in zip(row, column)) % prime for column in columns] for row in vandermonde]
+
+        if (prime - 1) * prime < 2**63:
+            V = np.array(vandermonde, dtype=np.int64)
+            C = np.empty((t + 1, k), dtype=np.int64)
+            C[0] = np.array([s % prime for s in secrets], dtype=np.int64)
+            C[1:] = np.random.randint(0, prime, size=(t, k), dtype=np.int64)
+            S = np.zeros((num_shares, k), dtype=np.int64)
+            for j in range(t + 1):
+                S += np.outer(V[:, j], C[j])  # Cada término es menor que p^2
+                S %= prime
+            return S
+
+        V = np.array(vandermonde, dtype=object)
+        C = np.array([[s % prime for s in secrets]] + [[random.randrange(prime) for _ in range(k)] for _ in range(t)], dtype=object)
+        return V.dot(C) % prime
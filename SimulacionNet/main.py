@@ -1,7 +1,27 @@
-from Multiplication import secure_multiplication_reorganized
+from Multiplication import secure_multiplication_reorganized, secure_multiplication_pairs
 from Lagrange import lagrange_interpolation
+from field_operations import Field
 import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from MultiPartyProtocol import Protocol
+import MatrixSimulation
+
+PRIMO = 2**31 - 1
+"""
+Primo por defecto del campo Z_p (primo de Mersenne).
+"""
+
+CAMPOS_RESULTADO = ["caso", "jugadores", "grado", "primo", "modo", "resultado", "esperado", "correcto",
+                    "t_reparto", "t_multiplicacion", "t_reconstruccion", "t_total", "error"]
+"""
+Campos de cada resultado del modo por lotes, en el orden de las columnas del CSV. Los tiempos están en segundos.
+"""
 
 def secure_product_reorganized(party_values, prime, num_parties, degree):
     """
@@ -38,6 +58,33 @@ def secure_product_reorganized(party_values, prime, num_parties, degree):
     
     return result_shares
 
+def secure_product_tree(party_values, prime, num_parties, degree):
+    """
+    Calcula de manera segura el producto de múltiples números usando MPC, multiplicando en forma de árbol balanceado.
+
+    En cada capa se multiplican las acciones por parejas, todas en la misma ronda.
+    Si la capa tiene una cantidad impar de acciones, la última pasa a la capa siguiente sin multiplicarse.
+    Así, el producto de n números toma ceil(log2 n) rondas en lugar de las n - 1 de secure_product_reorganized.
+
+    Args:
+        party_values: Lista donde party_values[i] contiene todas las acciones que la parte i+1 tiene
+        prime: Número primo para el campo finito
+        num_parties: Número de partes
+        degree: Grado de los polinomios
+    """
+    if len(party_values) < 1:
+        raise ValueError("Se requiere al menos una parte")
+
+    if len(party_values[0]) < 2:
+        raise ValueError("Cada parte necesita al menos 2 acciones para la multiplicación")
+
+    layer = [list(party_shares) for party_shares in party_values]
+    while len(layer[0]) > 1:
+        products = secure_multiplication_pairs(layer, prime, num_parties, degree)
+        layer = [party_products + party_shares[2 * len(party_products):] for party_products, party_shares in zip(products, layer)]
+
+    return [party_shares[0] for party_shares in layer]
+
 def leer_archivo(input_file):
     valores = []
     try:
@@ -57,42 +104,199 @@ def leer_archivo(input_file):
         return None
     return valores
 
-def main():
-    # Configurar el análisis de argumentos de la línea de comandos
+def simular_caso(indice, caso, primo, grado, arbol=False, matricial=False):
+    """
+    Ejecuta un caso de prueba sin interacción y retorna un diccionario con los campos de CAMPOS_RESULTADO.
+    Si grado es None, se usa el mayor grado válido, (n - 1) // 2.
+    Con matricial se usa el simulador de NumPy (MatrixSimulation.MatrixProtocol), útil para muchos jugadores.
+    Es una función del módulo para que se pueda enviar a los procesos de ProcessPoolExecutor.
+    """
+    cantidad_jugadores = len(caso)
+    if grado is None:
+        grado = (cantidad_jugadores - 1) // 2
+    resultado = {"caso": indice + 1, "jugadores": cantidad_jugadores, "grado": grado, "primo": primo,
+                 "modo": ("arbol" if arbol else "cadena") + ("-numpy" if matricial else ""), "resultado": None, "esperado": None, "correcto": False,
+                 "t_reparto": None, "t_multiplicacion": None, "t_reconstruccion": None, "t_total": None, "error": None}
+    if cantidad_jugadores < 2:
+        resultado["error"] = "Se necesitan al menos 2 jugadores"
+        return resultado
+    if grado >= cantidad_jugadores / 2:
+        resultado["error"] = f"El grado debe ser menor que {cantidad_jugadores / 2}"
+        return resultado
+
+    inicio = time.perf_counter()
+    if matricial:
+        protocolo = MatrixSimulation.MatrixProtocol(primo, cantidad_jugadores, grado)
+        acciones = protocolo.input_shares(caso)
+        reparto = time.perf_counter()
+
+        resultado_encriptado = protocolo.product(acciones, arbol)
+        multiplicacion = time.perf_counter()
+
+        resultado_revelado = Field(protocolo.reconstruct(resultado_encriptado), primo)
+        fin = time.perf_counter()
+    else:
+        numbers = Protocol(primo, cantidad_jugadores).run_protocol(caso, grado, verbose=False)
+        reparto = time.perf_counter()
+
+        producto_seguro = secure_product_tree if arbol else secure_product_reorganized
+        resultado_encriptado = producto_seguro(numbers, primo, cantidad_jugadores, grado)
+        multiplicacion = time.perf_counter()
+
+        resultado_revelado = lagrange_interpolation([(i + 1, fragmento) for i, fragmento in enumerate(resultado_encriptado)], primo)
+        fin = time.perf_counter()
+
+    esperado = 1
+    for valor in caso:
+        esperado = esperado * valor % primo
+    resultado.update({
+        "resultado": int(resultado_revelado.value), "esperado": esperado, "correcto": int(resultado_revelado.value) == esperado,
+        "t_reparto": reparto - inicio, "t_multiplicacion": multiplicacion - reparto,
+        "t_reconstruccion": fin - multiplicacion, "t_total": fin - inicio,
+    })
+    return resultado
+
+def _simular_caso(argumentos):
+    return simular_caso(*argumentos)
+
+class EscritorResultados:
+    """
+    Escribe los resultados del modo por lotes a medida que llegan.
+    Si la ruta termina en .csv se escribe un CSV con encabezado; en otro caso, un objeto JSON por línea (JSON Lines).
+    Sin ruta, se escribe JSON Lines en la salida estándar.
+    """
+    def __init__(self, ruta=None):
+        self.archivo = open(ruta, "w", newline="", encoding="utf-8") if ruta else sys.stdout
+        self.csv = csv.DictWriter(self.archivo, fieldnames=CAMPOS_RESULTADO) if ruta and ruta.endswith(".csv") else None
+        if self.csv is not None:
+            self.csv.writeheader()
+
+    def escribir(self, resultado):
+        if self.csv is not None:
+            self.csv.writerow(resultado)
+        else:
+            self.archivo.write(json.dumps(resultado) + "\n")
+        self.archivo.flush()
+
+    def cerrar(self):
+        if self.archivo is not sys.stdout:
+            self.archivo.close()
+
+def casos_aleatorios(cantidad, jugadores, primo):
+    """
+    Genera cantidad casos de prueba, cada uno con un número aleatorio de Z_primo por jugador.
+    """
+    return [[random.randrange(1, primo) for _ in range(jugadores)] for _ in range(cantidad)]
+
+def ejecutar_lote(casos, primo, grado, arbol, procesos, salida, matricial=False):
+    """
+    Ejecuta todos los casos en un ProcessPoolExecutor y escribe cada resultado en cuanto está listo, en el orden de los casos.
+    Los casos se envían a los procesos en bloques, para no pagar la comunicación entre procesos por cada caso.
+    Cada proceso vuelve a inicializar su generador aleatorio, para que no repitan los mismos polinomios.
+    Al final se imprime un resumen en la salida de errores. Se retorna la cantidad de casos incorrectos o con error.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    bloque = max(1, len(casos) // (procesos * 8))
+    escritor = EscritorResultados(salida)
+    fallidos = 0
+    inicio = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=random.seed) as executor:
+            argumentos = ((i, caso, primo, grado, arbol, matricial) for i, caso in enumerate(casos))
+            for resultado in executor.map(_simular_caso, argumentos, chunksize=bloque):
+                fallidos += not resultado["correcto"]
+                escritor.escribir(resultado)
+    finally:
+        escritor.cerrar()
+    duracion = time.perf_counter() - inicio
+    print(f"{len(casos)} casos en {duracion:.2f} s con {procesos} procesos "
+          f"({len(casos) / duracion if duracion > 0 else 0:.1f} casos/s), {fallidos} incorrectos o con error", file=sys.stderr)
+    return fallidos
+
+def leer_configuracion(argv=None):
+    """
+    Lee los argumentos de la línea de comandos.
+    Con --config se leen valores por defecto de un archivo JSON, cuyas claves son los nombres de los argumentos
+    (por ejemplo {"prime": 2147483647, "degree": 1, "parties": 5, "random": 1000, "workers": 8, "output": "resultados.csv"}).
+    Los argumentos de la línea de comandos tienen prioridad sobre el archivo.
+    """
     parser = argparse.ArgumentParser(
         description="Multiplicación segura de números usando MPC."
     )
-    parser.add_argument("-f", "--file", required=True, help="Archivo con los números a multiplicar")
-    
-    args = parser.parse_args()
+    parser.add_argument("-f", "--file", help="Archivo con los números a multiplicar (un caso por línea, un número por jugador)")
+    parser.add_argument("--tree", action="store_true", help="Multiplica en forma de árbol balanceado, en ceil(log2 n) rondas")
+    parser.add_argument("--numpy", action="store_true", help="Usa el simulador matricial de NumPy, para muchos jugadores")
+    parser.add_argument("--config", help="Archivo JSON con los valores por defecto de los argumentos")
+    parser.add_argument("--batch", action="store_true", help="Modo por lotes: sin preguntas, en varios procesos, con resultados en JSON o CSV")
+    parser.add_argument("--prime", type=int, default=PRIMO, help="Primo del campo Z_p")
+    parser.add_argument("--degree", type=int, help="Grado de los polinomios (por defecto, en modo por lotes, (n - 1) // 2)")
+    parser.add_argument("--parties", type=int, help="Cantidad de jugadores de los casos aleatorios; con un archivo, solo se simulan los casos con esa cantidad")
+    parser.add_argument("--random", type=int, help="Cantidad de casos aleatorios a simular en lugar de leer un archivo")
+    parser.add_argument("--workers", type=int, help="Cantidad de procesos del modo por lotes (por defecto, uno por CPU)")
+    parser.add_argument("--output", help="Archivo de resultados del modo por lotes (.csv o JSON Lines); por defecto la salida estándar")
+
+    previos, _ = parser.parse_known_args(argv)
+    if previos.config:
+        with open(previos.config, "r", encoding="utf-8") as archivo:
+            parser.set_defaults(**json.load(archivo))
+    args = parser.parse_args(argv)
+
+    if args.file is None and args.random is None:
+        parser.error("Se debe indicar un archivo (-f) o una cantidad de casos aleatorios (--random)")
+    if args.random is not None and args.parties is None:
+        parser.error("--random necesita --parties")
+    if args.numpy and MatrixSimulation.np is None:
+        parser.error("--numpy necesita NumPy (pip install numpy)")
+    return args
+
+def main():
+    # Configurar el análisis de argumentos de la línea de comandos
+    args = leer_configuracion()
     
     # Leer el número primo de los argumentos de la línea de comandos
-    primo = 2**31 - 1 
-    print(f"Usando el campo Z_{primo}")
+    primo = args.prime
     
-    # Leer números del archivo
-    numeros = leer_archivo(args.file)
+    # Leer números del archivo o generar casos aleatorios
+    numeros = leer_archivo(args.file) if args.random is None else casos_aleatorios(args.random, args.parties, primo)
     if numeros == None:
         return
+    if args.file is not None and args.parties is not None:
+        numeros = [caso for caso in numeros if len(caso) == args.parties]
+
+    if args.batch:
+        sys.exit(1 if ejecutar_lote(numeros, primo, args.degree, args.tree, args.workers, args.output, args.numpy) else 0)
+
+    print(f"Usando el campo Z_{primo}")
     
     # Iterar sobre los casos de prueba
     for i, caso in enumerate(numeros):
         print(f"Simulacion {i+1}")
         cantidad_jugadores = len(caso)
 
-        while True:
-            try:
-                print(f"Números leídos del archivo: {numeros[i]}")
-                grado = int(input(f"Elige el Grado del polinomio (Debe ser menor estrictamente que {cantidad_jugadores/2}): "))
-                if grado < cantidad_jugadores / 2:
-                    break  # Grado polinomio válido, salir del bucle
-                else:
-                    print(f"El grado debe ser menor que {cantidad_jugadores/2}. Intente de nuevo.")
-            except ValueError:
-                print("Por favor ingrese un número entero para el grado.")
+        if args.degree is None:
+            while True:
+                try:
+                    print(f"Números leídos del archivo: {numeros[i]}")
+                    grado = int(input(f"Elige el Grado del polinomio (Debe ser menor estrictamente que {cantidad_jugadores/2}): "))
+                    if grado < cantidad_jugadores / 2:
+                        break  # Grado polinomio válido, salir del bucle
+                    else:
+                        print(f"El grado debe ser menor que {cantidad_jugadores/2}. Intente de nuevo.")
+                except ValueError:
+                    print("Por favor ingrese un número entero para el grado.")
+        else:
+            grado = args.degree
+            if grado >= cantidad_jugadores / 2:
+                print(f"El grado debe ser menor que {cantidad_jugadores/2}, se omite la simulación.")
+                continue
         
         print(f"Configuración exitosa: {cantidad_jugadores} jugadores con polinomio de grado {grado}")
 
+        if args.numpy:
+            # El simulador matricial no imprime las acciones, que con muchos jugadores son matrices enormes
+            print(f"El resultado es: {Field(MatrixSimulation.simulate_product(caso, primo, grado, args.tree), primo)}")
+            continue
+
         # Usar el Protocolo para crear y distribuir acciones
         protocolo = Protocol(primo, cantidad_jugadores)
         # `run_protocol` devuelve los objetos Party que contienen las acciones de cada jugador
@@ -102,7 +306,8 @@ def main():
         numbers = [party for party in parties]
 
         # Realizar la multiplicación segura de las acciones y asociar cada fragmento del resultado con su índice de jugador
-        resultado_encriptado = secure_product_reorganized(numbers, primo, cantidad_jugadores, grado)
+        producto_seguro = secure_product_tree if args.tree else secure_product_reorganized
+        resultado_encriptado = producto_seguro(numbers, primo, cantidad_jugadores, grado)
         resultado_encriptado = [(i + 1, fragmento) for i, fragmento in enumerate(resultado_encriptado)]
         
         # Usar la interpolación de Lagrange para revelar el resultado final